@@ -0,0 +1,67 @@
+"""乱数の分岐の列挙とモンテカルロ法の比較
+
+1ターン分の評価値の期待値を、すべての分岐の列挙とランダムな試行の平均で求める
+
+    python benchmarks/chance.py
+"""
+import time
+import random
+from copy import deepcopy
+
+from common import random_position, record_crash, report_crashes
+
+
+def value(battle) -> float:
+    scores = [battle.TOD_score(pl) for pl in battle.players]
+    return scores[0] / sum(scores)
+
+
+def monte_carlo(battle, commands, n: int) -> float:
+    total = 0.
+    for _ in range(n):
+        cp = battle.checkpoint()
+        battle.random.seed(random.getrandbits(64))
+        battle.advance_turn(commands)
+        total += value(battle)
+        battle.rollback(cp)
+    return total / n
+
+
+def main(n_positions: int = 20, n_samples: int = 200):
+    rng = random.Random(0)
+    rows, crashes = [], []
+    for seed in range(n_positions):
+        battle = random_position(seed, crashes=crashes)
+        if battle is None or battle.winner() is not None:
+            continue
+        try:
+            commands = {pl: rng.choice(battle.get_available_action_commands(pl)) for pl in battle.players}
+
+            t0 = time.perf_counter()
+            outcomes = battle.enumerate_outcomes(commands, value)
+            t_exact = time.perf_counter() - t0
+            exact = sum(o.probability * o.value for o in outcomes)
+
+            copied = deepcopy(battle)
+            t0 = time.perf_counter()
+            estimate = monte_carlo(copied, {copied.players[i]: c for i, c in enumerate(commands.values())},
+                                   n_samples)
+            t_mc = time.perf_counter() - t0
+        except Exception as e:
+            record_crash(crashes, seed, battle.turn, e)
+            continue
+        n_paths = sum(o.n_paths for o in outcomes)
+        rows.append((n_paths, len(outcomes), t_exact, t_mc, abs(exact - estimate)))
+        print(f"seed {seed:>2}: {n_paths:>5} paths -> {len(outcomes):>4} outcomes, "
+              f"exact {1e3*t_exact:>7.1f} ms, monte carlo ({n_samples}) {1e3*t_mc:>7.1f} ms, "
+              f"error {abs(exact - estimate):.4f}")
+
+    report_crashes(crashes, n_positions, unit="positions")
+    n = len(rows)
+    print(f"\nmean: {sum(r[0] for r in rows)/n:.1f} paths -> {sum(r[1] for r in rows)/n:.1f} outcomes, "
+          f"exact {1e3*sum(r[2] for r in rows)/n:.1f} ms, monte carlo {1e3*sum(r[3] for r in rows)/n:.1f} ms "
+          f"(mean error {sum(r[4] for r in rows)/n:.4f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Battle の複製速度の計測
+
+    python benchmarks/clone.py
+"""
+from copy import deepcopy
+
+from common import random_position, report_crashes, timeit
+
+
+def main(n: int = 200, n_battles: int = 10):
+    t_total, t_events, n_handlers, n_measured = 0., 0., 0, 0
+    crashes = []
+    for seed in range(n_battles):
+        # 先頭のポケモンが場に出た状態で計測する
+        battle = random_position(seed, crashes=crashes)
+        if battle is None:
+            continue
+        n_measured += 1
+
+        # データに定義されたハンドラがすべて配線された状態を想定し、控えのポケモンのハンドラも登録する
+        for player in battle.players:
+            for mon in player.team:
+                mon.ability.register_handlers(battle.events, mon)
+                mon.item.register_handlers(battle.events, mon)
+                for move in mon.moves:
+                    move.register_handlers(battle.events, mon)
+        n_handlers += sum(battle.events.n_subscriptions.values())
+
+        def copy_events():
+            new = deepcopy(battle.events)
+            new.update_reference(battle)
+
+        t_total += timeit(lambda: deepcopy(battle), n)
+        t_events += timeit(copy_events, n)
+
+    report_crashes(crashes, n_battles)
+    print(f"registered (handler, source) pairs per battle: {n_handlers/n_measured:.1f}")
+    print(f"deepcopy(battle)           : {n_measured/t_total:>10,.0f} clones/s")
+    print(f"EventManager copy + remap  : {1e6*t_events/n_measured:>10.1f} us/clone")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import sys
+import time
+import random
+from pathlib import Path
+from collections import Counter
+from dataclasses import dataclass
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from jpoke import Battle, Player, Pokemon  # noqa: E402
+from jpoke.data import pokedex, MOVES, ABILITIES, ITEMS  # noqa: E402
+from jpoke.data.models import MoveData, AbilityData, ItemData  # noqa: E402
+
+
+# 実装済み (データクラスで定義されている) の技・特性・アイテム
+# ハンドラの呼び出しが未対応のものは除外する
+MOVE_POOL = [k for k, v in MOVES.items() if isinstance(v, MoveData) and
+             k not in ["わるあがき", "リフレクター"]]
+ABILITY_POOL = [k for k, v in ABILITIES.items() if isinstance(v, AbilityData) and
+                k not in ["きんちょうかん", "ぜったいねむり", "グラスメイカー"]]
+ITEM_POOL = [k for k, v in ITEMS.items() if isinstance(v, ItemData)]
+
+
+def random_team(rng: random.Random, n: int = 6) -> list[Pokemon]:
+    return [Pokemon(rng.choice(sorted(pokedex)),
+                    ability=rng.choice(ABILITY_POOL),
+                    item=rng.choice(ITEM_POOL),
+                    moves=rng.sample(MOVE_POOL, 4)) for _ in range(n)]
+
+
+def generate_battle(seed: int = 0, n: int = 6, turn: int = 0) -> Battle:
+    """ランダムな n vs n のバトルを生成し、指定したターンまで進める"""
+    rng = random.Random(seed)
+    random.seed(seed)
+    players = [Player(f"Player{i}") for i in range(2)]
+    for player in players:
+        player.team = random_team(rng, n)
+    battle = Battle(players, seed=seed)
+    while battle.turn < turn:
+        battle.advance_turn()
+        if battle.winner():
+            break
+    return battle
+
+
+@dataclass
+class Crash:
+    """run_random_battle が例外で打ち切ったバトル"""
+    seed: int
+    turn: int
+    error: Exception
+
+    @property
+    def reason(self) -> str:
+        return f"{type(self.error).__name__}: {self.error}"
+
+
+def record_crash(crashes: list[Crash] | None, seed: int, turn: int, error: Exception, strict: bool = False):
+    """未実装の処理に到達した例外を crashes に記録する. strict なら例外を送出する"""
+    if strict:
+        raise error
+    if crashes is not None:
+        crashes.append(Crash(seed, turn, error))
+
+
+def advance_battle(battle: Battle,
+                   seed: int,
+                   max_turn: int = 50,
+                   crashes: list[Crash] | None = None,
+                   strict: bool = False) -> bool:
+    """バトルを決着または max_turn まで進める. 打ち切らずに進められたら True
+
+    未実装の処理に到達した場合はその時点で打ち切り、crashes に記録する. strict なら例外を送出する
+    割り込みが解消せずにターンが進まない場合も打ち切る
+    """
+    try:
+        for _ in range(4*max_turn):
+            if battle.winner() is not None or battle.turn >= max_turn:
+                break
+            battle.advance_turn()
+    except Exception as e:
+        record_crash(crashes, seed, battle.turn, e, strict)
+        return False
+    return True
+
+
+def run_random_battle(seed: int,
+                      n: int = 6,
+                      max_turn: int = 50,
+                      crashes: list[Crash] | None = None,
+                      strict: bool = False) -> Battle:
+    """ランダムな n vs n のバトルを決着または max_turn まで進める
+
+    未実装の処理に到達した場合はその時点で打ち切り、crashes に記録する. strict なら例外を送出する
+    """
+    battle = generate_battle(seed, n)
+    advance_battle(battle, seed, max_turn, crashes, strict)
+    return battle
+
+
+def random_position(seed: int,
+                    n: int = 6,
+                    turn: int = 1,
+                    crashes: list[Crash] | None = None,
+                    strict: bool = False) -> Battle | None:
+    """ランダムな n vs n のバトルを turn まで進めた局面. 途中で打ち切った場合は None"""
+    battle = generate_battle(seed, n)
+    return battle if advance_battle(battle, seed, turn, crashes, strict) else None
+
+
+def report_crashes(crashes: list[Crash], n_battles: int, top: int = 5, unit: str = "battles"):
+    """打ち切ったバトルの数と主な原因を表示する. 計測値は打ち切るまでの処理だけを含む"""
+    print(f"{len(crashes)}/{n_battles} {unit} crashed ({100*len(crashes)/max(1, n_battles):.1f}%)")
+    for reason, count in Counter(c.reason for c in crashes).most_common(top):
+        print(f"  {count:>5} {reason}")
+
+
+def timeit(fn, n: int) -> float:
+    """fn を n 回実行したときの1回あたりの実行時間 [s]"""
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n
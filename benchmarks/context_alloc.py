@@ -0,0 +1,107 @@
+"""EventContext / DamageContext のメモリ割り当て計測
+
+    python benchmarks/context_alloc.py [n_battles]
+"""
+import sys
+import tracemalloc
+from dataclasses import dataclass
+
+from common import generate_battle, record_crash, report_crashes
+
+from jpoke.core.event import EventManager, EventContext
+from jpoke.core.damage import DamageCalculator, DamageContext
+
+
+@dataclass
+class DictEventContext:
+    """__slots__ を持たない従来のコンテキスト"""
+    source: object
+    by: str = "self"
+    move: object = None
+    field: str = ""
+
+
+@dataclass
+class DictDamageContext:
+    critical: bool = False
+    self_harm: bool = False
+    power_multiplier: float = 1
+    is_lethal_calc: bool = False
+
+
+def object_size(cls, *args, n: int = 10000) -> float:
+    """tracemalloc で計測した1インスタンスあたりのバイト数"""
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    objs = [cls(*args) for _ in range(n)]
+    size = (tracemalloc.get_traced_memory()[0] - start - sys.getsizeof(objs)) / n
+    tracemalloc.stop()
+    return size
+
+
+def main(n_battles: int = 100, max_turn: int = 50):
+    sizes = {
+        "EventContext (dict)": object_size(DictEventContext, None),
+        "EventContext (slots)": object_size(EventContext, None),
+        "DamageContext (dict)": object_size(DictDamageContext),
+        "DamageContext (slots)": object_size(DamageContext),
+    }
+    for name, size in sizes.items():
+        print(f"{name:<24}{size:>8.1f} bytes/object")
+
+    # コンテキストの要求数と、プールが空で新たに生成した数を数える
+    counts = {"event_req": 0, "event_new": 0, "damage_req": 0, "damage_new": 0}
+    acquire_event = EventManager.acquire_context
+    acquire_damage = DamageCalculator.acquire_context
+
+    def counting_acquire_event(self, *args, **kwargs):
+        counts["event_req"] += 1
+        counts["event_new"] += not self.context_pool
+        return acquire_event(self, *args, **kwargs)
+
+    def counting_acquire_damage(self, *args, **kwargs):
+        counts["damage_req"] += 1
+        counts["damage_new"] += not self.context_pool
+        return acquire_damage(self, *args, **kwargs)
+
+    EventManager.acquire_context = counting_acquire_event
+    DamageCalculator.acquire_context = counting_acquire_damage
+
+    turns, peak, crashes = 0, 0, []
+    tracemalloc.start()
+    try:
+        for seed in range(n_battles):
+            battle = generate_battle(seed)
+            while battle.winner() is None and battle.turn < max_turn:
+                tracemalloc.reset_peak()
+                start = tracemalloc.get_traced_memory()[0]
+                try:
+                    battle.advance_turn()
+                except Exception as e:
+                    # 未実装の処理に到達した場合は打ち切る
+                    record_crash(crashes, seed, battle.turn, e)
+                    break
+                peak += tracemalloc.get_traced_memory()[1] - start
+                turns += 1
+    finally:
+        tracemalloc.stop()
+        EventManager.acquire_context = acquire_event
+        DamageCalculator.acquire_context = acquire_damage
+
+    print(f"\n{n_battles} battles, {turns} turns")
+    report_crashes(crashes, n_battles)
+    print(f"EventContext  requested / created per turn : "
+          f"{counts['event_req']/turns:.1f} / {counts['event_new']/turns:.2f}")
+    print(f"DamageContext requested / created per turn : "
+          f"{counts['damage_req']/turns:.1f} / {counts['damage_new']/turns:.2f}")
+
+    unpooled = counts["event_req"] * sizes["EventContext (dict)"] + \
+        counts["damage_req"] * sizes["DamageContext (dict)"]
+    pooled = counts["event_new"] * sizes["EventContext (slots)"] + \
+        counts["damage_new"] * sizes["DamageContext (slots)"]
+    print(f"context bytes allocated per turn : {unpooled/turns:.0f} (dict, unpooled) -> {pooled/turns:.0f} (slots, pooled)")
+    print(f"traced peak above turn start    : {peak/turns:.0f} bytes/turn")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
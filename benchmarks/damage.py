@@ -0,0 +1,82 @@
+"""ダメージ計算 (16通りの乱数のダメージ) の速度
+
+ランダムな局面の場のポケモンどうしで、威力のある技のダメージを計算する
+1件ずつ計算する場合 (Battle.calc_damages) と、まとめて計算する場合 (Battle.calc_damages_batch) を比べる
+1件ずつの計算は、解決済みの入力のキャッシュ (DamageCache) の有無でも比べる
+
+    python benchmarks/damage.py
+"""
+from common import random_position, report_crashes, timeit
+from jpoke.model import Move
+from jpoke.core.damage import DamageContext, DamageCache
+
+
+def positions(n: int) -> list:
+    """決着していない局面を n 個集める. 未実装の処理に到達したバトルは使わない"""
+    battles, crashes = [], []
+    seed = 0
+    while len(battles) < n:
+        battle = random_position(seed, turn=1, crashes=crashes)
+        if battle is not None and battle.winner() is None:
+            battles.append(battle)
+        seed += 1
+    report_crashes(crashes, seed)
+    return battles
+
+
+def main(n_positions: int = 20, n: int = 2000):
+    calcs = []
+    for battle in positions(n_positions):
+        for attacker in battle.actives:
+            for move in attacker.moves:
+                if move.data.power:
+                    calcs.append((battle, attacker, Move(move.name)))
+    print(f"{len(calcs)} (attacker, move) pairs in {n_positions} positions")
+
+    for max_size in [0, 1 << 16]:
+        cache = DamageCache(max_size)
+        for battle, _, _ in calcs:
+            battle.damage_calculator.cache = cache
+        for critical in [False, True]:
+            i = 0
+
+            def calc():
+                nonlocal i
+                battle, attacker, move = calcs[i % len(calcs)]
+                battle.calc_damages(attacker, move, critical)
+                i += 1
+
+            t = timeit(calc, n)
+            print(f"cache={max_size:<6} critical={critical!s:<5} single: {1/t:,.0f} calcs/s ({t*1e6:.1f} us/calc)")
+        if max_size:
+            print(f"  {cache.stats()}, {cache.memory_usage() / len(cache):.0f} bytes/entry")
+
+    # 局面ごとに、両チームのすべてのポケモンの威力のある技を、相手チームのすべてのポケモンに対してまとめて計算する
+    batches = []
+    for battle in {id(b): b for b, _, _ in calcs}.values():
+        triples = []
+        for pl, foe in [battle.players, battle.players[::-1]]:
+            for attacker in pl.team:
+                for move in attacker.moves:
+                    if move.data.power:
+                        triples += [(attacker, defender, Move(move.name)) for defender in foe.team]
+        batches.append((battle, triples))
+    n_triples = sum(len(triples) for _, triples in batches)
+    print(f"{n_triples / len(batches):.0f} (attacker, defender, move) per batch")
+
+    for critical in [False, True]:
+        for name, f in [("single", lambda b, t: [b.damage_calculator.single_hit_damages(b.events, *x, DamageContext(critical)) for x in t]),
+                        ("batch ", lambda b, t: b.calc_damages_batch(t, critical))]:
+            i = 0
+
+            def calc_batch():
+                nonlocal i
+                battle, triples = batches[i % len(batches)]
+                f(battle, triples)
+                i += 1
+
+            t = timeit(calc_batch, max(1, n // 50)) * len(batches) / n_triples
+            print(f"critical={critical!s:<5} {name}: {1/t:,.0f} calcs/s ({t*1e6:.1f} us/calc)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""チームどうしのダメージ (Battle.calc_damage_matrix) の速度
+
+6体 x 威力のある技4つ x 6体 のすべての組み合わせを計算する
+比較として、同じ組み合わせをキャッシュなしで1件ずつ計算する
+
+    python benchmarks/damage_matrix.py
+"""
+import random
+
+from common import Battle, Player, Pokemon, pokedex, timeit
+from jpoke.core.damage import DamageContext, DamageCache
+
+MOVES = ["たいあたり", "アームハンマー", "でんじほう", "とんぼがえり"]
+
+
+def generate_battle(seed: int) -> Battle:
+    rng = random.Random(seed)
+    players = [Player(f"Player{i}") for i in range(2)]
+    for player in players:
+        player.team = [Pokemon(rng.choice(sorted(pokedex)), moves=MOVES) for _ in range(6)]
+    return Battle(players, seed=seed)  # type: ignore
+
+
+def main(n_battles: int = 10, n: int = 20):
+    battles = [generate_battle(seed) for seed in range(n_battles)]
+    for battle in battles:
+        battle.damage_calculator.cache = DamageCache(0)
+    for critical, terastal in [(False, False), (True, False), (True, True)]:
+        i = 0
+
+        def calc_matrix():
+            nonlocal i
+            battle = battles[i % len(battles)]
+            battle.calc_damage_matrix(battle.players[0], critical, terastal)
+            i += 1
+
+        def calc_each():
+            nonlocal i
+            battle = battles[i % len(battles)]
+            calculator = battle.damage_calculator
+            for crit in [False, True] if critical else [False]:
+                ctx = DamageContext(critical=crit)
+                for attacker in battle.players[0].team:
+                    for move in attacker.moves:
+                        for defender in battle.players[1].team:
+                            calculator.single_hit_damages(battle.events, attacker, defender, move, ctx)
+            i += 1
+
+        n_variants = (2 if critical else 1) * (4 if terastal else 1)
+        label = f"critical={critical!s:<5} terastal={terastal!s:<5} ({n_variants * 6*4*6} calcs)"
+        t = timeit(calc_matrix, n)
+        print(f"{label} matrix: {t*1e3:.1f} ms")
+        if not terastal:
+            t = timeit(calc_each, n)
+            print(f"{label} each  : {t*1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""相手の非公開情報の標本化 (determinization) の速度
+
+N 通りの標本の生成時間と、1標本をバトルに上書きして元に戻す時間、複製する時間を比べる
+比較として、標本ごとに複製して Python の乱数で上書きする素朴な実装も計測する
+
+    python benchmarks/determinization.py
+"""
+import time
+import random
+from copy import deepcopy
+
+import numpy as np
+
+from common import random_position, report_crashes, timeit
+from jpoke.core.determinization import ITEM_POOL, MOVE_POOL, ability_candidates
+
+
+def naive(battle, perspective, rng: random.Random):
+    """複製してから1匹ずつ特性・持ち物・技を選び直す"""
+    new = deepcopy(battle)
+    player = new.players[1 - battle.players.index(perspective)]
+    for mon in player.team:
+        if not mon.ability.revealed:
+            mon.ability = rng.choice(ability_candidates(mon))
+        if not mon.item.revealed:
+            mon.item = rng.choice(ITEM_POOL)
+        revealed = [move for move in mon.moves if move.revealed]
+        pool = [name for name in MOVE_POOL if name not in [move.name for move in revealed]]
+        mon.moves = revealed + rng.sample(pool, 4 - len(revealed))
+    return new
+
+
+def positions(n: int) -> list:
+    """決着していない局面を n 個集める. 未実装の処理に到達したバトルは使わない"""
+    battles, crashes = [], []
+    seed = 0
+    while len(battles) < n:
+        battle = random_position(seed, turn=3, crashes=crashes)
+        if battle is not None and battle.winner() is None:
+            battles.append(battle)
+        seed += 1
+    report_crashes(crashes, seed)
+    return battles
+
+
+def main(n_positions: int = 10):
+    rng = np.random.default_rng(0)
+    battles = positions(n_positions)
+    print(f"{len(battles)} positions")
+
+    for n in [100, 1000, 10000]:
+        t = np.mean([timeit(lambda: b.determinize(b.players[0], n, rng), 10) for b in battles])
+        print(f"generate {n:>5}: {t*1e3:7.2f} ms ({t/n*1e6:.2f} us/sample)")
+
+    t_apply, t_clone, t_naive = [], [], []
+    for b in battles:
+        d = b.determinize(b.players[0], 1000, rng)
+
+        def apply():
+            cp = b.checkpoint()
+            d.apply(b, random.randrange(len(d)))
+            b.rollback(cp)
+
+        t_apply.append(timeit(apply, 1000))
+        b.clear_checkpoints()
+        t_clone.append(timeit(lambda: d.clone(b, random.randrange(len(d))), 100))
+        py_rng = random.Random(0)
+        t_naive.append(timeit(lambda: naive(b, b.players[0], py_rng), 100))
+
+    print(f"apply + rollback : {np.mean(t_apply)*1e6:7.1f} us/sample")
+    print(f"clone            : {np.mean(t_clone)*1e6:7.1f} us/sample")
+    print(f"naive clone      : {np.mean(t_naive)*1e6:7.1f} us/sample")
+    t0 = time.perf_counter()
+    b = battles[0]
+    d = b.determinize(b.players[0], 1000, rng)
+    for i in range(len(d)):
+        cp = b.checkpoint()
+        d.apply(b, i)
+        b.rollback(cp)
+    print(f"1000 determinizations (generate + apply + rollback): {(time.perf_counter() - t0)*1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
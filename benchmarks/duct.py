@@ -0,0 +1,104 @@
+"""同時手番の探索 (DUCTPlayer) と逐次手番の探索 (MCTSPlayer) の比較
+
+反復回数を固定して、次の2つを計測する
+    exploitability : 根の局面で、探索が返した混合戦略 (訪問回数の分布) に対し、
+                     相手が最善のコマンドで応じたときの評価値. ランダム・貪欲な戦略と比較する
+    勝率           : ランダム・貪欲なプレイヤーとの対戦成績
+
+    python benchmarks/duct.py [対戦数]
+"""
+import sys
+import random
+
+from common import Battle, Player, random_team, advance_battle, record_crash, report_crashes
+from jpoke.player.mcts_player import MCTSPlayer
+from jpoke.player.duct_player import DUCTPlayer
+from jpoke.player.greedy_player import GreedyPlayer
+from jpoke.player.payoff import PayoffSolver
+
+
+ITERATIONS = [25, 100]
+N_ROLLOUTS = 8
+
+
+def generate_battle(seed: int, players: list[Player], n: int = 3) -> Battle:
+    rng = random.Random(seed)
+    random.seed(seed)
+    for pl in players:
+        pl.team = random_team(rng, n)
+    battle = Battle(players, seed=seed)  # type: ignore
+    battle.advance_turn()
+    return battle
+
+
+def worst_case(strategy: dict, commands0: list, matrix: list[list[float]]) -> float:
+    """相手が最善のコマンドで応じたときの評価値"""
+    total = sum(strategy.values())
+    return min(sum(strategy.get(c0, 0) / total * matrix[i][j] for i, c0 in enumerate(commands0))
+               for j in range(len(matrix[0])))
+
+
+def exploitability(n_positions: int = 10):
+    solver = PayoffSolver(n_rollouts=N_ROLLOUTS)
+    results, crashes = {}, []
+    for seed in range(n_positions):
+        for cls in [MCTSPlayer, DUCTPlayer]:
+            for n in ITERATIONS:
+                player = cls("Search", iterations=n)
+                battle = generate_battle(seed, [player, Player("Random")])
+                try:
+                    if seed not in results:
+                        payoff = solver.solve(battle)
+                        results[seed] = {"matrix": (payoff.commands[0], payoff.values.tolist()),
+                                         "Nash": payoff.strategy(0)}
+                    root = player.search(battle, float("inf"))
+                except Exception as e:
+                    record_crash(crashes, seed, battle.turn, e)
+                    break
+                stats = player.root_stats(root, 0)
+                results[seed][f"{cls.__name__}({n})"] = {cmd: n for cmd, (n, _) in stats.items()}
+        if seed in results:
+            commands0 = results[seed]["matrix"][0]
+            results[seed]["Random"] = {cmd: 1 for cmd in commands0}
+            # 同じシードで貪欲なプレイヤーを立てると同じ局面になる
+            greedy = GreedyPlayer("Greedy")
+            results[seed]["Greedy"] = {greedy.choose_action_command(generate_battle(seed, [greedy, Player()])): 1}
+
+    names = ["Random", "Greedy", "Nash"] + [f"{cls.__name__}({n})" for cls in [MCTSPlayer, DUCTPlayer] for n in ITERATIONS]
+    report_crashes(crashes, n_positions * 2 * len(ITERATIONS), unit="searches")
+    print(f"worst-case value against a best-responding opponent ({len(results)} positions, higher is better)")
+    for name in names:
+        values = [worst_case(r[name], *r["matrix"]) for r in results.values() if name in r]
+        print(f"  {name:<16}: {sum(values)/len(values):.3f}")
+
+
+def play(player: Player, opponent: Player, seed: int, crashes: list, max_turn: int = 30) -> float:
+    """player から見た対戦結果. 勝ち 1, 負け 0, 打ち切りは TOD スコアの比
+
+    未実装の処理に到達した場合は、その時点で打ち切り、crashes に記録する
+    """
+    battle = generate_battle(seed, [player, opponent])
+    advance_battle(battle, seed, max_turn, crashes)
+    winner = battle.winner()
+    if winner is not None:
+        return float(winner is player)
+    scores = [battle.TOD_score(pl) for pl in battle.players]
+    return scores[0] / sum(scores)
+
+
+def win_rates(n_games: int = 10):
+    print(f"\nwin rate ({n_games} games each)")
+    for cls in [MCTSPlayer, DUCTPlayer]:
+        for n in ITERATIONS:
+            for opponent_cls in [Player, GreedyPlayer]:
+                results, crashes = [], []
+                for seed in range(n_games):
+                    results.append(play(cls("Search", iterations=n), opponent_cls("Opponent"), seed, crashes))
+                print(f"  {cls.__name__}({n}) vs {opponent_cls.__name__:<12}: "
+                      f"{sum(results)/len(results):.2f} ({len(results)} games, {len(crashes)} crashed)")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    exploitability(n)
+    win_rates(n)
@@ -0,0 +1,33 @@
+"""Battle.encode/decode と deepcopy の速度の比較
+
+    python benchmarks/encoding.py
+"""
+from copy import deepcopy
+
+from common import random_position, report_crashes, timeit
+
+
+def main(n: int = 200, n_battles: int = 20):
+    t_encode, t_decode, t_copy, n_measured = 0., 0., 0., 0
+    crashes = []
+    for seed in range(n_battles):
+        battle = random_position(seed, turn=3, crashes=crashes)
+        if battle is None:
+            continue
+        n_measured += 1
+        state = battle.encode()
+        target = deepcopy(battle)
+
+        t_encode += timeit(battle.encode, n)
+        t_decode += timeit(lambda: target.decode(state), n)
+        t_copy += timeit(lambda: deepcopy(battle), n)
+
+    report_crashes(crashes, n_battles)
+    print(f"state size         : {len(state)} values, {state.nbytes} bytes")
+    print(f"encode()           : {1e6*t_encode/n_measured:>8.1f} us")
+    print(f"decode()           : {1e6*t_decode/n_measured:>8.1f} us")
+    print(f"deepcopy(battle)   : {1e6*t_copy/n_measured:>8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""1対1の終盤の厳密解の計算時間の計測
+
+    python benchmarks/endgame.py
+"""
+import os
+import time
+import tempfile
+
+from common import Pokemon
+from jpoke.utils import test_utils
+from jpoke.player.endgame import EndgameSolver
+
+
+def generate(hp0: int, hp1: int):
+    test_utils.PRINT_LOG = False
+    battle = test_utils.generate_battle(
+        ally=[Pokemon("ピカチュウ", moves=["たいあたり", "つるぎのまい"])],
+        foe=[Pokemon("フシギバナ", moves=["たいあたり", "どくどく"])],
+        turn=1,
+        accuracy=None,
+    )
+    battle.players[0].active.hp = hp0
+    battle.players[1].active.hp = hp1
+    return battle
+
+
+def main():
+    solver = EndgameSolver()
+    for hp0, hp1 in [(10, 20), (20, 40), (30, 30)]:
+        n_nodes = solver.n_nodes
+        t0 = time.perf_counter()
+        result = solver.solve(generate(hp0, hp1))
+        elapsed = time.perf_counter() - t0
+        print(f"HP {hp0:>3} vs {hp1:>3}: win {result.value:.3f} (exact {result.exact}), "
+              f"{solver.n_nodes - n_nodes:>5} nodes, {elapsed:>7.2f} s")
+
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "endgame.pkl")
+        solver.save_cache(path)
+        solver = EndgameSolver()
+        t0 = time.perf_counter()
+        solver.load_cache(path)
+        print(f"load {len(solver.cache)} solutions: {1e3*(time.perf_counter() - t0):.1f} ms")
+
+    battle = generate(30, 30)
+    t0 = time.perf_counter()
+    solver.solve(battle)
+    print(f"cached solve: {1e6*(time.perf_counter() - t0):.1f} us")
+
+
+if __name__ == "__main__":
+    main()
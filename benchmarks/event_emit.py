@@ -0,0 +1,97 @@
+"""EventManager.emit のスループット計測
+
+    python benchmarks/event_emit.py
+"""
+from common import generate_battle, timeit
+
+from jpoke.core.event import EventManager, EventContext, Handler, HandlerResult
+from jpoke.core.player import Player
+from jpoke.utils.enums import Event
+
+
+def legacy_emit(events: EventManager, handlers: dict, event: Event, ctx=None, value=None):
+    """emit のたびにハンドラをソートしていた従来の実装"""
+    for handler, sources in sorted(handlers.get(event, {}).items()):
+        if ctx:
+            if (not handler.by and ctx.source in sources) or \
+                    (handler.by and any(ctx.source is not mon for mon in sources)):
+                ctxs = [ctx]
+            else:
+                continue
+        else:
+            new_sources = []
+            for source in sources:
+                if isinstance(source, Player):
+                    source = source.active
+                if source not in new_sources:
+                    new_sources.append(source)
+            if len(new_sources) > 1:
+                order = events.battle.calc_speed_order()
+                new_sources = [p for p in order if p in new_sources]
+            ctxs = [EventContext(source) for source in new_sources]
+
+        for c in ctxs:
+            res = handler.func(events.battle, c, value)
+            if isinstance(res, HandlerResult):
+                flag = res
+            elif isinstance(res, tuple):
+                value, flag = res
+            else:
+                value, flag = res, None
+            match flag:
+                case HandlerResult.STOP_HANDLER:
+                    break
+                case HandlerResult.STOP_EVENT:
+                    return value
+    return value
+
+
+# 副作用のない (値を計算するだけの) イベント
+EVENTS = [
+    Event.ON_CHECK_FLOATING, Event.ON_CHECK_TRAPPED, Event.ON_CHECK_NERVOUS,
+    Event.ON_CHECK_MOVE_CATEGORY, Event.ON_CALC_SPEED, Event.ON_CALC_ACCURACY,
+    Event.ON_CALC_POWER_MODIFIER, Event.ON_CALC_ATK_MODIFIER, Event.ON_CALC_DEF_MODIFIER,
+    Event.ON_CALC_ATK_TYPE_MODIFIER, Event.ON_CALC_DEF_TYPE_MODIFIER, Event.ON_CALC_DAMAGE_MODIFIER,
+]
+
+
+def main(n: int = 2000, n_battles: int = 10, n_priority: int = 4):
+    t_new, t_old, n_handlers = 0., 0., 0
+    for seed in range(n_battles):
+        battle = generate_battle(seed, n=6)
+        events = battle.events
+
+        # 計測用に、値をそのまま返すハンドラを各イベントに登録する
+        for event in EVENTS:
+            for priority in range(n_priority):
+                handler = Handler(lambda b, c, v: v, priority=priority)
+                for player in battle.players:
+                    for mon in player.team:
+                        events.on(event, handler, mon)
+
+        legacy = {event: dict(events.ordered_handlers(event)) for event in Event}
+        n_handlers += sum(len(v) for v in legacy.values())
+
+        mon = battle.actives[0]
+        ctx = EventContext(mon, move=mon.moves[0])
+
+        def run_new():
+            for event in EVENTS:
+                events.emit(event, ctx, 4096)
+
+        def run_old():
+            for event in EVENTS:
+                legacy_emit(events, legacy, event, ctx, 4096)
+
+        t_new += timeit(run_new, n)
+        t_old += timeit(run_old, n)
+
+    n_emit = len(EVENTS) * n_battles
+    print(f"registered handlers per battle: {n_handlers/n_battles:.1f}")
+    print(f"sorted emit       : {n_emit/t_old:>12,.0f} emits/s")
+    print(f"EventManager.emit : {n_emit/t_new:>12,.0f} emits/s")
+    print(f"speedup           : {t_old/t_new:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""ハンドラが登録されていないために省略された emit の集計
+
+    python benchmarks/event_skip.py [n_battles] [strict]
+
+未実装の処理に到達したバトルはその時点で打ち切り、打ち切った数を表示する. strict=1 なら例外を送出する
+"""
+import sys
+from collections import Counter
+
+from common import run_random_battle, report_crashes
+
+from jpoke.core.event import EventManager
+
+
+def main(n_battles: int = 1000, strict: int = 0):
+    emitted, skipped = Counter(), Counter()
+    crashes = []
+
+    emit = EventManager.emit
+    has_handlers = EventManager.has_handlers
+
+    def counting_emit(self, event, ctx=None, value=None):
+        emitted[event] += 1
+        return emit(self, event, ctx, value)
+
+    def counting_has_handlers(self, event):
+        res = has_handlers(self, event)
+        if not res:
+            skipped[event] += 1
+        return res
+
+    EventManager.emit = counting_emit
+    EventManager.has_handlers = counting_has_handlers
+    try:
+        turns = sum(run_random_battle(seed, crashes=crashes, strict=bool(strict)).turn
+                    for seed in range(n_battles))
+    finally:
+        EventManager.emit = emit
+        EventManager.has_handlers = has_handlers
+
+    print(f"{n_battles} battles, {turns} turns")
+    report_crashes(crashes, n_battles)
+    print(f"{'event':<28}{'emitted':>10}{'skipped':>10}{'skip %':>8}")
+    for event in sorted(emitted.keys() | skipped.keys(), key=lambda e: e.value):
+        total = emitted[event] + skipped[event]
+        print(f"{event.name:<28}{emitted[event]:>10}{skipped[event]:>10}{100*skipped[event]/total:>8.1f}")
+    total = sum(emitted.values()) + sum(skipped.values())
+    print(f"{'TOTAL':<28}{sum(emitted.values()):>10}{sum(skipped.values()):>10}{100*sum(skipped.values())/total:>8.1f}")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,85 @@
+"""情報集合モンテカルロ木探索 (ISMCTSPlayer) と、標本ごとに独立に探索する方法の対戦
+
+同じ制限時間で、次の相手と席を入れ替えながら対戦する
+    MCTSPlayer         : 1つの標本 (Battle.masked) で探索する
+    DeterminizedMCTS(N): N 個の標本ごとに制限時間の 1/N ずつ探索し、根の訪問回数を合算する
+
+    python benchmarks/ismcts.py [対戦数] [制限時間]
+"""
+import sys
+import time
+import random
+
+from common import Battle, Player, random_team, advance_battle, report_crashes
+from jpoke.utils.enums import Command
+from jpoke.player.mcts_player import MCTSPlayer
+from jpoke.player.ismcts_player import ISMCTSPlayer
+
+
+class DeterminizedMCTS(MCTSPlayer):
+    """n_determinizations 個の標本ごとに独立に探索し、根の統計を合算する"""
+
+    def __init__(self, name: str = "", n_determinizations: int = 4, **kwargs):
+        super().__init__(name, **kwargs)
+        self.n_determinizations = n_determinizations
+
+    def choose_action_command(self, battle: Battle) -> Command:
+        commands = battle.get_available_action_commands(self)
+        if len(commands) == 1:
+            return commands[0]
+        idx = battle.players.index(self)
+        end = time.perf_counter() + self.time_budget
+        merged: dict[Command, int] = {}
+        for k in range(self.n_determinizations):
+            # search の中で Battle.masked が毎回別の標本を選ぶ
+            self.tree = None
+            deadline = time.perf_counter() + (end - time.perf_counter()) / (self.n_determinizations - k)
+            for cmd, (n, _) in self.root_stats(self.search(battle, deadline), idx).items():
+                merged[cmd] = merged.get(cmd, 0) + n
+        return max(merged, key=lambda cmd: merged[cmd])
+
+
+def play(players: list[Player], seed: int, crashes: list, max_turn: int = 30) -> float:
+    """players[0] から見た対戦結果. 勝ち 1, 負け 0, 打ち切りは TOD スコアの比
+
+    未実装の処理に到達した場合は、その時点で打ち切り、crashes に記録する
+    """
+    rng = random.Random(seed)
+    random.seed(seed)
+    for pl in players:
+        pl.team = random_team(rng, 3)
+    battle = Battle(players, seed=seed)  # type: ignore
+    battle.advance_turn()
+    advance_battle(battle, seed, max_turn, crashes)
+    winner = battle.winner()
+    if winner is not None:
+        return float(winner is players[0])
+    scores = [battle.TOD_score(pl) for pl in battle.players]
+    return scores[0] / sum(scores)
+
+
+def main(n_games: int = 10, time_budget: float = 0.2):
+    print(f"ISMCTS win rate, {time_budget}s per command ({n_games} games each, seats swapped)")
+    opponents = [
+        ("MCTSPlayer", lambda: MCTSPlayer("MCTS", time_budget=time_budget)),
+        ("DeterminizedMCTS(4)", lambda: DeterminizedMCTS("Det", 4, time_budget=time_budget)),
+    ]
+    for name, make in opponents:
+        results, iterations, crashes = [], {"ISMCTS": [], name: []}, []
+        for seed in range(n_games):
+            ismcts, opponent = ISMCTSPlayer("ISMCTS", time_budget=time_budget), make()
+            if seed % 2:
+                results.append(1 - play([opponent, ismcts], seed, crashes))
+            else:
+                results.append(play([ismcts, opponent], seed, crashes))
+            for key, pl in [("ISMCTS", ismcts), (name, opponent)]:
+                iterations[key] += [s.iterations_per_sec for s in pl.search_logs]
+        rates = ", ".join(f"{k} {sum(v)/len(v):,.0f} it/s" for k, v in iterations.items() if v)
+        print(f"  vs {name:<20}: {sum(results)/len(results):.2f} ({rates})")
+        report_crashes(crashes, n_games, top=3)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    main(n, budget)
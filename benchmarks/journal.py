@@ -0,0 +1,77 @@
+"""checkpoint/rollback と deepcopy による探索速度の比較
+
+深さ3の全幅探索 (各ノードで最大3通りの行動の組を展開) のノード数/秒を計測する
+
+    python benchmarks/journal.py
+"""
+import time
+import random
+from copy import deepcopy
+
+from common import random_position, record_crash, report_crashes
+
+
+DEPTH = 3
+BRANCH = 3
+
+
+def joint_commands(battle, rng: random.Random):
+    """両プレイヤーの行動の組を最大 BRANCH 通り返す"""
+    options = [battle.get_available_action_commands(pl) for pl in battle.players]
+    pairs = [(c0, c1) for c0 in options[0] for c1 in options[1]]
+    return rng.sample(pairs, min(BRANCH, len(pairs)))
+
+
+def search_deepcopy(battle, depth: int, rng: random.Random, seed: int, crashes: list) -> int:
+    """未実装の処理に到達した子ノードは展開せず、crashes に記録する"""
+    if depth == 0 or battle.winner() is not None:
+        return 1
+    n = 1
+    for c0, c1 in joint_commands(battle, rng):
+        child = deepcopy(battle)
+        try:
+            child.advance_turn({child.players[0]: c0, child.players[1]: c1})
+        except Exception as e:
+            record_crash(crashes, seed, child.turn, e)
+            continue
+        n += search_deepcopy(child, depth - 1, rng, seed, crashes)
+    return n
+
+
+def search_rollback(battle, depth: int, rng: random.Random, seed: int, crashes: list) -> int:
+    """未実装の処理に到達した子ノードは展開せず、crashes に記録する"""
+    if depth == 0 or battle.winner() is not None:
+        return 1
+    n = 1
+    for c0, c1 in joint_commands(battle, rng):
+        cp = battle.checkpoint()
+        try:
+            battle.advance_turn({battle.players[0]: c0, battle.players[1]: c1})
+        except Exception as e:
+            record_crash(crashes, seed, battle.turn, e)
+        else:
+            n += search_rollback(battle, depth - 1, rng, seed, crashes)
+        battle.rollback(cp)
+    return n
+
+
+def main(n_battles: int = 20):
+    results = {}
+    for name, search in [("deepcopy", search_deepcopy), ("rollback", search_rollback)]:
+        nodes, elapsed, crashes = 0, 0., []
+        for seed in range(n_battles):
+            battle = random_position(seed, crashes=crashes)
+            if battle is None:
+                continue
+            random.seed(seed)
+            t0 = time.perf_counter()
+            nodes += search(battle, DEPTH, random.Random(seed), seed, crashes)
+            elapsed += time.perf_counter() - t0
+        results[name] = nodes / elapsed
+        print(f"{name:<10}: {nodes:>6} nodes, {results[name]:>10,.0f} nodes/s")
+        report_crashes(crashes, nodes + len(crashes), unit="positions and expansions")
+    print(f"speedup   : {results['rollback']/results['deepcopy']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
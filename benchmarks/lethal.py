@@ -0,0 +1,40 @@
+"""n ターン以内に瀕死になる確率 (Battle.calc_lethal) の速度
+
+ランダムな局面の場のポケモンどうしで、威力のある技を使い続けた場合を計算する
+すなあらしともうどくを加え、1回の技で2回攻撃し、急所も考慮する
+
+    python benchmarks/lethal.py
+"""
+from common import timeit
+from damage import positions
+from jpoke.model import Move
+
+
+def main(n_positions: int = 20, n: int = 500):
+    lines = []
+    for battle in positions(n_positions):
+        battle.field.activate_weather("すなあらし", 5)
+        for attacker in battle.actives:
+            defender = battle.foe(attacker)
+            defender.ailment.overwrite(battle, "もうどく", force=True)
+            for move in attacker.moves:
+                if move.data.power:
+                    lines.append((battle, attacker, Move(move.name)))
+    print(f"{len(lines)} (attacker, move) pairs in {n_positions} positions")
+
+    for n_turns in [1, 3, 5]:
+        i = 0
+        probs = []
+
+        def calc():
+            nonlocal i
+            battle, attacker, move = lines[i % len(lines)]
+            probs.append(battle.calc_lethal(attacker, move, n_turns, n_hits=2, critical_prob=1/24))
+            i += 1
+
+        t = timeit(calc, n)
+        print(f"{n_turns} turns: {t*1e6:.0f} us/calc (mean KO probability {sum(probs)/len(probs):.3f})")
+
+
+if __name__ == "__main__":
+    main()
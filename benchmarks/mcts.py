@@ -0,0 +1,65 @@
+"""MCTSPlayer の探索性能の計測
+
+1回のコマンド選択あたりの反復回数、探索木の大きさ、最大深さと、
+対戦を進めたときに前のターンから引き継いだノード数を表示する
+
+    python benchmarks/mcts.py [制限時間 s]
+"""
+import sys
+import random
+
+from common import Battle, Player, random_team, advance_battle, record_crash, report_crashes
+from jpoke.player.mcts_player import MCTSPlayer
+
+
+def generate_battle(seed: int, player: MCTSPlayer, n: int = 6) -> Battle:
+    rng = random.Random(seed)
+    random.seed(seed)
+    players = [player, Player("Random")]
+    for pl in players:
+        pl.team = random_team(rng, n)
+    battle = Battle(players, seed=seed)  # type: ignore
+    battle.advance_turn()
+    return battle
+
+
+def main(time_budget: float = 1., n_battles: int = 10):
+    stats, crashes = [], []
+    for seed in range(n_battles):
+        player = MCTSPlayer("MCTS", time_budget=time_budget)
+        battle = generate_battle(seed, player)
+        try:
+            player.choose_action_command(battle)
+        except Exception as e:
+            record_crash(crashes, seed, battle.turn, e)
+            continue
+        s = player.search_logs[-1]
+        stats.append(s)
+        print(f"seed {seed:>2}: {s.iterations_per_sec:>8,.0f} iterations/s, "
+              f"tree size {s.tree_size:>5}, max depth {s.max_depth}, errors {s.n_errors}")
+
+    report_crashes(crashes, n_battles)
+    n = sum(s.iterations for s in stats)
+    elapsed = sum(s.elapsed for s in stats)
+    print(f"\nbudget {time_budget}s: {n/elapsed:,.0f} iterations/s, "
+          f"mean tree size {sum(s.tree_size for s in stats)/len(stats):,.0f}, "
+          f"max depth {max(s.max_depth for s in stats)}")
+
+
+def play(time_budget: float = 1., n_battles: int = 5, max_turn: int = 10):
+    """対戦を進め、ターンごとに引き継いだノード数を表示する"""
+    crashes = []
+    for seed in range(n_battles):
+        player = MCTSPlayer("MCTS", time_budget=time_budget)
+        advance_battle(generate_battle(seed, player), seed, max_turn, crashes)
+        if player.search_logs:
+            print(f"seed {seed:>2}: reused nodes per turn " +
+                  " ".join(f"{s.n_reused:>3}" for s in player.search_logs))
+    report_crashes(crashes, n_battles)
+
+
+if __name__ == "__main__":
+    time_budget = float(sys.argv[1]) if len(sys.argv) > 1 else 1.
+    main(time_budget)
+    print()
+    play(time_budget)
@@ -0,0 +1,35 @@
+"""MCTSPlayer の並列探索 (root parallelization) のスケーリングの計測
+
+    python benchmarks/mcts_parallel.py [制限時間 s]
+"""
+import os
+import sys
+
+from mcts import generate_battle
+from jpoke.player.mcts_player import MCTSPlayer
+
+
+def main(time_budget: float = 1., seed: int = 0, n_decisions: int = 3):
+    print(f"cpu count: {os.cpu_count()}")
+    base = None
+    for n_workers in [1, 2, 4, 8, 16]:
+        player = MCTSPlayer("MCTS", time_budget=time_budget, n_workers=n_workers)
+        battle = generate_battle(seed, player)
+        # プロセスの起動を計測から除く
+        player.choose_action_command(battle)
+        player.search_logs.clear()
+
+        for _ in range(n_decisions):
+            player.choose_action_command(battle)
+        player.close()
+
+        n = sum(s.iterations for s in player.search_logs)
+        elapsed = sum(s.elapsed for s in player.search_logs)
+        rate = n / elapsed
+        base = base or rate
+        print(f"{n_workers:>2} workers: {rate:>8,.0f} iterations/s (x{rate/base:.2f}), "
+              f"{n/n_decisions:>8,.0f} iterations/decision, {elapsed/n_decisions:.2f}s/decision")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 1.)
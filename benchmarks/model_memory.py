@@ -0,0 +1,45 @@
+"""モデルクラスの1インスタンスあたりのメモリ使用量と複製速度の計測
+
+    python benchmarks/model_memory.py
+"""
+import sys
+from copy import deepcopy
+
+from common import random_team, timeit
+from jpoke.model import Field
+from jpoke.model.ailment import Ailment
+
+import random
+
+
+def shallow_size(obj) -> int:
+    """インスタンス本体と属性辞書のサイズ [byte]"""
+    size = sys.getsizeof(obj)
+    if hasattr(obj, "__dict__"):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def main():
+    mon = random_team(random.Random(0), 1)[0]
+    objects = {
+        "Pokemon": mon,
+        "Move": mon.moves[0],
+        "Ability": mon.ability,
+        "Item": mon.item,
+        "Ailment": Ailment(mon),
+        "Field": Field([], "じゅうりょく"),
+        "Pokemon.rank": mon.rank,
+    }
+    for name, obj in objects.items():
+        print(f"{name:<13}: {shallow_size(obj):>5} bytes")
+
+    # ポケモン1匹 (技・特性・アイテム・状態異常・ランクを含む) の合計
+    total = sum(shallow_size(o) for o in [mon, *mon.moves, mon.ability, mon.item, mon.ailment, mon.rank])
+    print(f"{'Pokemon total':<13}: {total:>5} bytes")
+
+    print(f"deepcopy(Pokemon): {1/timeit(lambda: deepcopy(mon), 10000):>10,.0f} clones/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""利得行列の推定と均衡の計算の速度の計測
+
+    python benchmarks/payoff.py
+"""
+import numpy as np
+
+from common import generate_battle, timeit
+from jpoke.player.payoff import PayoffSolver, solve_matrix_game
+
+
+def main(n_rollouts: int = 8):
+    battle = generate_battle(0, n=6, turn=1)
+    m, n = [len(battle.get_available_action_commands(pl)) for pl in battle.players]
+    print(f"matrix {m}x{n}, {n_rollouts} rollouts per cell")
+
+    values = np.random.default_rng(0).random((m, n))
+    print(f"solve_matrix_game   : {1e3*timeit(lambda: solve_matrix_game(values), 10):>8.2f} ms")
+
+    for n_workers in [1, 2, 4]:
+        solver = PayoffSolver(n_rollouts=n_rollouts, n_workers=n_workers)
+        solver.build(battle)  # プロセスの起動を計測から除く
+        result = solver.solve(battle)
+        solver.close()
+        print(f"solve ({n_workers} workers)   : {1e3*result.elapsed:>8.2f} ms, "
+              f"value {result.value:.3f}, exploitability {result.exploitability:.4f}")
+
+    print(f"solve (cached)      : {1e6*timeit(lambda: solver.solve(battle), 10000):>8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""状態のハッシュ値の計算速度の計測
+
+    python benchmarks/state_hash.py
+"""
+import time
+from copy import deepcopy
+
+from common import random_position, advance_battle, report_crashes, timeit
+
+
+def main(n_battles: int = 50, max_turn: int = 30):
+    crashes = []
+    battles = [b for seed in range(n_battles) if (b := random_position(seed, crashes=crashes))]
+    report_crashes(crashes, n_battles)
+    battle = battles[0]
+    battle.state_hash()
+
+    print(f"state_hash()        : {1e6*timeit(battle.state_hash, 100000):>8.2f} us")
+    print(f"calc_state_hash()   : {1e6*timeit(battle.calc_state_hash, 1000):>8.2f} us")
+    print(f"deepcopy(battle)    : {1e6*timeit(lambda: deepcopy(battle), 1000):>8.2f} us")
+
+    # ハッシュ値の更新によるターン処理の増加分
+    for enabled in [False, True]:
+        n, elapsed, crashes = 0, 0., []
+        for seed in range(n_battles):
+            battle = random_position(seed)
+            if battle is None:
+                continue
+            if enabled:
+                battle.state_hash()
+            turn = battle.turn
+            t0 = time.perf_counter()
+            advance_battle(battle, seed, max_turn, crashes)
+            elapsed += time.perf_counter() - t0
+            n += battle.turn - turn
+        print(f"advance_turn (hash {'on ' if enabled else 'off'}): {n/elapsed:>8,.0f} turns/s")
+        report_crashes(crashes, n_battles)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,34 @@
-from typing import Self
+from typing import Self, Callable
 from dataclasses import dataclass
 
 import time
-from random import Random
+import weakref
+import itertools
 from copy import deepcopy
 import json
+import numpy as np
 
 from jpoke.utils.types import Stat, Side
 from jpoke.utils.enums import Command, Interrupt
 from jpoke.utils import fast_copy
 
 from jpoke.model import Pokemon, Move, Field
+from jpoke.model.rank import STAT_INDEX
 
-from .event import Event, EventManager, EventContext
+from .event import Event, EventManager
 from .player import Player
 from .logger import Logger
-from .damage import DamageCalculator, DamageContext
+from .damage import DamageCalculator, DamageMatrix
+from .chance import BattleRandom, Outcome, enumerate_outcomes
+from .determinization import Determinizations, sample_determinizations
 from .field import GlobalFieldManager, SideFieldManager
+from .journal import Journal, Checkpoint, PlayerSnapshot
+from .zobrist import zobrist_key, pokemon_hash, field_hash
+from .encoding import encode_battle, decode_battle
+
+
+# Battle.uid の採番
+_uids = itertools.count()
 
 
 @dataclass
@@ -34,13 +46,15 @@ class Battle:
 
         self.players: list[Player] = players
         self.seed: int = seed
+        # プロセス内でバトルを識別する番号. id() と異なり、破棄されたバトルの番号は再利用しない
+        self.uid: int = next(_uids)
 
         self.turn: int = -1
         self.winner_idx: int | None = None
 
         self.events = EventManager(self)
         self.logger = Logger()
-        self.random = Random(self.seed)
+        self.random: BattleRandom = BattleRandom(self.seed)
         self.damage_calculator: DamageCalculator = DamageCalculator()
 
         self.field: GlobalFieldManager = GlobalFieldManager(self.events, self.players)
@@ -48,14 +62,47 @@ class Battle:
 
         self.test_option: TestOption = TestOption()
 
+        # checkpoint/rollback のための状態変更の記録
+        self.journal: Journal = Journal()
+
+        # 場のポケモンの実効素早さと素早さ順のキャッシュ
+        self.speed_cache: tuple[list[int], list[Pokemon]] | None = None
+
+        # 状態のハッシュ値. 初めて state_hash() を呼んだ後は状態の変更に合わせて更新する
+        self.hash_value: int | None = None
+
+        # 複製元と共有している控えのポケモンの (プレイヤー番号, チーム内の番号) と、その持ち主のバトル
+        self.lenders: dict[tuple[int, int], weakref.ref[Battle]] = {}
+        # このバトルのポケモンを共有している複製
+        self.borrowers: weakref.WeakSet[Battle] = weakref.WeakSet()
+
     def __deepcopy__(self, memo):
         cls = self.__class__
         new = cls.__new__(cls)
         memo[id(self)] = new
+
+        # 控えのポケモンは複製せずに共有し、変更する前に複製する (copy-on-write)
+        # ハンドラが登録されているポケモンは控えでも変更されうる (もうどくなど) ため共有しない
+        lenders = {}
+        live = self.events.source_slots()
+        for i, player in enumerate(self.players):
+            for j, mon in enumerate(player.team):
+                if j != player.active_idx and (i, j) not in live:
+                    # 複製元も共有している場合は、その持ち主から借りる
+                    lenders[(i, j)] = self.lenders.get((i, j)) or weakref.ref(self)
+                    memo[id(mon)] = mon
+
         fast_copy(self, new, keys_to_deepcopy=[
             "players", "events", "logger", "random", "damage_calculator",
             "states", "field", "sides"
-        ])
+        ], memo=memo)
+
+        new.uid = next(_uids)
+        new.lenders = lenders
+        new.borrowers = weakref.WeakSet()
+        for ref in set(lenders.values()):
+            if (owner := ref()) is not None:
+                owner.borrowers.add(new)
 
         # 複製したインスタンスが複製後を参照するように再代入する
         new.events.update_reference(new)
@@ -63,6 +110,10 @@ class Battle:
         for i, side in enumerate(new.sides):
             side.update_reference(new.events, new.players[i])
 
+        # 複製前のポケモンを参照しているキャッシュと記録を破棄
+        new.speed_cache = None
+        new.journal = Journal()
+
         # 乱数の隠蔽
         new.random.seed(int(time.time()))
 
@@ -130,16 +181,136 @@ class Battle:
 
         return new
 
-    def masked(self, perspective: Player) -> tuple[Self, Player]:
-        # TODO mask
+    def masked(self, perspective: Player, rng: np.random.Generator | None = None) -> tuple[Self, Player]:
+        """perspective から見えない情報を隠した複製
+
+        乱数の状態を隠し、相手の選出、特性、持ち物、技は公開情報と矛盾しない標本で置き換える
+        """
         new = deepcopy(self)
         new_player = new.players[self.players.index(perspective)]
+        sample_determinizations(new, new_player, 1, rng).apply(new, 0)
         return new, new_player
 
+    def checkpoint(self) -> Checkpoint:
+        """現在の状態を記録する. 以降の変更は rollback で巻き戻せる"""
+        self.journal.active = True
+        return Checkpoint(
+            index=len(self.journal.entries),
+            turn=self.turn,
+            winner_idx=self.winner_idx,
+            random_state=self.random.getstate(),
+            players=[PlayerSnapshot(pl.active_idx, pl.interrupt, pl.has_switched,
+                                    pl.selection_idxes.copy(), pl.reserved_commands.copy())
+                     for pl in self.players],
+            n_logs=(len(self.logger.turn_logs), len(self.logger.command_logs), len(self.logger.damage_logs)),
+            n_damage_logs=len(self.damage_calculator.logs),
+            hash_value=self.hash_value,
+        )
+
+    def rollback(self, cp: Checkpoint):
+        """checkpoint を記録した時点の状態に戻す"""
+        self.journal.rollback(cp.index)
+
+        self.turn = cp.turn
+        self.winner_idx = cp.winner_idx
+        self.random.setstate(cp.random_state)
+
+        for player, snapshot in zip(self.players, cp.players):
+            player.active_idx = snapshot.active_idx
+            player.interrupt = snapshot.interrupt
+            player.has_switched = snapshot.has_switched
+            player.selection_idxes = snapshot.selection_idxes.copy()
+            player.reserved_commands = snapshot.reserved_commands.copy()
+
+        del self.logger.turn_logs[cp.n_logs[0]:]
+        del self.logger.command_logs[cp.n_logs[1]:]
+        del self.logger.damage_logs[cp.n_logs[2]:]
+        del self.damage_calculator.logs[cp.n_damage_logs:]
+
+        self.hash_value = cp.hash_value
+        self.invalidate_speed_order()
+
+    def clear_checkpoints(self):
+        """記録を破棄し、状態変更の記録を停止する"""
+        self.journal.clear()
+
+    def state_hash(self) -> int:
+        """場のポケモン、HP、ランク、状態異常、PP、場の状態、アイテムの消費、テラスタルを表す64bitのハッシュ値"""
+        if self.hash_value is None:
+            self.hash_value = self.calc_state_hash()
+        return self.hash_value
+
+    def observation_hash(self, perspective: Player) -> int:
+        """perspective から観測できる状態のハッシュ値. 相手の技の PP を含めない
+
+        相手の非公開情報だけが異なる局面 (determinization) は同じ値になる
+        """
+        h = self.state_hash()
+        i = 1 - self.players.index(perspective)
+        for j, mon in enumerate(self.players[i].team):
+            for k, move in enumerate(mon.moves):
+                h ^= zobrist_key("pp", i, j, k, move.pp)
+        return h
+
+    def calc_state_hash(self) -> int:
+        """状態のハッシュ値を一から計算する"""
+        h = 0
+        for i, player in enumerate(self.players):
+            h ^= zobrist_key("active", i, player.active_idx)
+            for j, mon in enumerate(player.team):
+                h ^= pokemon_hash((i, j), mon)
+        for name, field in self.field.fields.items():
+            h ^= field_hash(None, name, field)
+        for i, side in enumerate(self.sides):
+            for name, field in side.fields.items():
+                h ^= field_hash(i, name, field)
+        return h
+
+    def toggle_hash(self, mon: Pokemon):
+        """ポケモンの寄与をハッシュ値に加える (取り除く). 状態を変更する前後で呼び出す"""
+        if self.hash_value is not None:
+            self.hash_value ^= pokemon_hash(self.events.find_slot(mon), mon)  # type: ignore
+
+    def rehash(self, mon: Pokemon, name: str, old: tuple, new: tuple):
+        """ポケモンの項目 name の値が old から new に変わったことをハッシュ値に反映する"""
+        if self.hash_value is not None and old != new:
+            slot = self.events.find_slot(mon)
+            self.hash_value ^= zobrist_key(name, *slot, *old) ^ zobrist_key(name, *slot, *new)  # type: ignore
+
+    def encode(self, dtype=np.int16) -> np.ndarray:
+        """状態を固定長の数値配列に変換する
+
+        ポケモンの種類、HP、ランク、状態異常、技とPP、アイテム、場の状態、テラスタル、割り込みなどを含む
+        tobytes() の値は状態のキーとしても使える
+        """
+        return encode_battle(self, dtype)
+
+    def decode(self, state: np.ndarray):
+        """encode で変換した配列から状態を復元する
+
+        同じチーム構成のバトルにのみ復元できる. チェックポイントは破棄する
+        """
+        decode_battle(self, state)
+        self.events.invalidate_index()
+        self.journal.clear()
+        self.hash_value = None
+        self.invalidate_speed_order()
+
+    def enumerate_outcomes(self,
+                           commands: dict[Player, Command],
+                           value_fn: Callable[[Self], float] | None = None) -> list[Outcome]:
+        """コマンドの組で1ターン進めたときの、乱数によるすべての結果とその確率"""
+        return enumerate_outcomes(self, commands, value_fn)
+
+    def determinize(self, perspective: Player, n: int, rng: np.random.Generator | None = None) -> Determinizations:
+        """perspective から見た相手の非公開情報 (選出、特性、持ち物、技) の標本を n 通り生成する"""
+        return sample_determinizations(self, perspective, n, rng)
+
     def init_turn(self):
         for player in self.players:
             player.reset_turn()
         self.turn += 1
+        self.invalidate_speed_order()
 
     def find_player(self, mon: Pokemon) -> Player:
         for player in self.players:
@@ -208,17 +379,33 @@ class Battle:
         return []
 
     def calc_effective_speed(self, mon: Pokemon) -> int:
-        return self.events.emit(Event.ON_CALC_SPEED, EventContext(mon), mon.stats["S"])
+        if not self.events.has_handlers(Event.ON_CALC_SPEED):
+            return mon.stats["S"]
+        return self.events.emit_from(Event.ON_CALC_SPEED, mon, mon.stats["S"])
+
+    def invalidate_speed_order(self):
+        """素早さ順のキャッシュを破棄する
+
+        ランク、場のポケモン、およびハンドラ (場・特性・アイテム・状態異常) の変化時に呼ばれる
+        """
+        self.speed_cache = None
 
     def calc_speed_order(self) -> list[Pokemon]:
-        speeds = [self.calc_effective_speed(p) for p in self.actives]
+        if self.speed_cache is None:
+            actives = self.actives
+            speeds = [self.calc_effective_speed(p) for p in actives]
+            if speeds[0] != speeds[1]:
+                paired = sorted(zip(speeds, actives),
+                                key=lambda pair: pair[0], reverse=True)
+                _, actives = zip(*paired)
+            self.speed_cache = (speeds, actives)
+
+        speeds, actives = self.speed_cache
+
+        # 同速の場合は呼び出しのたびに乱数で決める
         if speeds[0] == speeds[1]:
-            actives = self.actives.copy()
-            self.random.shuffle(actives)
-        else:
-            paired = sorted(zip(speeds, self.actives),
-                            key=lambda pair: pair[0], reverse=True)
-            _, actives = zip(*paired)
+            actives = list(actives)
+            self.random.shuffle(actives, "同速")
         return actives
 
     def calc_action_order(self) -> list[Pokemon]:
@@ -232,8 +419,9 @@ class Battle:
 
             command = player.reserved_commands[-1]
             move = self.command_to_move(self.players[i], command)
-            ctx = EventContext(mon, move=move)
-            action_speed = self.events.emit(Event.ON_CALC_ACTION_SPEED, ctx, 0)
+            action_speed = 0
+            if self.events.has_handlers(Event.ON_CALC_ACTION_SPEED):
+                action_speed = self.events.emit_from(Event.ON_CALC_ACTION_SPEED, mon, 0, move=move)
 
             total_speed = action_speed + speed*1e-5  # type: ignore
             speeds.append(total_speed)
@@ -277,23 +465,32 @@ class Battle:
                 pl.selection_idxes = [c.idx for c in commands]
 
     def check_hit(self, source: Pokemon, move: Move) -> bool:
+        if self.test_option.accuracy is None and not move.data.accuracy:
+            return True
+        return self.random.chance(self.hit_probability(source, move), "命中")
+
+    def hit_probability(self, source: Pokemon, move: Move) -> float:
+        """技が命中する確率"""
         if self.test_option.accuracy is not None:
             accuracy = self.test_option.accuracy
         else:
             if not move.data.accuracy:
-                return True
-            accuracy = self.events.emit(
-                Event.ON_CALC_ACCURACY,
-                EventContext(source, move=move),
-                move.data.accuracy
-            )
-        return 100*self.random.random() < accuracy  # type: ignore
+                return 1.
+            accuracy = move.data.accuracy
+            if self.events.has_handlers(Event.ON_CALC_ACCURACY):
+                accuracy = self.events.emit_from(
+                    Event.ON_CALC_ACCURACY,
+                    source,
+                    move.data.accuracy,
+                    move=move
+                )
+        return accuracy / 100  # type: ignore
 
     def run_move(self, attacker: Pokemon, move: Move):
         # 技のハンドラを登録
         move.register_handlers(self.events, attacker)
 
-        ctx = EventContext(attacker, move=move)
+        ctx = self.events.acquire_context(attacker, move=move)
 
         # 行動成功判定
         self.events.emit(Event.ON_TRY_ACTION, ctx)
@@ -306,10 +503,12 @@ class Battle:
         self.events.emit(Event.ON_TRY_MOVE, ctx)
 
         # 発動した技の確定
+        self.journal.save_attrs(attacker, "executed_move")
         attacker.executed_move = move
 
         # TODO 命中判定
         if not self.check_hit(attacker, move):
+            self.events.release_context(ctx)
             return
 
         # 無効判定
@@ -329,12 +528,13 @@ class Battle:
             defender = self.foe(attacker)
             self.modify_hp(defender, -damage)
 
-        self.events.emit(Event.ON_HIT, EventContext(attacker, move=move))
+        self.events.emit_from(Event.ON_HIT, attacker, move=move)
 
         # ダメージを与えたときの処理
         if damage:
             self.events.emit(Event.ON_DAMAGE, ctx)
 
+        self.events.release_context(ctx)
         move.unregister_handlers(self.events, attacker)
 
     def command_to_move(self, player: Player, command: Command) -> Move:
@@ -348,16 +548,24 @@ class Battle:
     def modify_hp(self, target: Pokemon, v: int = 0, r: float = 0) -> bool:
         if r:
             v = int(target.max_hp * r)
+        if v:
+            self.journal.save_attrs(target, "hp")
         if v and (v := target.modify_hp(v)):
+            self.rehash(target, "hp", (target.hp - v,), (target.hp,))
             self.add_turn_log(self.find_player(target),
                               f"HP {'+' if v >= 0 else ''}{v} >> {target.hp}")
         return bool(v)
 
     def modify_stat(self, target: Pokemon, stat: Stat, v: int, by: Side = "self") -> bool:
+        if v:
+            self.journal.save_item(target.rank, stat)
         if v and (result := target.modify_stat(stat, v)):
+            i = STAT_INDEX[stat]
+            self.rehash(target, "rank", (i, target.rank[i] - result), (i, target.rank[i]))
+            self.invalidate_speed_order()
             self.add_turn_log(self.find_player(target),
                               f"{stat}{'+' if result >= 0 else ''}{result}")
-            self.events.emit(Event.ON_MODIFY_STAT, EventContext(target, by=by), result)
+            self.events.emit_from(Event.ON_MODIFY_STAT, target, result, by=by)
         return bool(result)
 
     def calc_damage(self,
@@ -367,7 +575,7 @@ class Battle:
                     self_harm: bool = False,
                     ) -> int:
         damages = self.calc_damages(attacker, move, critical, self_harm)
-        return self.random.choice(damages)
+        return self.random.choice(damages, "ダメージ乱数")
 
     def calc_damages(self,
                      attacker: Pokemon,
@@ -378,8 +586,42 @@ class Battle:
         if isinstance(move, str):
             move = Move(move)
         defender = attacker if self_harm else self.foe(attacker)
-        ctx = DamageContext(critical, self_harm)
-        return self.damage_calculator.single_hit_damages(self.events, attacker, defender, move, ctx)
+        ctx = self.damage_calculator.acquire_context(critical, self_harm)
+        damages = self.damage_calculator.single_hit_damages(self.events, attacker, defender, move, ctx)
+        self.damage_calculator.release_context(ctx)
+        return damages
+
+    def calc_damages_batch(self,
+                           triples: list[tuple[Pokemon, Pokemon, Move | str]],
+                           critical: bool = False) -> np.ndarray:
+        """(攻撃側, 防御側, 技) の組ごとの16通りの乱数のダメージを (N, 16) の配列で返す"""
+        triples = [(a, d, Move(m) if isinstance(m, str) else m) for a, d, m in triples]
+        ctx = self.damage_calculator.acquire_context(critical)
+        damages = self.damage_calculator.batch_damages(self.events, triples, ctx)
+        self.damage_calculator.release_context(ctx)
+        return damages
+
+    def calc_damage_matrix(self,
+                           player: Player,
+                           critical: bool = False,
+                           terastal: bool = False) -> DamageMatrix:
+        """player のチームのすべての技で、相手のチームのすべてのポケモンを攻撃したときのダメージ"""
+        return self.damage_calculator.damage_matrix(
+            self.events, player.team, self.rival(player).team, critical, terastal)
+
+    def calc_lethal(self,
+                    attacker: Pokemon,
+                    moves: Move | str | list[Move | str],
+                    n_turns: int = 1,
+                    n_hits: int = 1,
+                    critical_prob: float = 0.,
+                    defender_move: Move | str | None = None) -> float:
+        """attacker が毎ターン技を使ったときに、n_turns ターン以内に相手が瀕死になる確率
+
+        分布は damage_calculator の hp_dstr などに保存する
+        """
+        return self.damage_calculator.calc_lethal(
+            self, attacker, self.foe(attacker), moves, n_turns, n_hits, critical_prob, defender_move)
 
     def has_interrupt(self) -> bool:
         return any(pl.interrupt != Interrupt.NONE for pl in self.players)
@@ -392,25 +634,65 @@ class Battle:
                 if only_first:
                     return
 
+    def own(self, player: Player, mon: Pokemon) -> Pokemon:
+        """控えのポケモンを変更する前に呼び、このバトル専用のポケモンを返す
+
+        複製元から借りているポケモンは複製して置き換える
+        複製先に貸しているポケモンはそのまま返し、複製先のほうを複製に置き換える
+        """
+        slot = (self.players.index(player), player.team.index(mon))
+        if slot in self.lenders:
+            self.journal.save_item(self.lenders, slot)
+            self.journal.save_list(player.team)
+            del self.lenders[slot]
+            mon = player.team[slot[1]] = mon.clone()
+            self.events.invalidate_index()
+        else:
+            for battle in list(self.borrowers):
+                battle.unshare(slot, mon)
+        return mon
+
+    def unshare(self, slot: tuple[int, int], mon: Pokemon):
+        """持ち主のバトルから借りている mon を複製に置き換える"""
+        team = self.players[slot[0]].team
+        if slot not in self.lenders or team[slot[1]] is not mon:
+            return
+        new = team[slot[1]] = mon.clone()
+        del self.lenders[slot]
+        self.events.invalidate_index()
+        # 巻き戻しで借りていたポケモンに戻らないように、記録の中の参照も置き換える
+        self.journal.replace(mon, new)
+
     def run_switch(self, player: Player, new: Pokemon, emit: bool = True):
+        new = self.own(player, new)
+
         # 割り込みフラグを破棄
         player.interrupt = Interrupt.NONE
 
         # 退場
         old = player.active
         if old is not None:
-            self.events.emit(Event.ON_SWITCH_OUT, EventContext(old))
+            self.events.emit_from(Event.ON_SWITCH_OUT, old)
+            self.journal.save_vars(old)
+            self.toggle_hash(old)
             old.switch_out(self.events)
+            self.toggle_hash(old)
             self.add_turn_log(player, f"{old.name} {'交代' if old.hp else '瀕死'}")
 
         # 入場
-        player.active_idx = player.team.index(new)
+        idx = player.team.index(new)
+        if self.hash_value is not None:
+            i = self.players.index(player)
+            self.hash_value ^= zobrist_key("active", i, player.active_idx) ^ zobrist_key("active", i, idx)
+        player.active_idx = idx
+        self.invalidate_speed_order()
+        self.journal.save_attrs(new, "observed")
         new.switch_in(self.events)
         self.add_turn_log(player, f"{new.name} 着地")
 
         # ポケモンが場に出た時の処理
         if emit:
-            self.events.emit(Event.ON_SWITCH_IN, EventContext(new))
+            self.events.emit_from(Event.ON_SWITCH_IN, new)
 
             # リクエストがなくなるまで再帰的に交代する
             while self.has_interrupt():
@@ -443,7 +725,11 @@ class Battle:
             # 交代を引き起こしたアイテムを消費させる
             if flag.consume_item():
                 self.add_turn_log(player, f"{player.active.item.name}消費")
+                self.journal.save_attrs(player.active.item, "active", "revealed")
+                self.toggle_hash(player.active)
                 player.active.item.consume()
+                self.toggle_hash(player.active)
+                self.invalidate_speed_order()
 
             # コマンドが予約されていなければ、プレイヤーの方策関数に従う
             if not player.reserved_commands:
@@ -461,7 +747,7 @@ class Battle:
             for mon in self.calc_speed_order():
                 player = self.find_player(mon)
                 if player in switched_players:
-                    self.events.emit(Event.ON_SWITCH_IN, EventContext(mon))
+                    self.events.emit_from(Event.ON_SWITCH_IN, mon)
 
     def run_faint_switch(self):
         '''
@@ -620,8 +906,7 @@ class Battle:
 
             if not self.has_interrupt():
                 # 交代技の後の処理
-                self.events.emit(Event.ON_AFTER_PIVOT,
-                                 EventContext(player.active))
+                self.events.emit_from(Event.ON_AFTER_PIVOT, player.active)
 
                 # だっしゅつパックによる割り込みフラグを更新
                 self.override_interrupt(interrupt)
@@ -0,0 +1,186 @@
+"""Battle の乱数
+
+乱数を引く箇所はすべて BattleRandom の chance, choice, shuffle を通す
+battle.random を差し替えることで、乱数の記録やすべての分岐の列挙ができる
+"""
+from __future__ import annotations
+from typing import TYPE_CHECKING, Any, Callable, MutableSequence, Sequence
+if TYPE_CHECKING:
+    from .battle import Battle
+    from .player import Player
+
+import random
+from random import Random
+from dataclasses import dataclass
+from itertools import permutations
+
+import numpy as np
+
+from jpoke.utils.enums import Command
+
+
+class BattleRandom(Random):
+    """Battle が使う乱数. label は乱数を引いた理由 (記録用)"""
+
+    def chance(self, p: float, label: str = "") -> bool:
+        """確率 p で True"""
+        return self.random() < p
+
+    def choice(self, seq: Sequence, label: str = ""):
+        return super().choice(seq)
+
+    def shuffle(self, x: MutableSequence, label: str = ""):
+        super().shuffle(x)
+
+
+@dataclass
+class Draw:
+    label: str
+    kind: str
+    result: Any
+
+
+class RecordingRandom(BattleRandom):
+    """引いた乱数をすべて記録する. 結果は BattleRandom と同じ"""
+
+    def __init__(self, x=None):
+        super().__init__(x)
+        self.draws: list[Draw] = []
+
+    def chance(self, p: float, label: str = "") -> bool:
+        result = super().chance(p)
+        self.draws.append(Draw(label, f"chance({p:g})", result))
+        return result
+
+    def choice(self, seq: Sequence, label: str = ""):
+        result = super().choice(seq)
+        self.draws.append(Draw(label, f"choice({len(seq)})", result))
+        return result
+
+    def shuffle(self, x: MutableSequence, label: str = ""):
+        super().shuffle(x)
+        self.draws.append(Draw(label, f"shuffle({len(x)})", list(x)))
+
+
+class EnumeratingRandom(BattleRandom):
+    """指定した順番の結果を返し、各乱数の分布を記録する
+
+    script[k] は k 番目に引く乱数の何番目の結果を返すか. script より後は0番目を返す
+    同じ結果になる選択肢 (同じダメージの乱数など) はまとめて1つの結果とする
+    """
+
+    def __init__(self, x=None):
+        super().__init__(x)
+        self.start([])
+
+    def start(self, script: list[int]):
+        self.script: list[int] = script
+        self.path: list[int] = []
+        self.distributions: list[list[tuple[Any, float]]] = []
+
+    def draw(self, outcomes: list[tuple[Any, float]]):
+        k = len(self.path)
+        i = self.script[k] if k < len(self.script) else 0
+        if i >= len(outcomes):
+            raise Exception("The replayed turn drew different random numbers.")
+        self.path.append(i)
+        self.distributions.append(outcomes)
+        return outcomes[i][0]
+
+    def chance(self, p: float, label: str = "") -> bool:
+        p = min(max(p, 0.), 1.)
+        return self.draw([(v, q) for v, q in [(True, p), (False, 1 - p)] if q > 0])
+
+    def choice(self, seq: Sequence, label: str = ""):
+        counts: dict[Any, int] = {}
+        for v in seq:
+            counts[v] = counts.get(v, 0) + 1
+        return self.draw([(v, n / len(seq)) for v, n in counts.items()])
+
+    def shuffle(self, x: MutableSequence, label: str = ""):
+        orders = list(dict.fromkeys(permutations(x)))
+        x[:] = self.draw([(list(order), 1 / len(orders)) for order in orders])
+
+
+class TooManyBranches(Exception):
+    """乱数の分岐が多すぎて列挙できない"""
+
+
+@dataclass
+class Outcome:
+    """ターン終了後の局面. Battle.encode の配列が一致する分岐はまとめる
+
+    異なる局面が同じ state_hash を持つことがある (ハッシュ値に含まれない状態のみが異なる場合)
+    """
+    probability: float
+    state_hash: int
+    state: np.ndarray
+    value: float | None
+    n_paths: int = 1
+
+
+def enumerate_outcomes(battle: Battle,
+                       commands: dict[Player, Command],
+                       value_fn: Callable[[Battle], float] | None = None,
+                       max_paths: int = 100000) -> list[Outcome]:
+    """コマンドの組で1ターン進めたときの、すべての乱数の分岐とその確率
+
+    分岐ごとにターンを再生し、checkpoint/rollback で元に戻す
+    value_fn があれば各局面の評価値を計算する. 局面は Battle.decode で復元できる
+    プレイヤーの方策が使う random モジュールは再生のたびに同じ状態に戻す
+    """
+    original = battle.random
+    global_state = random.getstate()
+    journal_active = battle.journal.active
+    rng = EnumeratingRandom()
+    battle.random = rng
+    battle.state_hash()
+
+    outcomes: dict[bytes, Outcome] = {}
+    stack: list[tuple[list[int], float]] = [([], 1.)]
+    n_paths = 0
+    try:
+        while stack:
+            script, prob = stack.pop()
+            n_paths += 1
+            if n_paths > max_paths:
+                raise TooManyBranches(f"More than {max_paths} random branches.")
+
+            rng.start(script)
+            random.setstate(global_state)
+            cp = battle.checkpoint()
+            try:
+                battle.advance_turn(commands)
+
+                # script より後に引いた乱数の、0番目以外の結果を分岐として追加する
+                for k in range(len(script), len(rng.path)):
+                    dist = rng.distributions[k]
+                    for i in range(1, len(dist)):
+                        stack.append((rng.path[:k] + [i], prob * dist[i][1]))
+                    prob *= dist[0][1]
+
+                # ハッシュ値に含まれない状態 (技の公開など) も区別するため、配列の全体が一致する分岐だけをまとめる
+                state = battle.encode()
+                key = state.tobytes()
+                if key in outcomes:
+                    outcomes[key].probability += prob
+                    outcomes[key].n_paths += 1
+                else:
+                    outcomes[key] = Outcome(prob, battle.state_hash(), state,
+                                            value_fn(battle) if value_fn else None)
+            finally:
+                battle.rollback(cp)
+    finally:
+        battle.random = original
+        random.setstate(global_state)
+        if not journal_active:
+            battle.clear_checkpoints()
+
+    return sorted(outcomes.values(), key=lambda o: -o.probability)
+
+
+def expected_value(battle: Battle,
+                   commands: dict[Player, Command],
+                   value_fn: Callable[[Battle], float]) -> float:
+    """コマンドの組で1ターン進めたときの評価値の期待値"""
+    return sum(o.probability * o.value for o in enumerate_outcomes(battle, commands, value_fn))  # type: ignore
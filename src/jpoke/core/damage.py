@@ -1,27 +1,203 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Sequence
 if TYPE_CHECKING:
-    from jpoke.model import Pokemon, Ability, Move
+    from jpoke.model import Pokemon, Ability
+    from .battle import Battle
 
 from dataclasses import dataclass
-from decimal import Decimal, ROUND_HALF_DOWN
+from collections import OrderedDict
+import sys
+
+import numpy as np
 
 from jpoke.utils.types import Stat
 from jpoke.utils import fast_copy
+from jpoke.model import Move
+
+from .event import EventManager, Event
+
+
+def rank_fraction(v: int) -> tuple[int, int]:
+    """ランク補正の (分子, 分母)"""
+    return (2+v, 2) if v >= 0 else (2, 2-v)
+
+
+def to_4096(r: float) -> int:
+    """倍率を 4096 を 1 倍とする整数に変換する"""
+    return r * 4096 if isinstance(r, int) else int(r * 4096)
 
-from .event import EventManager, Event, EventContext
-
-
-def rank_modifier(v: float) -> float:
-    return (2+v)/2 if v >= 0 else 2/(2-v)
-
 
-def round_half_down(v: float) -> int:
-    """五捨五超入"""
-    return int(Decimal(str(v)).quantize(Decimal('0'), rounding=ROUND_HALF_DOWN))
+def round_half_down_div(a: int, b: int) -> int:
+    """a / b を五捨五超入で整数に丸める (a >= 0, b > 0)"""
+    return (2*a + b - 1) // (2*b)
+
+
+def apply_modifier(v: int, r: int) -> int:
+    """4096 を 1 倍とする補正 r をかけて五捨五超入で丸める"""
+    return (v*r + 2047) // 4096
+
 
+# 乱数 85~100%
+ROLLS = np.arange(85, 101, dtype=np.int64)
+
+# resolve_inputs が返す、イベントを解決した後のダメージ計算の入力
+# r_pow は 4096*4096 を、それ以外の補正は 4096 を 1 倍とする
+DAMAGE_INPUTS = ("level", "power", "r_pow", "atk", "atk_rank", "r_atk", "def", "def_rank", "r_def",
+                 "critical", "r_atk_type", "r_def_type", "r_dmg")
+
+
+def max_damage(level: int, power: int, r_pow: int,
+               atk: int, atk_rank: int, r_atk: int,
+               dfn: int, def_rank: int, r_def: int,
+               critical: bool) -> int:
+    """最大乱数ダメージ"""
+    final_pow = max(1, round_half_down_div(power * r_pow, 4096*4096))
+    if atk_rank:
+        num, den = rank_fraction(atk_rank)
+        atk = atk * num // den
+    final_atk = max(1, apply_modifier(atk, r_atk))
+    if def_rank:
+        num, den = rank_fraction(def_rank)
+        dfn = dfn * num // den
+    final_def = max(1, apply_modifier(dfn, r_def))
+    dmg = (level*2//5 + 2) * final_pow * final_atk // final_def // 50 + 2
+    return apply_modifier(dmg, 6144) if critical else dmg
+
+
+def max_damages(inputs: np.ndarray) -> np.ndarray:
+    """(N, len(DAMAGE_INPUTS)) の入力から最大乱数ダメージ (N,) をまとめて計算する. max_damage と同じ結果になる"""
+    level, power, r_pow, atk, atk_rank, r_atk, dfn, def_rank, r_def, critical = inputs.T[:10]
+    final_pow = np.maximum(1, (2*power*r_pow + 4096*4096 - 1) // (2*4096*4096))
+    atk = atk * np.where(atk_rank >= 0, 2 + atk_rank, 2) // np.where(atk_rank >= 0, 2, 2 - atk_rank)
+    final_atk = np.maximum(1, (atk*r_atk + 2047) // 4096)
+    dfn = dfn * np.where(def_rank >= 0, 2 + def_rank, 2) // np.where(def_rank >= 0, 2, 2 - def_rank)
+    final_def = np.maximum(1, (dfn*r_def + 2047) // 4096)
+    dmg = (level*2//5 + 2) * final_pow * final_atk // final_def // 50 + 2
+    dmg = np.where(critical != 0, (dmg*6144 + 2047) // 4096, dmg)
+    # 威力のない技は 0
+    return np.where(power > 0, dmg, 0)
+
+
+def roll_damage_list(max_dmg: int, r_atk_type: int, r_def_type: int, r_dmg: int) -> list[int]:
+    """roll_damages の1件分. 要素が16個なら numpy を介さない方が速い"""
+    # 最低ダメージ補償
+    min_dmg = 1 if max_dmg and r_def_type and r_dmg else 0
+    dmgs = []
+    for roll in range(85, 101):
+        dmg = apply_modifier(max_dmg * roll // 100, r_atk_type)
+        dmg = apply_modifier(dmg * r_def_type // 4096, r_dmg)
+        dmgs.append(dmg or min_dmg)
+    return dmgs
+
+
+def roll_damages(max_dmg, r_atk_type, r_def_type, r_dmg) -> np.ndarray:
+    """最大乱数ダメージと補正 (それぞれ (N,) または整数) から、16通りの乱数のダメージ (N, 16) を計算する
+
+    乱数の後に、タイプ一致などの補正 (五捨五超入)、タイプ相性 (切り捨て)、ダメージ補正 (五捨五超入) の順に
+    1段ずつ丸める. タイプ相性は 2 の累乗なので、タイプごとに切り捨てても結果は同じ
+    """
+    max_dmg, r_atk_type, r_def_type, r_dmg = (
+        np.asarray(v, dtype=np.int64).reshape(-1, 1) for v in (max_dmg, r_atk_type, r_def_type, r_dmg))
+    dmgs = max_dmg * ROLLS // 100
+    dmgs = (dmgs*r_atk_type + 2047) // 4096
+    dmgs = dmgs * r_def_type // 4096
+    dmgs = (dmgs*r_dmg + 2047) // 4096
+    # 最低ダメージ補償
+    min_dmg = ((max_dmg > 0) & (r_def_type > 0) & (r_dmg > 0)).astype(np.int64)
+    return np.where(dmgs == 0, min_dmg, dmgs)
+
+
+def damage_pmf(damages: Sequence[int]) -> np.ndarray:
+    """等確率のダメージの列から、ダメージの確率分布 (添字がダメージ)"""
+    return np.bincount(damages) / len(damages)
+
+
+def mix_pmf(a: np.ndarray, b: np.ndarray, p: float) -> np.ndarray:
+    """確率 1-p で a、確率 p で b になる分布"""
+    if p <= 0:
+        return a
+    if p >= 1:
+        return b
+    pmf = np.zeros(max(len(a), len(b)))
+    pmf[:len(a)] += (1-p) * a
+    pmf[:len(b)] += p * b
+    return pmf
+
+
+def apply_pmf(lost: np.ndarray, pmf: np.ndarray) -> tuple[np.ndarray, float]:
+    """減ったHPの分布 (添字が減ったHP、長さが残りHP) にダメージの分布を適用する
+
+    HPが残りHP以上減る確率 (瀕死になる確率) は切り捨てて返す. 分布の大きさは残りHPを超えない
+    """
+    hp = len(lost)
+    new = np.convolve(lost, pmf)
+    return new[:hp], float(new[hp:].sum())
+
+
+class DamageCache:
+    """解決済みの入力 (DAMAGE_INPUTS) から16通りの乱数のダメージへの LRU キャッシュ
+
+    値は入力だけで決まるので、複製したバトルどうしで共有してよい
+    max_size はエントリ数の上限で、0 ならキャッシュしない. 1エントリはおよそ ENTRY_BYTES バイト
+    """
+    ENTRY_BYTES = 500
+
+    def __init__(self, max_size: int = 1 << 16):
+        self.max_size: int = max_size
+        self.data: OrderedDict[tuple[int, ...], tuple[int, ...]] = OrderedDict()
+        self.n_hits: int = 0
+        self.n_misses: int = 0
+        self.n_evictions: int = 0
+
+    @classmethod
+    def from_bytes(cls, max_bytes: int) -> DamageCache:
+        """メモリ使用量の上限 (バイト) を指定して作る"""
+        return cls(max_bytes // cls.ENTRY_BYTES)
+
+    def __len__(self) -> int:
+        return len(self.data)
 
-@dataclass
+    def __deepcopy__(self, memo):
+        # 複製しても同じキャッシュを使う
+        return self
+
+    def get(self, key: tuple[int, ...]) -> tuple[int, ...] | None:
+        value = self.data.get(key)
+        if value is None:
+            self.n_misses += 1
+            return None
+        self.n_hits += 1
+        self.data.move_to_end(key)
+        return value
+
+    def put(self, key: tuple[int, ...], value: tuple[int, ...]):
+        if self.max_size <= 0:
+            return
+        self.data[key] = value
+        while len(self.data) > self.max_size:
+            # 最も長く使われていない結果を捨てる
+            self.data.popitem(last=False)
+            self.n_evictions += 1
+
+    def clear(self):
+        self.data.clear()
+
+    def memory_usage(self) -> int:
+        """キーと値のタプルと、辞書のおおよそのメモリ使用量 (バイト)"""
+        n = len(self.data)
+        if not n:
+            return sys.getsizeof(self.data)
+        key, value = next(iter(self.data.items()))
+        return sys.getsizeof(self.data) + n * (sys.getsizeof(key) + sys.getsizeof(value))
+
+    def stats(self) -> dict:
+        n = self.n_hits + self.n_misses
+        return {"size": len(self.data), "max_size": self.max_size, "hits": self.n_hits,
+                "misses": self.n_misses, "evictions": self.n_evictions,
+                "hit_rate": self.n_hits / n if n else 0.}
+
+
+@dataclass(slots=True)
 class DamageContext:
     critical: bool = False
     self_harm: bool = False
@@ -29,23 +205,83 @@ class DamageContext:
     is_lethal_calc: bool = False
 
 
+@dataclass
+class DamageMatrix:
+    """チームどうしのダメージ. damages は (急所, テラスタル, 攻撃側, 技, 防御側, 乱数) の配列
+
+    criticals[c] は急所かどうか、terastals[t] は (攻撃側, 防御側) がテラスタルしているかどうか
+    moves[a][m] は攻撃側 a の m 番目の技の名前. 威力のない技と、技がない枠のダメージは 0
+    """
+    criticals: list[bool]
+    terastals: list[tuple[bool, bool]]
+    moves: list[list[str]]
+    max_hps: np.ndarray
+    damages: np.ndarray
+
+    @property
+    def min_damage(self) -> np.ndarray:
+        return self.damages[..., 0]
+
+    @property
+    def max_damage(self) -> np.ndarray:
+        return self.damages[..., -1]
+
+    @property
+    def min_percent(self) -> np.ndarray:
+        """最低ダメージの、防御側の最大HPに対する割合 [%]"""
+        return 100 * self.min_damage / self.max_hps
+
+    @property
+    def max_percent(self) -> np.ndarray:
+        """最大ダメージの、防御側の最大HPに対する割合 [%]"""
+        return 100 * self.max_damage / self.max_hps
+
+
 class DamageCalculator:
-    def __init__(self):
+    def __init__(self, cache: DamageCache | None = None):
         self.logs: list[str] = []
 
+        # 解決済みの入力ごとのダメージ. 複製したバトルと共有する
+        self.cache: DamageCache = cache if cache is not None else DamageCache()
+
+        # calc_lethal の結果
         self.lethal_num: int = 0
         self.lethal_prob: float = 0.
-        self.hp_dstr: dict = {}
-        self.damage_dstr: dict = {}
-        self.damage_ratio_dstr: dict = {}
+        self.hp_dstr: dict[int, float] = {}
+        self.damage_dstr: dict[int, float] = {}
+        self.damage_ratio_dstr: dict[float, float] = {}
+
+        # 使い終わったコンテキストの置き場
+        self.context_pool: list[DamageContext] = []
 
     def __deepcopy__(self, memo):
         cls = self.__class__
         new = cls.__new__(cls)
         memo[id(self)] = new
         fast_copy(self, new)
+        new.context_pool = []
+        new.cache = self.cache
         return new
 
+    def acquire_context(self,
+                        critical: bool = False,
+                        self_harm: bool = False,
+                        power_multiplier: float = 1,
+                        is_lethal_calc: bool = False) -> DamageContext:
+        """プールからコンテキストを取り出して初期化する"""
+        if not self.context_pool:
+            return DamageContext(critical, self_harm, power_multiplier, is_lethal_calc)
+        ctx = self.context_pool.pop()
+        ctx.critical = critical
+        ctx.self_harm = self_harm
+        ctx.power_multiplier = power_multiplier
+        ctx.is_lethal_calc = is_lethal_calc
+        return ctx
+
+    def release_context(self, ctx: DamageContext):
+        """使い終わったコンテキストをプールに戻す"""
+        self.context_pool.append(ctx)
+
     def single_hit_damages(self,
                            events: EventManager,
                            attacker: Pokemon,
@@ -54,27 +290,55 @@ class DamageCalculator:
                            dmg_ctx: DamageContext | None = None) -> list[int]:
         if not move.data.power:
             return [0]
-
+        inputs = self.resolve_inputs(events, attacker, defender, move, dmg_ctx)
+        damages = self.cache.get(inputs)
+        if damages is None:
+            damages = tuple(roll_damage_list(max_damage(*inputs[:10]), *inputs[10:]))
+            self.cache.put(inputs, damages)
+        return list(damages)
+
+    def batch_damages(self,
+                      events: EventManager,
+                      triples: Sequence[tuple[Pokemon, Pokemon, Move]],
+                      dmg_ctx: DamageContext | None = None) -> np.ndarray:
+        """(攻撃側, 防御側, 技) の組ごとの16通りの乱数のダメージ (N, 16)
+
+        イベントの解決は組ごとに行い、ダメージの計算はまとめて行う. 威力のない技の行は 0
+        """
+        if not triples:
+            return np.zeros((0, 16), dtype=np.int64)
+        inputs = np.array([self.resolve_inputs(events, attacker, defender, move, dmg_ctx)
+                           for attacker, defender, move in triples], dtype=np.int64)
+        return roll_damages(max_damages(inputs), *inputs[:, 10:].T)
+
+    def resolve_inputs(self,
+                       events: EventManager,
+                       attacker: Pokemon,
+                       defender: Pokemon,
+                       move: Move,
+                       dmg_ctx: DamageContext | None = None) -> tuple[int, ...]:
+        """イベントを発火して補正とランクを確定させ、DAMAGE_INPUTS の順に返す"""
         if not dmg_ctx:
             dmg_ctx = DamageContext()
 
         move_category = attacker.effective_move_category(move, events)
 
+        # 補正はすべて 4096 を 1 倍とする整数で計算する
         # ---------------- 最終威力 ----------------
         # 技威力
-        final_pow = move.data.power * dmg_ctx.power_multiplier
+        r_pow = to_4096(dmg_ctx.power_multiplier)
 
         # その他の補正
-        r_pow = events.emit(Event.ON_CALC_POWER_MODIFIER,
-                            EventContext(attacker, move), 4096)
-        final_pow = round_half_down(final_pow * r_pow/4096)
-        final_pow = max(1, final_pow)
+        if events.has_handlers(Event.ON_CALC_POWER_MODIFIER):
+            r_pow *= events.emit_from(Event.ON_CALC_POWER_MODIFIER, attacker, 4096, move=move)
+        else:
+            r_pow *= 4096
 
         # ---------------- 最終攻撃 ----------------
         # ステータス
         if move == 'イカサマ':
-            final_atk = defender.stats["A"]
-            r_rank = rank_modifier(defender.rank["A"])
+            atk = defender.stats["A"]
+            atk_rank = defender.rank["A"]
         else:
             if move == 'ボディプレス':
                 stat = "B"
@@ -82,32 +346,31 @@ class DamageCalculator:
                 stat = "A"
             else:
                 stat = "C"
-            final_atk = attacker.stats[stat]
-            r_rank = rank_modifier(attacker.rank[stat])
+            atk = attacker.stats[stat]
+            atk_rank = attacker.rank[stat]
 
         # ランク補正の修正
-        def_ability: Ability = events.emit(
-            Event.ON_CHECK_DEF_ABILITY, EventContext(defender, move), defender.ability)
+        def_ability: Ability = defender.ability
+        if events.has_handlers(Event.ON_CHECK_DEF_ABILITY):
+            def_ability = events.emit_from(
+                Event.ON_CHECK_DEF_ABILITY, defender, defender.ability, move=move)
 
-        if def_ability == 'てんねん' and r_rank != 1:
-            r_rank = 1
+        if def_ability == 'てんねん' and atk_rank:
+            atk_rank = 0
             self.logs.append(f"{def_ability.name}")
 
-        if dmg_ctx.critical and r_rank < 1:
-            r_rank = 1
+        if dmg_ctx.critical and atk_rank < 0:
+            atk_rank = 0
             self.logs.append('急所 AC下降無視')
 
-        if r_rank != 1:
-            self.logs.append(f"攻撃ランク x{r_rank:.1f}")
-
-        # ランク補正
-        final_atk = int(final_atk * r_rank)
+        if atk_rank:
+            num, den = rank_fraction(atk_rank)
+            self.logs.append(f"攻撃ランク x{num/den:.1f}")
 
         # その他の補正
-        r_atk = events.emit(Event.ON_CALC_ATK_MODIFIER,
-                            EventContext(attacker, move), 4096)
-        final_atk = round_half_down(final_atk * r_atk/4096)
-        final_atk = max(1, final_atk)
+        r_atk = 4096
+        if events.has_handlers(Event.ON_CALC_ATK_MODIFIER):
+            r_atk = events.emit_from(Event.ON_CALC_ATK_MODIFIER, attacker, 4096, move=move)
 
         # ---------------- 最終防御 ----------------
         # ステータス
@@ -116,60 +379,189 @@ class DamageCalculator:
         else:
             stat = "D"
 
-        final_def = defender.stats[stat]
-        r_rank = rank_modifier(defender.rank[stat])
+        dfn = defender.stats[stat]
+        def_rank = defender.rank[stat]
 
         # ランク補正の修正
-        if "ignore_rank" in move.data.flags and r_rank != 1:
-            r_rank = 1
+        if "ignore_rank" in move.data.flags and def_rank:
+            def_rank = 0
             self.logs.append(f"{move.name} 防御ランク無視")
 
-        if attacker.ability == 'てんねん' and r_rank != 1:
-            r_rank = 1
+        if attacker.ability == 'てんねん' and def_rank:
+            def_rank = 0
             self.logs.append(f"{def_ability.name}")
 
-        if dmg_ctx.critical and r_rank > 1:
-            r_rank = 1
+        if dmg_ctx.critical and def_rank > 0:
+            def_rank = 0
             self.logs.append('急所 BD上昇無視')
 
-        if r_rank != 1:
-            self.logs.append(f"防御ランク x{r_rank:.1f}")
-
-        # ランク補正
-        final_def = int(final_def * r_rank)
+        if def_rank:
+            num, den = rank_fraction(def_rank)
+            self.logs.append(f"防御ランク x{num/den:.1f}")
 
         # その他の補正
-        r_def = events.emit(Event.ON_CALC_DEF_MODIFIER,
-                            EventContext(defender, move), 4096)
-        final_def = round_half_down(final_def * r_def/4096)
-        final_def = max(1, final_def)
+        r_def = 4096
+        if events.has_handlers(Event.ON_CALC_DEF_MODIFIER):
+            r_def = events.emit_from(Event.ON_CALC_DEF_MODIFIER, defender, 4096, move=move)
 
         # ---------------- ダメージ計算 ----------------
-        # 最大乱数ダメージ
-        max_dmg = int(int(int(attacker.level*0.4+2)*final_pow*final_atk/final_def)/50+2)
-
         # 急所
         if dmg_ctx.critical:
-            max_dmg = round_half_down(max_dmg * 1.5)
             self.logs.append("急所 x1.5")
 
         # その他の補正
-        r_atk_type = events.emit(Event.ON_CALC_ATK_TYPE_MODIFIER, EventContext(attacker, move), 4096)
-        r_def_type = events.emit(Event.ON_CALC_DEF_TYPE_MODIFIER, EventContext(defender, move), 1)
-        r_dmg = events.emit(Event.ON_CALC_DAMAGE_MODIFIER, EventContext(attacker, move), 1)
-
-        dmgs = [0]*16
-        for i in range(16):
-            # 乱数 85~100%
-            dmgs[i] = int(max_dmg * (0.85+0.01*i))
-
-            # 補正
-            dmgs[i] = round_half_down(dmgs[i] * r_atk_type)
-            dmgs[i] = int(dmgs[i] * r_def_type)
-            dmgs[i] = round_half_down(dmgs[i] * r_dmg/4096)
-
-            # 最低ダメージ補償
-            if dmgs[i] == 0 and r_def_type * r_dmg > 0:
-                dmgs[i] = 1
-
-        return dmgs
+        r_atk_type, r_def_type, r_dmg = 4096, 4096, 4096
+        if events.has_handlers(Event.ON_CALC_ATK_TYPE_MODIFIER):
+            r_atk_type = events.emit_from(Event.ON_CALC_ATK_TYPE_MODIFIER, attacker, 4096, move=move)
+        if events.has_handlers(Event.ON_CALC_DEF_TYPE_MODIFIER):
+            r_def_type = to_4096(events.emit_from(Event.ON_CALC_DEF_TYPE_MODIFIER, defender, 1, move=move))
+        if events.has_handlers(Event.ON_CALC_DAMAGE_MODIFIER):
+            r_dmg = to_4096(events.emit_from(Event.ON_CALC_DAMAGE_MODIFIER, attacker, 1, move=move))
+
+        return (attacker.level, move.data.power or 0, r_pow, atk, atk_rank, r_atk, dfn, def_rank, r_def,
+                dmg_ctx.critical, r_atk_type, r_def_type, r_dmg)
+
+    def damage_matrix(self,
+                      events: EventManager,
+                      attackers: Sequence[Pokemon],
+                      defenders: Sequence[Pokemon],
+                      critical: bool = False,
+                      terastal: bool = False) -> DamageMatrix:
+        """攻撃側のチームのすべての技で、防御側のチームのすべてのポケモンを攻撃したときのダメージ
+
+        critical=True なら急所の場合を、terastal=True なら攻撃側と防御側がそれぞれテラスタルした場合を加える
+        すべての組み合わせの入力を解決してから、ダメージはまとめて計算する
+        """
+        criticals = [False, True] if critical else [False]
+        terastals = [(False, False)]
+        if terastal:
+            terastals += [(True, False), (False, True), (True, True)]
+        n_moves = max((len(mon.moves) for mon in attackers), default=0)
+        shape = (len(criticals), len(terastals), len(attackers), n_moves, len(defenders))
+
+        # 威力のある技の組み合わせだけ入力を解決する
+        idxes, inputs = [], []
+        # テラスタルの有無は一時的に書き換えて、最後に元に戻す
+        mons = list(attackers) + list(defenders)
+        terastallized = [mon.terastallized for mon in mons]
+        try:
+            for t, (atk_tera, def_tera) in enumerate(terastals):
+                for mon, flag in zip(attackers, terastallized):
+                    mon.terastallized = flag or (atk_tera and mon.can_terastallize())
+                for mon, flag in zip(defenders, terastallized[len(attackers):]):
+                    mon.terastallized = flag or (def_tera and mon.can_terastallize())
+                for c, crit in enumerate(criticals):
+                    ctx = DamageContext(critical=crit)
+                    for a, attacker in enumerate(attackers):
+                        for m, move in enumerate(attacker.moves):
+                            if not move.data.power:
+                                continue
+                            for d, defender in enumerate(defenders):
+                                idxes.append((c, t, a, m, d))
+                                inputs.append(self.resolve_inputs(events, attacker, defender, move, ctx))
+        finally:
+            for mon, flag in zip(mons, terastallized):
+                mon.terastallized = flag
+
+        damages = np.zeros(shape + (16,), dtype=np.int64)
+        if inputs:
+            rows = np.array(inputs, dtype=np.int64)
+            damages[tuple(np.array(idxes).T)] = roll_damages(max_damages(rows), *rows[:, 10:].T)
+
+        return DamageMatrix(
+            criticals=criticals,
+            terastals=terastals,
+            moves=[[move.name for move in mon.moves] for mon in attackers],
+            max_hps=np.array([mon.max_hp for mon in defenders]),
+            damages=damages,
+        )
+
+    def calc_lethal(self,
+                    battle: Battle,
+                    attacker: Pokemon,
+                    defender: Pokemon,
+                    moves: Move | str | Sequence[Move | str],
+                    n_turns: int = 1,
+                    n_hits: int = 1,
+                    critical_prob: float = 0.,
+                    defender_move: Move | str | None = None) -> float:
+        """attacker が毎ターン技を使ったときに、n_turns ターン以内に defender が瀕死になる確率
+
+        moves はターンごとの技で、足りなければ最後の技を繰り返す. 1回の技で n_hits 回攻撃する
+        ダメージ乱数、命中、急所 (確率 critical_prob) のほかに、defender への次のダメージを含める
+            いのちのたま   : defender_move が攻撃技で命中したときの反動
+            すなあらし     : 残りターン数の間のターン終了時のダメージ
+            どく, もうどく : ターン終了時のダメージ. もうどくはターンごとに増える
+        ダメージの分布を畳み込み、瀕死でない場合の減ったHPの分布と瀕死になる確率で保持する
+        分布の大きさは残りHPを超えないので、ターン数に比例する計算量で済む
+
+        結果は lethal_num (瀕死になる確率が正になる最初のターン, なければ 0)、lethal_prob、
+        n_turns 後の hp_dstr {残りHP: 確率}、damage_dstr {減ったHP: 確率}、damage_ratio_dstr {減ったHPの割合: 確率} に保存する
+        """
+        if isinstance(moves, (Move, str)):
+            moves = [moves]
+        moves = [Move(m) if isinstance(m, str) else m for m in moves]
+        if isinstance(defender_move, str):
+            defender_move = Move(defender_move)
+
+        # 技ごとの1回の技のダメージ分布
+        move_pmfs: dict[str, np.ndarray] = {}
+        for move in moves:
+            if move.name in move_pmfs:
+                continue
+            pmf = np.ones(1)
+            if move.data.power:
+                hit = damage_pmf(self.single_hit_damages(
+                    battle.events, attacker, defender, move, DamageContext(is_lethal_calc=True)))
+                if critical_prob > 0:
+                    hit = mix_pmf(hit, damage_pmf(self.single_hit_damages(
+                        battle.events, attacker, defender, move, DamageContext(critical=True, is_lethal_calc=True))),
+                        critical_prob)
+                for _ in range(n_hits):
+                    pmf = np.convolve(pmf, hit)
+                pmf = mix_pmf(np.ones(1), pmf, battle.hit_probability(attacker, move))
+            move_pmfs[move.name] = pmf
+
+        # いのちのたまの反動
+        recoil_pmf = None
+        if defender_move is not None and defender_move.category != "変化" and defender.item == "いのちのたま":
+            recoil = np.zeros(-int(defender.max_hp * -1/8) + 1)
+            recoil[-1] = 1.
+            recoil_pmf = mix_pmf(np.ones(1), recoil, battle.hit_probability(defender, defender_move))
+
+        # 瀕死になる確率と、瀕死でない場合の減ったHPの分布
+        ko = 0. if defender.hp else 1.
+        lost = np.zeros(defender.hp)
+        lost[:1] = 1.
+        weather = battle.field.fields["weather"]
+        self.lethal_num = 0
+        for t in range(1, n_turns + 1 if defender.hp else 1):
+            pmfs = [move_pmfs[moves[min(t, len(moves)) - 1].name]]
+            if recoil_pmf is not None:
+                pmfs.append(recoil_pmf)
+
+            # ターン終了時のダメージ
+            chip = 0
+            if weather == "すなあらし" and weather.count - t > 0:
+                chip -= int(defender.max_hp * -1/16)
+            if defender.ailment == "どく":
+                chip -= int(defender.max_hp * -1/8)
+            elif defender.ailment == "もうどく":
+                chip -= int(defender.max_hp * max(-1, -(defender.ailment.count + t)/16))
+            if chip:
+                pmfs.append(np.eye(1, chip + 1, chip)[0])
+
+            for pmf in pmfs:
+                lost, p = apply_pmf(lost, pmf)
+                ko += p
+
+            if not self.lethal_num and ko > 0:
+                self.lethal_num = t
+
+        self.lethal_prob = ko
+        self.damage_dstr = {int(d): float(lost[d]) for d in np.flatnonzero(lost)}
+        if ko > 0:
+            self.damage_dstr[defender.hp] = ko
+        self.hp_dstr = {defender.hp - d: p for d, p in self.damage_dstr.items()}
+        self.damage_ratio_dstr = {d / defender.max_hp: p for d, p in self.damage_dstr.items()}
+        return self.lethal_prob
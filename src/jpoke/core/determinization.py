@@ -0,0 +1,169 @@
+"""相手の非公開情報の標本化 (determinization)
+
+公開された情報 (場に出たポケモン、判明した特性・持ち物・技) と矛盾しないように、
+相手の選出、特性、持ち物、技を N 通りまとめて生成する
+生成は NumPy でまとめて行い、各標本はバトルに上書きして使う (apply)
+"""
+from __future__ import annotations
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from .battle import Battle
+    from .player import Player
+
+from copy import deepcopy
+from dataclasses import dataclass
+
+import numpy as np
+
+from jpoke.data import ABILITIES, ITEMS, MOVES
+from jpoke.data.models import AbilityData, ItemData, MoveData
+from jpoke.model import Move
+
+from .encoding import ABILITY_NAMES, ITEM_NAMES, MOVE_NAMES, ABILITY_IDS, ITEM_IDS, MOVE_IDS, N_MOVES
+
+
+# 標本に使う持ち物と技. 実装済み (データクラスで定義されている) のもの
+ITEM_POOL = [k for k, v in ITEMS.items() if isinstance(v, ItemData)]
+MOVE_POOL = [k for k, v in MOVES.items() if isinstance(v, MoveData) and k != "わるあがき"]
+
+
+def ability_candidates(mon) -> list[str]:
+    """種族の特性のうち実装済みのもの. なければ特性なし"""
+    return [a for a in mon.data.abilities if isinstance(ABILITIES.get(a), AbilityData)] or [""]
+
+
+def _sample_subsets(rng: np.random.Generator, pool: np.ndarray, n: int, k: int) -> np.ndarray:
+    """pool から重複なしに k 個選ぶことを n 回行う. (n, k) の配列"""
+    if k <= 0 or not len(pool):
+        return np.zeros((n, 0), dtype=pool.dtype)
+    k = min(k, len(pool))
+    keys = rng.random((n, len(pool)))
+    idxes = np.argpartition(keys, k - 1, axis=1)[:, :k] if k < len(pool) else np.argsort(keys, axis=1)
+    return pool[idxes]
+
+
+@dataclass
+class Determinizations:
+    """プレイヤー idx のチームの標本 n 通り
+
+    abilities, items は (n, チームの数) の ID、moves は (n, チームの数, N_MOVES) の ID (0 は空き)、
+    selections は (n, 選出数) のチーム内の番号
+    """
+    idx: int
+    abilities: np.ndarray
+    items: np.ndarray
+    moves: np.ndarray
+    selections: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.abilities)
+
+    def apply(self, battle: Battle, i: int):
+        """i 番目の標本をバトルに上書きする
+
+        変更は journal に記録するので、checkpoint を記録してから呼び出せば rollback で元に戻せる
+        """
+        player = battle.players[self.idx]
+        journal = battle.journal
+
+        journal.save_attrs(player, "selection_idxes")
+        player.selection_idxes = self.selections[i].tolist()
+
+        rows = zip(self.abilities[i].tolist(), self.items[i].tolist(), self.moves[i].tolist())
+        for mon, (ability_id, item_id, move_ids) in zip(list(player.team), rows):
+            ability = ABILITY_NAMES[ability_id]
+            item = ITEM_NAMES[item_id]
+            moves = [MOVE_NAMES[k] for k in move_ids if k]
+            same_ability = mon.ability.data.name == ability
+            same_item = mon.item.data.name == item
+            if same_ability and same_item and [move.data.name for move in mon.moves] == moves:
+                continue
+
+            mon = battle.own(player, mon)
+            active = mon is player.active
+            battle.toggle_hash(mon)
+
+            if not same_ability:
+                if active and mon.ability.active:
+                    mon.ability.unregister_handlers(battle.events, mon)
+                journal.save_attrs(mon, "_ability")
+                mon.ability = ability
+                if active:
+                    mon.ability.register_handlers(battle.events, mon)
+
+            if not same_item:
+                if active and mon.item.active:
+                    mon.item.unregister_handlers(battle.events, mon)
+                journal.save_attrs(mon, "_item")
+                mon.item = item
+                if active:
+                    mon.item.register_handlers(battle.events, mon)
+
+            # 判明している技は PP を含めてそのまま使う
+            old = {move.data.name: move for move in mon.moves}
+            journal.save_attrs(mon, "_moves")
+            mon.moves = [old.get(name) or Move(name) for name in moves]
+
+            battle.toggle_hash(mon)
+
+    def clone(self, battle: Battle, i: int) -> Battle:
+        """i 番目の標本を上書きした複製"""
+        new = deepcopy(battle)
+        self.apply(new, i)
+        return new
+
+
+def sample_determinizations(battle: Battle,
+                            perspective: Player,
+                            n: int,
+                            rng: np.random.Generator | None = None,
+                            item_pool: list[str] | None = None,
+                            move_pool: list[str] | None = None) -> Determinizations:
+    """perspective から見た相手のチームの標本を n 通り生成する
+
+    判明した特性・持ち物・技はそのまま使い、残りを一様に選ぶ
+        特性   : 種族の特性 (PokemonData.abilities) から
+        持ち物 : item_pool から
+        技     : move_pool から、判明した技と重複しないように N_MOVES 個まで
+        選出   : 場に出たポケモン (observed) と、残りのポケモンから無作為に
+    """
+    rng = rng or np.random.default_rng()
+    item_ids = np.array([ITEM_IDS[name] for name in item_pool or ITEM_POOL])
+    move_ids = np.array([MOVE_IDS[name] for name in move_pool or MOVE_POOL])
+
+    idx = 1 - battle.players.index(perspective)
+    player = battle.players[idx]
+    team_size = len(player.team)
+
+    abilities = np.zeros((n, team_size), dtype=np.int32)
+    items = np.zeros((n, team_size), dtype=np.int32)
+    moves = np.zeros((n, team_size, N_MOVES), dtype=np.int32)
+
+    for j, mon in enumerate(player.team):
+        if mon.ability.revealed:
+            abilities[:, j] = ABILITY_IDS[mon.ability.data.name]
+        else:
+            candidates = np.array([ABILITY_IDS[a] for a in ability_candidates(mon)])
+            abilities[:, j] = candidates[rng.integers(len(candidates), size=n)]
+
+        if mon.item.revealed:
+            items[:, j] = ITEM_IDS[mon.item.data.name]
+        else:
+            items[:, j] = item_ids[rng.integers(len(item_ids), size=n)]
+
+        revealed = [MOVE_IDS[move.data.name] for move in mon.moves if move.revealed][:N_MOVES]
+        moves[:, j, :len(revealed)] = revealed
+        pool = move_ids[~np.isin(move_ids, revealed)]
+        sampled = _sample_subsets(rng, pool, n, N_MOVES - len(revealed))
+        moves[:, j, len(revealed):len(revealed) + sampled.shape[1]] = sampled
+
+    # 場に出たポケモンは必ず選出に含まれる
+    n_selection = len(player.selection_idxes)
+    known = [j for j in player.selection_idxes if getattr(player.team[j], "observed", False)]
+    unknown = np.array([j for j in range(team_size) if j not in known and
+                        not getattr(player.team[j], "observed", False)], dtype=np.int32)
+    selections = np.empty((n, n_selection), dtype=np.int32)
+    selections[:, :len(known)] = known
+    selections[:, len(known):] = _sample_subsets(rng, unknown, n, n_selection - len(known))
+
+    return Determinizations(idx, abilities, items, moves, selections)
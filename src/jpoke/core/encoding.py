@@ -0,0 +1,246 @@
+"""Battle の状態と固定長の数値配列の相互変換
+
+配列は次の区画を順に並べたもの. 名前は ID 表の番号 (0 は空) で表す
+    ヘッダ     : ターン, 勝者
+    プレイヤー : 場のポケモン, 割り込み, 交代済み, 選出, 予約コマンド
+    ポケモン   : プレイヤーごとに TEAM_SIZE 匹分. 空きは 0 で埋める
+    場         : 全体の場, 各プレイヤーの場の (名前, 残りターン)
+"""
+from __future__ import annotations
+from typing import TYPE_CHECKING, get_args
+if TYPE_CHECKING:
+    from .battle import Battle
+
+import numpy as np
+
+from jpoke.utils.enums import Command, Interrupt
+from jpoke.utils.types import GlobalField, SideField, BoostSource
+from jpoke.utils.constants import TYPES
+from jpoke.data import pokedex, MOVES, ABILITIES, ITEMS
+from jpoke.data.ailment import AILMENTS
+from jpoke.data.field import FIELDS
+from jpoke.model import Ability, Item, Move
+from jpoke.model.rank import Rank, STATS
+
+
+TEAM_SIZE = 6
+N_MOVES = 4
+N_SELECTION = 3
+N_RESERVED = 2
+N_TYPES = 2
+
+
+def _names(names) -> list[str]:
+    """ID 表. 0 番は空文字"""
+    return [""] + sorted(name for name in names if name)
+
+
+SPECIES = _names(pokedex)
+ABILITY_NAMES = _names(ABILITIES)
+ITEM_NAMES = _names(ITEMS)
+MOVE_NAMES = _names(MOVES)
+AILMENT_NAMES = _names(AILMENTS)
+FIELD_NAMES = _names(FIELDS)
+TYPE_NAMES = _names(TYPES)
+BOOST_SOURCES = list(get_args(BoostSource))
+COMMANDS = list(Command)
+GLOBAL_FIELDS: list[GlobalField] = list(get_args(GlobalField))
+SIDE_FIELDS: list[SideField] = list(get_args(SideField))
+
+SPECIES_IDS = {name: i for i, name in enumerate(SPECIES)}
+ABILITY_IDS = {name: i for i, name in enumerate(ABILITY_NAMES)}
+ITEM_IDS = {name: i for i, name in enumerate(ITEM_NAMES)}
+MOVE_IDS = {name: i for i, name in enumerate(MOVE_NAMES)}
+AILMENT_IDS = {name: i for i, name in enumerate(AILMENT_NAMES)}
+FIELD_IDS = {name: i for i, name in enumerate(FIELD_NAMES)}
+TYPE_IDS = {name: i for i, name in enumerate(TYPE_NAMES)}
+
+HEADER_SIZE = 2
+PLAYER_SIZE = 3 + N_SELECTION + N_RESERVED
+POKEMON_SIZE = 14 + len(STATS) + 4*N_MOVES + 11 + 2*N_TYPES
+FIELD_SIZE = 2
+STATE_SIZE = HEADER_SIZE + 2*PLAYER_SIZE + 2*TEAM_SIZE*POKEMON_SIZE + \
+    (len(GLOBAL_FIELDS) + 2*len(SIDE_FIELDS))*FIELD_SIZE
+
+
+def _optional(mon, name: str) -> int:
+    """未設定の属性は -1"""
+    return int(getattr(mon, name)) if hasattr(mon, name) else -1
+
+
+def _type_ids(types: list[str]) -> list[int]:
+    ids = [TYPE_IDS[t] for t in types[:N_TYPES]]
+    return ids + [0]*(N_TYPES - len(ids))
+
+
+def encode_pokemon(mon) -> list[int]:
+    values = [
+        SPECIES_IDS[mon.name], mon.hp,
+        ABILITY_IDS[mon.ability.data.name], mon.ability.active, mon.ability.revealed, mon.ability.count,
+        ITEM_IDS[mon.item.data.name], mon.item.active, mon.item.revealed,
+        AILMENT_IDS[mon.ailment.data.name], mon.ailment.count,
+        mon.terastallized, _optional(mon, "observed"), _optional(mon, "sleep_count"),
+    ]
+    values += mon.rank.tolist()
+    for i in range(N_MOVES):
+        if i < len(mon.moves):
+            move = mon.moves[i]
+            values += [MOVE_IDS[move.data.name], move.pp, move.revealed,
+                       sum(mv is move for mv in mon.expended_moves)]
+        else:
+            values += [0]*4
+    values += [
+        MOVE_IDS[mon.executed_move.data.name] if mon.executed_move is not None else 0,
+        mon.choice_locked, mon.hidden, mon.lockon, mon.active_turn, mon.forced_turn,
+        mon.sub_hp, mon.bind_damage_denom, mon.hits_taken,
+        STATS.index(mon.boosted_stat) if mon.boosted_stat else -1,
+        BOOST_SOURCES.index(mon.boost_source),
+    ]
+    values += _type_ids(mon.added_types) + _type_ids(mon.lost_types)
+    return values
+
+
+def decode_pokemon(mon, values: list[int]):
+    if SPECIES[values[0]] != mon.name:
+        raise ValueError(f"Encoded species {SPECIES[values[0]]} does not match {mon.name}.")
+    mon.hp = values[1]
+
+    if ABILITY_NAMES[values[2]] != mon.ability.data.name:
+        mon.ability = Ability(ABILITY_NAMES[values[2]])
+    mon.ability.active, mon.ability.revealed, mon.ability.count = bool(values[3]), bool(values[4]), values[5]
+
+    if ITEM_NAMES[values[6]] != mon.item.data.name:
+        mon.item = Item(ITEM_NAMES[values[6]])
+    mon.item.active, mon.item.revealed = bool(values[7]), bool(values[8])
+
+    if AILMENT_NAMES[values[9]] != mon.ailment.data.name:
+        mon.ailment.init(AILMENT_NAMES[values[9]])
+        mon.ailment.revealed = True
+    mon.ailment.count = values[10]
+
+    mon.terastallized = bool(values[11])
+    for name, v in [("observed", values[12]), ("sleep_count", values[13])]:
+        if v >= 0:
+            setattr(mon, name, bool(v) if name == "observed" else v)
+        elif hasattr(mon, name):
+            delattr(mon, name)
+
+    i = 14
+    mon.rank = Rank(values[i:i+len(STATS)])
+    i += len(STATS)
+
+    moves, expended = [], []
+    for _ in range(N_MOVES):
+        move_id, pp, revealed, n_expended = values[i:i+4]
+        i += 4
+        if not move_id:
+            continue
+        move = mon.find_move(MOVE_NAMES[move_id]) or Move(MOVE_NAMES[move_id])
+        move.pp, move.revealed = pp, bool(revealed)
+        moves.append(move)
+        expended += [move]*n_expended
+    mon.moves = moves
+    mon.expended_moves = expended
+
+    executed = MOVE_NAMES[values[i]]
+    mon.executed_move = (mon.find_move(executed) or Move(executed)) if executed else None
+    (mon.choice_locked, mon.hidden, mon.lockon, mon.active_turn, mon.forced_turn,
+     mon.sub_hp, mon.bind_damage_denom, mon.hits_taken) = values[i+1:i+9]
+    mon.choice_locked, mon.hidden, mon.lockon = bool(mon.choice_locked), bool(mon.hidden), bool(mon.lockon)
+    mon.boosted_stat = STATS[values[i+9]] if values[i+9] >= 0 else None
+    mon.boost_source = BOOST_SOURCES[values[i+10]]
+    i += 11
+    mon.added_types = [TYPE_NAMES[t] for t in values[i:i+N_TYPES] if t]
+    mon.lost_types = [TYPE_NAMES[t] for t in values[i+N_TYPES:i+2*N_TYPES] if t]
+
+
+def encode_player(player) -> list[int]:
+    selection = player.selection_idxes[:N_SELECTION]
+    reserved = [COMMANDS.index(c) for c in player.reserved_commands[:N_RESERVED]]
+    return [
+        -1 if player.active_idx is None else player.active_idx,
+        player.interrupt.value,
+        player.has_switched,
+    ] + selection + [-1]*(N_SELECTION - len(selection)) + reserved + [-1]*(N_RESERVED - len(reserved))
+
+
+def decode_player(player, values: list[int]):
+    player.active_idx = None if values[0] < 0 else values[0]
+    player.interrupt = Interrupt(values[1])
+    player.has_switched = bool(values[2])
+    player.selection_idxes = [v for v in values[3:3+N_SELECTION] if v >= 0]
+    player.reserved_commands = [COMMANDS[v] for v in values[3+N_SELECTION:] if v >= 0]
+
+
+def iter_fields(battle: Battle):
+    for name in GLOBAL_FIELDS:
+        yield battle.field.fields[name]
+    for side in battle.sides:
+        for name in SIDE_FIELDS:
+            yield side.fields[name]
+
+
+def encode_battle(battle: Battle, dtype=np.int16) -> np.ndarray:
+    values = [battle.turn, -1 if battle.winner_idx is None else battle.winner_idx]
+    for player in battle.players:
+        values += encode_player(player)
+    for player in battle.players:
+        for i in range(TEAM_SIZE):
+            values += encode_pokemon(player.team[i]) if i < len(player.team) else [0]*POKEMON_SIZE
+    for field in iter_fields(battle):
+        values += [FIELD_IDS[field.data.name], field.count]
+    return np.array(values, dtype=dtype)
+
+
+def decode_battle(battle: Battle, state: np.ndarray):
+    if len(state) != STATE_SIZE:
+        raise ValueError(f"Expected {STATE_SIZE} values, got {len(state)}.")
+    values = state.astype(np.int64).tolist()
+
+    battle.turn = values[0]
+    battle.winner_idx = None if values[1] < 0 else values[1]
+    i = HEADER_SIZE
+
+    for player in battle.players:
+        decode_player(player, values[i:i+PLAYER_SIZE])
+        i += PLAYER_SIZE
+
+    for player in battle.players:
+        for j in range(TEAM_SIZE):
+            if j < len(player.team):
+                player.team[j] = battle.own(player, player.team[j])
+                decode_pokemon(player.team[j], values[i:i+POKEMON_SIZE])
+            elif values[i]:
+                raise ValueError("Encoded team is larger than the battle's team.")
+            i += POKEMON_SIZE
+
+    for field in iter_fields(battle):
+        field.init(FIELD_NAMES[values[i]], values[i+1])
+        i += FIELD_SIZE
+
+    register_handlers(battle)
+
+
+def register_handlers(battle: Battle):
+    """状態に合わせてハンドラを登録し直す"""
+    events = battle.events
+    events.handlers.clear()
+    events.n_subscriptions.clear()
+    events.ordered.clear()
+    events.indexed.clear()
+
+    for player in battle.players:
+        if player.active_idx is not None:
+            mon = player.active
+            if mon.ability.active:
+                mon.ability.register_handlers(events, mon)
+            if mon.item.active:
+                mon.item.register_handlers(events, mon)
+        for mon in player.team:
+            if mon.ailment.name:
+                mon.ailment.register_handlers(events, mon)
+
+    for field in iter_fields(battle):
+        if field.name:
+            for player in field.owners:
+                field.register_handlers(events, player)
@@ -1,7 +1,7 @@
 from __future__ import annotations
 from typing import TYPE_CHECKING, Any
 if TYPE_CHECKING:
-    from jpoke.core import Battle
+    from jpoke.core import Battle, Player
     from jpoke.model import Pokemon, Move, Field
 
 from typing import Callable
@@ -10,11 +10,14 @@ from dataclasses import dataclass
 from jpoke.utils.types import Side, GlobalField, SideField, Weather, Terrain
 from jpoke.utils.enums import Event, HandlerResult
 from jpoke.utils import fast_copy
-from .player import Player
 
 
-@dataclass
+@dataclass(slots=True)
 class EventContext:
+    """イベントのコンテキスト
+
+    EventManager のプールで使い回されるため、ハンドラは emit の後まで保持してはならない
+    """
     source: Pokemon
     by: Side = "self"
     move: Move = None  # type: ignore
@@ -32,73 +35,206 @@ class Handler:
         return self.priority > other.priority
 
 
+# ハンドラの source を表す (プレイヤー番号, チーム内の番号). プレイヤー自身の場合はチーム内の番号を None とする
+SourceSlot = tuple[int, int | None]
+
+
 class EventManager:
     def __init__(self, battle: Battle) -> None:
         self.battle = battle
-        self.handlers: dict[Event, dict[Handler, list[Pokemon | Player]]] = {}
+        # イベントごとに優先度別のバケットでハンドラを管理する (バケットは優先度の高い順)
+        self.handlers: dict[Event, dict[int, dict[Handler, tuple[SourceSlot, ...]]]] = {}
+        # 優先度順に並べたハンドラのキャッシュ
+        self.ordered: dict[Event, list[tuple[Handler, tuple[SourceSlot, ...]]]] = {}
+        # コンテキストの source ごとに、発動対象となるハンドラを優先度順に並べた索引
+        self.indexed: dict[Event, dict[Pokemon, list[tuple[Handler, tuple[SourceSlot, ...]]]]] = {}
+        # イベントごとの (ハンドラ, source) の登録数
+        self.n_subscriptions: dict[Event, int] = {}
+        # 使い終わったコンテキストの置き場
+        self.context_pool: list[EventContext] = []
 
     def __deepcopy__(self, memo):
         cls = self.__class__
         new = cls.__new__(cls)
         memo[id(self)] = new
-        return fast_copy(self, new)
+        # source はインデックスで保持しているため、登録内容はそのまま複製できる
+        fast_copy(self, new)
+        new.ordered = {}
+        new.indexed = {}
+        new.context_pool = []
+        return new
 
     def update_reference(self, new: Battle):
-        old = self.battle
-
-        # ハンドラの対象に指定されているポケモンまたはプレイヤーへの参照を更新する
-        for event, data in self.handlers.items():
-            for handler, sources in data.items():
-                new_sources = []
-                for old_source in sources:
-                    # プレイヤーまたはポケモンのインデックスから複製後のオブジェクトを見つける
-                    if isinstance(old_source, Player):
-                        player_idx = old.players.index(old_source)
-                        new_source = new.players[player_idx]
-                    else:
-                        old_player = old.find_player(old_source)
-                        player_idx = old.players.index(old_player)
-                        team_idx = old_player.team.index(old_source)
-                        new_source = new.players[player_idx].team[team_idx]
-                    new_sources.append(new_source)
-
-                self.handlers[event][handler] = new_sources
-
         # Battle への参照を更新する
         self.battle = new
+        self.ordered.clear()
+        self.indexed.clear()
+
+    def invalidate_index(self):
+        """source ごとのハンドラの索引を破棄する"""
+        self.indexed.clear()
+
+    def find_slot(self, source: Pokemon | Player) -> SourceSlot | None:
+        """ポケモンまたはプレイヤーの (プレイヤー番号, チーム内の番号) を返す"""
+        for i, player in enumerate(self.battle.players):
+            if source is player:
+                return (i, None)
+            for j, mon in enumerate(player.team):
+                if source is mon:
+                    return (i, j)
+        return None
+
+    def resolve_slot(self, slot: SourceSlot) -> Pokemon:
+        """slot が指すポケモンを返す. プレイヤーの場合は場のポケモンを返す
+
+        ハンドラは source を変更しうるため、複製元から借りているポケモンは複製してから返す
+        """
+        player = self.battle.players[slot[0]]
+        if slot[1] is None:
+            return player.active
+        mon = player.team[slot[1]]
+        if slot in self.battle.lenders:
+            mon = self.battle.own(player, mon)
+        return mon
+
+    def source_slots(self) -> set[SourceSlot]:
+        """ハンドラが登録されているすべての source"""
+        return {slot for buckets in self.handlers.values()
+                for bucket in buckets.values()
+                for sources in bucket.values()
+                for slot in sources}
 
     def on(self, event: Event, handler: Handler, source: Pokemon | Player):
         """イベントを指定してハンドラを登録"""
-        self.handlers.setdefault(event, {})
-        sources = self.handlers[event].setdefault(handler, [])
-        if source not in sources:
-            sources.append(source)
+        slot = self.find_slot(source)
+        if slot is None:
+            raise Exception("Source not found.")
+
+        buckets = self.handlers.get(event)
+        if buckets and slot in buckets.get(handler.priority, {}).get(handler, ()):
+            return
+        self.save_handlers(event)
+
+        buckets = self.handlers.setdefault(event, {})
+        if handler.priority not in buckets:
+            # 新しい優先度のバケットを追加し、優先度の高い順に並べ直す
+            buckets[handler.priority] = {}
+            buckets = self.handlers[event] = dict(sorted(buckets.items(), reverse=True))
+        bucket = buckets[handler.priority]
+        # 同じ優先度のハンドラは登録順に実行する
+        sources = bucket.setdefault(handler, ())
+        if slot not in sources:
+            bucket[handler] = sources + (slot,)
+            self.n_subscriptions[event] = self.n_subscriptions.get(event, 0) + 1
+            self.ordered.pop(event, None)
+            self.indexed.pop(event, None)
+            self.battle.invalidate_speed_order()
 
     def off(self, event: Event, handler: Handler, source: Pokemon | Player):
-        if event in self.handlers and handler in self.handlers[event]:
+        buckets = self.handlers.get(event)
+        if not buckets or handler.priority not in buckets:
+            return
+        bucket = buckets[handler.priority]
+        if handler in bucket:
+            self.save_handlers(event)
             # source を削除
-            self.handlers[event][handler] = \
-                [p for p in self.handlers[event][handler] if p != source]
+            slot = self.find_slot(source)
+            sources = tuple(s for s in bucket[handler] if s != slot)
+            self.n_subscriptions[event] -= len(bucket[handler]) - len(sources)
+            bucket[handler] = sources
             # 空のハンドラを解除
-            if not self.handlers[event][handler]:
-                del self.handlers[event][handler]
+            if not bucket[handler]:
+                del bucket[handler]
+                if not bucket:
+                    del buckets[handler.priority]
+            self.ordered.pop(event, None)
+            self.indexed.pop(event, None)
+            self.battle.invalidate_speed_order()
+
+    def save_handlers(self, event: Event):
+        """巻き戻しに備えてイベントの登録内容を記録する"""
+        journal = self.battle.journal
+        if journal.active:
+            buckets = self.handlers.get(event)
+            if buckets is not None:
+                buckets = {priority: bucket.copy() for priority, bucket in buckets.items()}
+            journal.save_call(self.restore_handlers, event, buckets, self.n_subscriptions.get(event, 0))
+
+    def restore_handlers(self, event: Event, buckets: dict | None, n_subscriptions: int):
+        """save_handlers で記録した登録内容に戻す"""
+        if buckets is None:
+            self.handlers.pop(event, None)
+            self.n_subscriptions.pop(event, None)
+        else:
+            self.handlers[event] = buckets
+            self.n_subscriptions[event] = n_subscriptions
+        self.ordered.pop(event, None)
+        self.indexed.pop(event, None)
+        self.battle.invalidate_speed_order()
+
+    def acquire_context(self,
+                        source: Pokemon,
+                        by: Side = "self",
+                        move: Move | None = None,
+                        field: GlobalField | SideField | Weather | Terrain = "") -> EventContext:
+        """プールからコンテキストを取り出して初期化する"""
+        if not self.context_pool:
+            return EventContext(source, by, move, field)  # type: ignore
+        ctx = self.context_pool.pop()
+        ctx.source = source
+        ctx.by = by
+        ctx.move = move  # type: ignore
+        ctx.field = field
+        return ctx
+
+    def release_context(self, ctx: EventContext):
+        """使い終わったコンテキストをプールに戻す"""
+        self.context_pool.append(ctx)
+
+    def has_handlers(self, event: Event) -> bool:
+        """イベントにハンドラが登録されていればTrueを返す"""
+        return self.n_subscriptions.get(event, 0) > 0
+
+    def ordered_handlers(self, event: Event) -> list[tuple[Handler, tuple[SourceSlot, ...]]]:
+        """優先度の高い順に並んだハンドラと source の組を返す"""
+        if event not in self.ordered:
+            self.ordered[event] = [(handler, sources)
+                                   for bucket in self.handlers.get(event, {}).values()
+                                   for handler, sources in bucket.items()]
+        return self.ordered[event]
+
+    def indexed_handlers(self, event: Event, mon: Pokemon) -> list[tuple[Handler, tuple[SourceSlot, ...]]]:
+        """mon を source とするコンテキストに合致するハンドラを優先度順に返す
+
+        索引は mon 自体をキーにするため、チームのポケモンを置き換えたら invalidate_index() を呼ぶ
+        """
+        index = self.indexed.setdefault(event, {})
+        if mon not in index:
+            slot = self.find_slot(mon)
+            if slot is None:
+                # どちらのチームにもいないポケモンは by の判定ができない
+                raise Exception("Source not found.")
+            index[mon] = [(handler, sources) for handler, sources in self.ordered_handlers(event)
+                          if (not handler.by and slot in sources) or
+                          (handler.by and any(slot != src for src in sources))]
+        return index[mon]
 
     def emit(self, event: Event, ctx: EventContext | None = None, value: Any = None) -> Any:
         """イベントを発火"""
-        for handler, sources in sorted(self.handlers.get(event, {}).items()):
+        if ctx:
+            # 引数のコンテキストに合致するハンドラのみを索引から取得する
+            entries = self.indexed_handlers(event, ctx.source)
+        else:
+            entries = self.ordered_handlers(event)
+
+        for handler, sources in entries:
             if ctx:
-                # 引数のコンテキストに合致するハンドラがあるか検証する
-                if (not handler.by and ctx.source in sources) or \
-                        (handler.by and any(ctx.source is not mon for mon in sources)):
-                    ctxs = [ctx]
-                else:
-                    continue
+                ctxs = [ctx]
             else:
                 # 引数のコンテキストに指定がなければ、登録されている source からコンテキストを生成する
                 new_sources = []
-                for source in sources:
-                    if isinstance(source, Player):
-                        source = source.active
+                for slot in sources:
+                    source = self.resolve_slot(slot)
                     if source not in new_sources:
                         new_sources.append(source)
 
@@ -107,7 +243,7 @@ class EventManager:
                     order = self.battle.calc_speed_order()
                     new_sources = [p for p in order if p in new_sources]
 
-                ctxs = [EventContext(source) for source in new_sources]
+                ctxs = [self.acquire_context(source) for source in new_sources]
 
             # すべての source に対してハンドラを実行する
             for c in ctxs:
@@ -128,6 +264,24 @@ class EventManager:
                     case HandlerResult.STOP_HANDLER:
                         break
                     case HandlerResult.STOP_EVENT:
+                        if not ctx:
+                            self.context_pool.extend(ctxs)
                         return value
 
+            # 生成したコンテキストをプールに戻す
+            if not ctx:
+                self.context_pool.extend(ctxs)
+
+        return value
+
+    def emit_from(self,
+                  event: Event,
+                  source: Pokemon,
+                  value: Any = None,
+                  by: Side = "self",
+                  move: Move | None = None) -> Any:
+        """source を起点とするコンテキストをプールから用意してイベントを発火"""
+        ctx = self.acquire_context(source, by, move)
+        value = self.emit(event, ctx, value)
+        self.release_context(ctx)
         return value
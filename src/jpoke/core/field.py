@@ -7,6 +7,8 @@ from jpoke.utils import fast_copy
 from jpoke.utils.types import GlobalField, SideField, Weather, Terrain
 from jpoke.model import Field
 
+from .zobrist import field_hash
+
 
 class BaseFieldManager:
     def __init__(self, events: EventManager, players: list[Player]) -> None:
@@ -25,16 +27,33 @@ class BaseFieldManager:
         for field in self.fields.values():
             field.update_reference(players)
 
+    def save(self, field: Field):
+        """巻き戻しに備えてフィールドの状態を記録する"""
+        self.events.battle.journal.save_vars(field)
+
+    def toggle_hash(self, name: GlobalField | SideField):
+        """フィールドの寄与をハッシュ値に加える (取り除く). 状態を変更する前後で呼び出す"""
+        battle = self.events.battle
+        if battle.hash_value is not None:
+            side = None if self is battle.field else battle.sides.index(self)  # type: ignore
+            battle.hash_value ^= field_hash(side, name, self.fields[name])
+
     def activate(self, name: GlobalField | SideField, count: int) -> bool:
         if not self.fields[name].count:
+            self.save(self.fields[name])
+            self.toggle_hash(name)
             self.fields[name].activate(self.events, count)
+            self.toggle_hash(name)
             return True
         return False
 
     def deactivate(self, name: GlobalField | SideField) -> bool:
         field = self.fields[name]
         if field.count:
+            self.save(field)
+            self.toggle_hash(name)
             field.deactivate(self.events)
+            self.toggle_hash(name)
             return True
         return False
 
@@ -42,7 +61,10 @@ class BaseFieldManager:
         field = self.fields[name]
         new_count = max(0, field.count - by)
         if new_count != field.count:
+            self.save(field)
+            self.toggle_hash(name)
             field.reduce_count(self.events)
+            self.toggle_hash(name)
             return True
         return False
 
@@ -63,10 +85,13 @@ class GlobalFieldManager(BaseFieldManager):
         if name == field.name:
             return False
 
+        self.save(field)
+        self.toggle_hash("weather")
         if not name or count == 0:
             field.deactivate(self.events)
         else:
             field.overwrite(self.events, name, count)
+        self.toggle_hash("weather")
         return True
 
     def activate_terrain(self, name: Terrain, count: int) -> bool:
@@ -75,10 +100,13 @@ class GlobalFieldManager(BaseFieldManager):
         if name == field.name:
             return False
 
+        self.save(field)
+        self.toggle_hash("terrain")
         if not name or count == 0:
             field.deactivate(self.events)
         else:
             field.overwrite(self.events, name, count)
+        self.toggle_hash("terrain")
         return True
 
 
@@ -0,0 +1,127 @@
+from __future__ import annotations
+from typing import Any, Callable
+
+from dataclasses import dataclass
+from functools import cache
+
+from jpoke.utils.enums import Command, Interrupt
+
+
+# 記録時に属性が存在しなかったことを表す
+MISSING = object()
+
+
+@dataclass
+class PlayerSnapshot:
+    active_idx: int
+    interrupt: Interrupt
+    has_switched: bool
+    selection_idxes: list[int]
+    reserved_commands: list[Command]
+
+
+@dataclass
+class Checkpoint:
+    """Battle.checkpoint() で記録した時点の状態"""
+    index: int
+    turn: int
+    winner_idx: int | None
+    random_state: tuple
+    players: list[PlayerSnapshot]
+    n_logs: tuple[int, int, int]
+    n_damage_logs: int
+    hash_value: int | None
+
+
+class Journal:
+    """状態変更の記録
+
+    変更前の値を記録しておき、rollback で記録した順と逆順に書き戻す
+    active でなければ何も記録しない
+    """
+
+    def __init__(self):
+        self.active: bool = False
+        self.entries: list[tuple[Callable, Any, Any, Any]] = []
+
+    def clear(self):
+        self.active = False
+        self.entries.clear()
+
+    def save_attrs(self, obj, *names: str):
+        """obj の属性の現在値を記録する"""
+        if self.active:
+            for name in names:
+                self.entries.append((_restore_attr, obj, name, getattr(obj, name, MISSING)))
+
+    def save_vars(self, obj):
+        """obj のすべての属性の現在値を記録する"""
+        if self.active:
+            state = {name: getattr(obj, name, MISSING) for name in slot_names(type(obj))}
+            self.entries.append((_restore_vars, obj, None, state))
+
+    def save_item(self, d: dict | list, key):
+        """辞書や配列の要素の現在値を記録する"""
+        if self.active:
+            try:
+                old = d[key]
+            except (KeyError, IndexError):
+                old = MISSING
+            self.entries.append((_restore_item, d, key, old))
+
+    def save_list(self, lst: list):
+        """リストの現在の内容を記録する"""
+        if self.active:
+            self.entries.append((_restore_list, lst, None, lst.copy()))
+
+    def save_call(self, func: Callable, *args):
+        """巻き戻し時に func(*args) を呼び出す"""
+        if self.active:
+            self.entries.append((_call, func, None, args))
+
+    def replace(self, old, new):
+        """save_list で記録したリストの中の old を new に置き換える"""
+        for restore, _, _, lst in self.entries:
+            if restore is _restore_list:
+                lst[:] = [new if x is old else x for x in lst]
+
+    def rollback(self, index: int):
+        """index 番目以降の記録をすべて巻き戻す"""
+        entries = self.entries
+        while len(entries) > index:
+            restore, target, key, old = entries.pop()
+            restore(target, key, old)
+
+
+def _restore_attr(obj, name, old):
+    if old is MISSING:
+        if hasattr(obj, name):
+            delattr(obj, name)
+    else:
+        setattr(obj, name, old)
+
+
+@cache
+def slot_names(cls: type) -> tuple[str, ...]:
+    """クラスとその基底クラスの __slots__ に定義された属性名"""
+    return tuple(name for c in cls.__mro__ for name in getattr(c, "__slots__", ()))
+
+
+def _restore_vars(obj, _, old):
+    for name, value in old.items():
+        _restore_attr(obj, name, value)
+
+
+def _restore_item(d, key, old):
+    if old is MISSING:
+        d.pop(key, None)
+    else:
+        d[key] = old
+
+
+def _restore_list(lst, _, old):
+    lst[:] = old
+
+
+def _call(func, _, args):
+    func(*args)
@@ -25,7 +25,7 @@ class Player:
         cls = self.__class__
         new = cls.__new__(cls)
         memo[id(self)] = new
-        return fast_copy(self, new, keys_to_deepcopy=["team"])
+        return fast_copy(self, new, keys_to_deepcopy=["team"], memo=memo)
 
     def reset_game(self):
         self.selection_idxes: list[int] = []
@@ -0,0 +1,36 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from jpoke.model import Pokemon, Field
+
+from functools import cache
+from hashlib import blake2b
+
+from jpoke.utils.types import GlobalField, SideField
+
+
+@cache
+def zobrist_key(*feature) -> int:
+    """特徴量 (項目名, 位置, 値) に対応する64bitの乱数
+
+    プロセスによらず同じ値になるよう、特徴量のハッシュから生成する
+    """
+    return int.from_bytes(blake2b(repr(feature).encode(), digest_size=8).digest(), "little")
+
+
+def pokemon_hash(slot: tuple[int, int], mon: Pokemon) -> int:
+    """ポケモンの状態のハッシュ値"""
+    h = zobrist_key("hp", *slot, mon.hp) ^ \
+        zobrist_key("ailment", *slot, mon.ailment.name, mon.ailment.count) ^ \
+        zobrist_key("item", *slot, mon.item.active) ^ \
+        zobrist_key("terastal", *slot, mon.terastallized)
+    for i, v in enumerate(mon.rank):
+        h ^= zobrist_key("rank", *slot, i, v)
+    for i, move in enumerate(mon.moves):
+        h ^= zobrist_key("pp", *slot, i, move.pp)
+    return h
+
+
+def field_hash(side: int | None, name: GlobalField | SideField, field: Field) -> int:
+    """フィールドの状態のハッシュ値. side は全体の場なら None"""
+    return zobrist_key("field", side, name, field.name, field.count)
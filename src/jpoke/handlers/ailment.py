@@ -11,7 +11,10 @@ def どく(battle: Battle, ctx: EventContext, value: Any):
 
 
 def もうどく(battle: Battle, ctx: EventContext, value: Any):
+    battle.journal.save_attrs(ctx.source.ailment, "count")
+    battle.toggle_hash(ctx.source)
     ctx.source.ailment.count += 1
+    battle.toggle_hash(ctx.source)
     r = max(-1, -ctx.source.ailment.count/16)
     if battle.modify_hp(ctx.source, r=r):
         battle.add_turn_log(ctx.source, "もうどくダメージ")
@@ -17,6 +17,7 @@ def reveal(battle: Battle, ctx: EventContext,
             target = mon.item
         case "move":
             target = ctx.move
+    battle.journal.save_attrs(target, "revealed")
     target.revealed = True
     battle.add_turn_log(ctx.source, target.name)
     return True
@@ -30,7 +31,7 @@ def modify_hp(
     prob: float = 1,
 ) -> bool:
     """HPが変化したらTrueを返す"""
-    if prob < 1 and battle.random.random() >= prob:
+    if prob < 1 and not battle.random.chance(prob, "追加効果"):
         return False
     mon = ctx.source if target == "self" else battle.foe(ctx.source)
     return battle.modify_hp(mon, v, r)
@@ -44,7 +45,7 @@ def modify_stat(
     prob: float = 1
 ) -> bool:
     """能力ランクが変化したらTrueを返す"""
-    if prob < 1 and battle.random.random() >= prob:
+    if prob < 1 and not battle.random.chance(prob, "追加効果"):
         return False
     mon = ctx.source if target == "self" else battle.foe(ctx.source)
     by = "self" if ctx.source == target else "foe"
@@ -56,7 +57,7 @@ def apply_ailment(battle: Battle,
                   target: Side,
                   ailment: AilmentName,
                   prob: float = 1) -> bool:
-    if prob < 1 and battle.random.random() >= prob:
+    if prob < 1 and not battle.random.chance(prob, "追加効果"):
         return False
     mon = ctx.source if target == "self" else battle.foe(ctx.source)
     if ailment:
@@ -9,15 +9,24 @@ from . import common
 
 
 def reveal_move(battle: Battle, ctx: EventContext, value: Any):
+    battle.journal.save_attrs(ctx.move, "revealed")
     ctx.move.revealed = True
     battle.add_turn_log(ctx.source, ctx.move.name)
     return True
 
 
 def consume_pp(battle: Battle, ctx: EventContext, value: Any):
-    v = battle.events.emit(Event.ON_CHECK_PP_CONSUMED, ctx, 1)
+    v = 1
+    if battle.events.has_handlers(Event.ON_CHECK_PP_CONSUMED):
+        v = battle.events.emit(Event.ON_CHECK_PP_CONSUMED, ctx, 1)
+    battle.journal.save_attrs(ctx.move, "pp")
+    old = ctx.move.pp
     ctx.move.pp = max(0, ctx.move.pp - v)
+    if ctx.move in ctx.source.moves:
+        i = ctx.source.moves.index(ctx.move)
+        battle.rehash(ctx.source, "pp", (i, old), (i, ctx.move.pp))
     battle.add_turn_log(ctx.source, f"PP -{v} >> {ctx.move.pp}")
+    battle.journal.save_list(ctx.source.expended_moves)
     ctx.source.expended_moves.append(ctx.move)
     return True
 
@@ -33,5 +42,5 @@ def blow(battle: Battle, ctx: EventContext, value: Any):
     rival = battle.rival(player)
     commands = battle.get_available_switch_commands(rival)
     if commands:
-        command = battle.random.choice(commands)
+        command = battle.random.choice(commands, "ふきとばし")
         battle.run_switch(rival, rival.team[command.idx])
@@ -1,10 +1,12 @@
-from jpoke.utils import fast_copy
+from __future__ import annotations
 from jpoke.data import ABILITIES
 
 from .effect import BaseEffect
 
 
 class Ability(BaseEffect):
+    __slots__ = ("count",)
+
     def __init__(self, name: str = "") -> None:
         super().__init__(ABILITIES[name])
 
@@ -14,7 +16,14 @@ class Ability(BaseEffect):
         self.count: int = 0
 
     def __deepcopy__(self, memo):
+        new = memo[id(self)] = self.clone()
+        return new
+
+    def clone(self) -> Ability:
         cls = self.__class__
         new = cls.__new__(cls)
-        memo[id(self)] = new
-        return fast_copy(self, new)
+        new.data = self.data
+        new.active = self.active
+        new.revealed = self.revealed
+        new.count = self.count
+        return new
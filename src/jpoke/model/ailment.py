@@ -5,13 +5,14 @@ if TYPE_CHECKING:
     from jpoke.model.pokemon import Pokemon
 
 from jpoke.utils.types import AilmentName
-from jpoke.utils import fast_copy
 from jpoke.data.ailment import AILMENTS
 
 from .effect import BaseEffect
 
 
 class Ailment(BaseEffect):
+    __slots__ = ("owner", "count")
+
     def __init__(self, owner: Pokemon, name: AilmentName = "") -> None:
         self.owner: Pokemon = owner
         self.init(name)
@@ -26,10 +27,18 @@ class Ailment(BaseEffect):
         self.count: int = 0
 
     def __deepcopy__(self, memo):
+        new = memo[id(self)] = self.clone(memo.get(id(self.owner), self.owner))
+        return new
+
+    def clone(self, owner: Pokemon) -> Ailment:
         cls = self.__class__
         new = cls.__new__(cls)
-        memo[id(self)] = new
-        return fast_copy(self, new)
+        new.owner = owner
+        new.data = self.data
+        new.active = self.active
+        new.revealed = self.revealed
+        new.count = self.count
+        return new
 
     def overwrite(self, battle: Battle, name: AilmentName, force: bool = False) -> bool:
         # force=True でない限り上書き不可
@@ -42,6 +51,9 @@ class Ailment(BaseEffect):
 
         battle.add_turn_log(self.owner, name)
 
+        battle.journal.save_vars(self)
+        battle.toggle_hash(self.owner)
+
         # 現在のハンドラを解除
         self.unregister_handlers(battle.events, self.owner)
         # 初期化
@@ -49,6 +61,8 @@ class Ailment(BaseEffect):
         # 新しいハンドラを登録
         self.register_handlers(battle.events, self.owner)
 
+        battle.toggle_hash(self.owner)
+
         return True
 
     def cure(self, battle: Battle) -> bool:
@@ -56,6 +70,9 @@ class Ailment(BaseEffect):
         if not self.name:
             return False
         battle.add_turn_log(self.owner, f"{self.name}解除")
+        battle.journal.save_vars(self)
+        battle.toggle_hash(self.owner)
         self.unregister_handlers(battle.events, self.owner)
         self.init("")
+        battle.toggle_hash(self.owner)
         return True
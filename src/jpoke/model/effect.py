@@ -7,6 +7,8 @@ if TYPE_CHECKING:
 
 
 class BaseEffect:
+    __slots__ = ("data", "active", "revealed")
+
     def __init__(self, data) -> None:
         self.data = data
         self.active: bool = True
@@ -3,13 +3,14 @@ from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from jpoke.core import EventManager, Player
 
-from jpoke.utils import fast_copy
 from jpoke.data.field import FIELDS
 from jpoke.data.models import FieldData
 from .effect import BaseEffect
 
 
 class Field(BaseEffect):
+    __slots__ = ("owners", "count")
+
     def __init__(self, owners: list[Player], name: str = "", count: int = 0) -> None:
         self.owners: list[Player] = owners
         self.init(name, count)
@@ -21,10 +22,18 @@ class Field(BaseEffect):
         self.data: FieldData
 
     def __deepcopy__(self, memo):
+        new = memo[id(self)] = self.clone()
+        return new
+
+    def clone(self) -> Field:
         cls = self.__class__
         new = cls.__new__(cls)
-        memo[id(self)] = new
-        return fast_copy(self, new, keys_to_deepcopy=[])
+        new.owners = self.owners.copy()
+        new.data = self.data
+        new.active = self.active
+        new.revealed = self.revealed
+        new.count = self.count
+        return new
 
     def update_reference(self, owners: list[Player]):
         self.owners = owners
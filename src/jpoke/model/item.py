@@ -1,18 +1,26 @@
-from jpoke.utils import fast_copy
+from __future__ import annotations
 from jpoke.data import ITEMS
 
 from .effect import BaseEffect
 
 
 class Item(BaseEffect):
+    __slots__ = ()
+
     def __init__(self, name: str = "") -> None:
         super().__init__(ITEMS[name])
 
     def __deepcopy__(self, memo):
+        new = memo[id(self)] = self.clone()
+        return new
+
+    def clone(self) -> Item:
         cls = self.__class__
         new = cls.__new__(cls)
-        memo[id(self)] = new
-        return fast_copy(self, new)
+        new.data = self.data
+        new.active = self.active
+        new.revealed = self.revealed
+        return new
 
     def consume(self):
         self.active = False
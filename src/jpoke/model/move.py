@@ -1,12 +1,14 @@
 
+from __future__ import annotations
 from jpoke.utils.types import MoveCategory
-from jpoke.utils import fast_copy
 from jpoke.data import MOVES
 
 from .effect import BaseEffect
 
 
 class Move(BaseEffect):
+    __slots__ = ("pp", "_type")
+
     def __init__(self, name: str, pp: int | None = None):
         super().__init__(MOVES[name])
         self.pp: int = pp if pp else self.data.pp
@@ -17,10 +19,18 @@ class Move(BaseEffect):
         self._type: str = self.data.type
 
     def __deepcopy__(self, memo):
+        new = memo[id(self)] = self.clone()
+        return new
+
+    def clone(self) -> Move:
         cls = self.__class__
         new = cls.__new__(cls)
-        memo[id(self)] = new
-        return fast_copy(self, new)
+        new.data = self.data
+        new.active = self.active
+        new.revealed = self.revealed
+        new.pp = self.pp
+        new._type = self._type
+        return new
 
     def dump(self):
         return {"name": self.name, "pp": self.pp}
@@ -5,15 +5,15 @@ if TYPE_CHECKING:
 
 from jpoke.utils.types import Stat, MoveCategory, Gender, BoostSource, get_stats
 from jpoke.utils.constants import NATURE_MODIFIER
-from jpoke.utils import fast_copy
 
-from jpoke.core.event import Event, EventContext
+from jpoke.core.event import Event
 from jpoke.data import pokedex
 
 from .ability import Ability
 from .item import Item
 from .move import Move
 from .ailment import Ailment
+from .rank import Rank
 
 
 def calc_hp(level, base, indiv, effort):
@@ -25,6 +25,15 @@ def calc_stat(level, base, indiv, effort, nc):
 
 
 class Pokemon:
+    __slots__ = (
+        "data", "observed", "gender", "_level", "_nature", "_ability", "_item", "_moves",
+        "_indiv", "_effort", "_stats", "_terastal", "terastallized",
+        "sleep_count", "ailment", "hp",
+        "choice_locked", "hidden", "lockon", "active_turn", "forced_turn", "sub_hp",
+        "bind_damage_denom", "hits_taken", "boosted_stat", "boost_source", "rank",
+        "added_types", "lost_types", "executed_move", "expended_moves",
+    )
+
     def __init__(self,
                  name: str,
                  ability: str | Ability = "",
@@ -69,7 +78,7 @@ class Pokemon:
         self.hits_taken: int = 0
         self.boosted_stat: Stat | None = None
         self.boost_source: BoostSource = ""
-        self.rank: dict[Stat, int] = {k: 0 for k in get_stats()}  # type: ignore
+        self.rank: Rank = Rank()
         self.added_types: list[str] = []
         self.lost_types: list[str] = []
         self.executed_move: Move | None = None
@@ -107,10 +116,54 @@ class Pokemon:
         return s
 
     def __deepcopy__(self, memo):
+        new = memo[id(self)] = self.clone()
+        return new
+
+    def clone(self) -> Pokemon:
+        """複製する. 対戦中に変化しないデータは共有する"""
         cls = self.__class__
         new = cls.__new__(cls)
-        memo[id(self)] = new
-        fast_copy(self, new, keys_to_deepcopy=['ability', 'item', 'moves', 'field_status', 'executed_move', 'expended_moves'])
+
+        new.data = self.data
+        new.gender = self.gender
+        new._level = self._level
+        new._nature = self._nature
+        new._indiv = self._indiv.copy()
+        new._effort = self._effort.copy()
+        new._stats = self._stats.copy()
+        new._terastal = self._terastal
+        new.terastallized = self.terastallized
+        new.hp = self.hp
+        # 未設定の場合がある
+        for name in ("observed", "sleep_count"):
+            if hasattr(self, name):
+                setattr(new, name, getattr(self, name))
+
+        new._ability = self._ability.clone()
+        new._item = self._item.clone()
+        new._moves = [move.clone() for move in self._moves]
+        new.ailment = self.ailment.clone(new)
+
+        new.choice_locked = self.choice_locked
+        new.hidden = self.hidden
+        new.lockon = self.lockon
+        new.active_turn = self.active_turn
+        new.forced_turn = self.forced_turn
+        new.sub_hp = self.sub_hp
+        new.bind_damage_denom = self.bind_damage_denom
+        new.hits_taken = self.hits_taken
+        new.boosted_stat = self.boosted_stat
+        new.boost_source = self.boost_source
+        new.rank = self.rank.clone()
+        new.added_types = self.added_types.copy()
+        new.lost_types = self.lost_types.copy()
+
+        # 技の参照を複製後の技に付け替える
+        moves = {id(old): move for old, move in zip(self._moves, new._moves)}
+        new.executed_move = None if self.executed_move is None else \
+            moves.get(id(self.executed_move)) or self.executed_move.clone()
+        new.expended_moves = [moves.get(id(move)) or move.clone() for move in self.expended_moves]
+
         return new
 
     def dump(self) -> dict:
@@ -344,20 +397,28 @@ class Pokemon:
 
     def floating(self, events: EventManager) -> bool:
         floating = "ひこう" in self.types
-        floating &= events.emit(Event.ON_CHECK_FLOATING, EventContext(self), floating)
+        if events.has_handlers(Event.ON_CHECK_FLOATING):
+            floating &= events.emit_from(Event.ON_CHECK_FLOATING, self, floating)
         return floating
 
     def trapped(self, events: EventManager) -> bool:
-        trapped = events.emit(Event.ON_CHECK_TRAPPED, EventContext(self), False)
+        if not events.has_handlers(Event.ON_CHECK_TRAPPED):
+            return False
+        trapped = events.emit_from(Event.ON_CHECK_TRAPPED, self, False)
         trapped &= "ゴースト" not in self.types  # type: ignore
         return trapped
 
     def nervous(self, events: EventManager) -> bool:
-        return events.emit(Event.ON_CHECK_NERVOUS, EventContext(self), False)
+        if not events.has_handlers(Event.ON_CHECK_NERVOUS):
+            return False
+        return events.emit_from(Event.ON_CHECK_NERVOUS, self, False)
 
     def effective_move_type(self, move: Move, events: EventManager) -> str:
-        events.emit(Event.ON_CHECK_MOVE_TYPE, EventContext(self, move))
+        if events.has_handlers(Event.ON_CHECK_MOVE_TYPE):
+            events.emit_from(Event.ON_CHECK_MOVE_TYPE, self, move=move)
         return move._type
 
     def effective_move_category(self, move: Move, events: EventManager) -> MoveCategory:
-        return events.emit(Event.ON_CHECK_MOVE_CATEGORY, EventContext(self, move), value=move.category)
+        if not events.has_handlers(Event.ON_CHECK_MOVE_CATEGORY):
+            return move.category
+        return events.emit_from(Event.ON_CHECK_MOVE_CATEGORY, self, move.category, move=move)
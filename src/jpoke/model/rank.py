@@ -0,0 +1,37 @@
+from __future__ import annotations
+from array import array
+
+from jpoke.utils.types import Stat, get_stats
+
+
+STATS: list[Stat] = get_stats()  # type: ignore
+STAT_INDEX: dict[str, int] = {s: i for i, s in enumerate(STATS)}
+
+
+class Rank(array):
+    """能力ランク
+
+    Stat をキーとして読み書きできる固定長の整数配列
+    """
+    __slots__ = ()
+
+    def __new__(cls, values=None):
+        return super().__new__(cls, "b", bytes(len(STATS)) if values is None else values)
+
+    def __getitem__(self, key: Stat | int) -> int:  # type: ignore
+        return array.__getitem__(self, STAT_INDEX[key] if isinstance(key, str) else key)
+
+    def __setitem__(self, key: Stat | int, value: int):  # type: ignore
+        array.__setitem__(self, STAT_INDEX[key] if isinstance(key, str) else key, value)
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
+
+    def __deepcopy__(self, memo):
+        return self.clone()
+
+    def clone(self) -> Rank:
+        return self.__class__(self)
+
+    def items(self):
+        return zip(STATS, self)
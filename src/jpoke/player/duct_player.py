@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import math
+
+from jpoke.utils.enums import Command
+from jpoke.core import Battle
+
+from .mcts_player import MCTSPlayer
+
+
+class DUCTNode:
+    """同時手番の探索木のノード
+
+    両プレイヤーが独立なバンディットを持ち、それぞれが自分のコマンドの統計だけを見て選ぶ (decoupled UCT)
+    子ノードは両者のコマンドの組ごとに、ターン終了後の局面の状態のハッシュ値で分岐する
+    """
+    __slots__ = ("stats", "children", "n_visits")
+
+    def __init__(self):
+        # プレイヤーごとの {コマンド: [訪問回数, 価値の合計]}
+        self.stats: tuple[dict[Command, list], dict[Command, list]] = ({}, {})
+        self.children: dict[tuple[Command, Command], dict[int, DUCTNode]] = {}
+        self.n_visits: int = 0
+
+    def select(self, idx: int, commands: list[Command], c: float, rng) -> Command:
+        """プレイヤー idx のコマンドを UCB1 (v/n + c * sqrt(ln N / n)) で選ぶ. 未選択のコマンドがあれば優先する"""
+        stats = self.stats[idx]
+        untried = [cmd for cmd in commands if cmd not in stats]
+        if untried:
+            command = rng.choice(untried)
+            stats[command] = [0, 0.]
+            return command
+
+        log_n = math.log(max(self.n_visits, 1))
+
+        def ucb(cmd: Command) -> float:
+            n, v = stats[cmd]
+            if not n:
+                return float("inf")
+            return v / n + c * (log_n / n) ** 0.5
+
+        return max(commands, key=ucb)
+
+    def update(self, commands: tuple[Command, Command], value: float):
+        """value はプレイヤー0から見た評価値"""
+        self.n_visits += 1
+        for idx, v in enumerate([value, 1 - value]):
+            s = self.stats[idx][commands[idx]]
+            s[0] += 1
+            s[1] += v
+
+    def size(self) -> int:
+        return 1 + sum(node.size() for outcomes in self.children.values() for node in outcomes.values())
+
+    def depth(self) -> int:
+        return 1 + max((node.depth() for outcomes in self.children.values() for node in outcomes.values()),
+                       default=0)
+
+
+class DUCTPlayer(MCTSPlayer):
+    """同時手番のモンテカルロ木探索 (decoupled UCT) でコマンドを選ぶプレイヤー
+
+    MCTSPlayer は相手のコマンドを一様に標本化するが、DUCTPlayer は相手のコマンドも
+    相手から見た UCB1 で選び、同時に選ぶことを前提とした混合戦略に近づける
+    """
+
+    def root_stats(self, root: DUCTNode, idx: int) -> dict[Command, tuple[int, float]]:
+        return {cmd: (n, v) for cmd, (n, v) in root.stats[idx].items()}
+
+    def reuse_tree(self, state_hash: int, idx: int) -> DUCTNode | None:
+        """前回選んだコマンドを含む組の先から、現在の局面に一致するノードを取り出す"""
+        if self.tree is None:
+            return None
+        for commands, outcomes in self.tree.children.items():
+            if commands[idx] == self.last_command and state_hash in outcomes:
+                return outcomes[state_hash]
+        return None
+
+    def new_node(self) -> DUCTNode:
+        return DUCTNode()
+
+    def run_iteration(self, battle: Battle, idx: int, root: DUCTNode):
+        """選択、展開、ロールアウト、逆伝播を1回ずつ行う"""
+        path: list[tuple[DUCTNode, tuple[Command, Command]]] = []
+        node = root
+
+        # 選択と展開
+        while battle.winner() is None and len(path) < self.max_depth:
+            n_tried = [len(s) for s in node.stats]
+            commands: tuple[Command, Command] = tuple(  # type: ignore
+                node.select(i, battle.get_available_action_commands(pl), self.c, self.rng)
+                for i, pl in enumerate(battle.players))
+            expanded = [len(s) for s in node.stats] != n_tried
+
+            self.step(battle, dict(zip(battle.players, commands)))
+            path.append((node, commands))
+
+            outcomes = node.children.setdefault(commands, {})
+            state_hash = battle.observation_hash(battle.players[idx])
+            if state_hash not in outcomes:
+                outcomes[state_hash] = DUCTNode()
+            node = outcomes[state_hash]
+            if expanded:
+                break
+
+        # 逆伝播. 評価値をプレイヤー0の視点に揃える
+        value = self.rollout(battle, 0)
+        for node, commands in path:
+            node.update(commands, value)
@@ -0,0 +1,215 @@
+"""互いに1匹ずつ残った終盤の厳密解
+
+局面ごとに、両者のコマンドの組に対する勝率の行列を期待値最大化 (乱数の分岐は列挙) で求め、
+その混合戦略ナッシュ均衡を再帰的に計算する. 結果は局面のキーごとに保存する
+"""
+from __future__ import annotations
+
+import pickle
+import warnings
+from dataclasses import dataclass
+
+import numpy as np
+
+from jpoke.utils.enums import Command
+from jpoke.core import Battle
+from jpoke.core.chance import TooManyBranches, enumerate_outcomes
+from jpoke.core.encoding import iter_fields
+
+from .mcts_player import ENGINE_ERRORS, evaluate
+from .payoff import solve_matrix_game
+
+
+# 列挙できなかったコマンドの組を評価値で代用する例外
+ENUMERATION_ERRORS = ENGINE_ERRORS + (TooManyBranches,)
+
+
+@dataclass
+class EndgameResult:
+    """プレイヤー0の勝率と両者の均衡戦略
+
+    exact が False なら、探索の深さの上限や未実装の処理により評価値で打ち切った局面を含む
+    """
+    value: float
+    commands: tuple[list[Command], list[Command]]
+    strategies: tuple[np.ndarray, np.ndarray]
+    exact: bool
+    depth: int
+
+    def strategy(self, idx: int) -> dict[Command, float]:
+        """プレイヤー idx の混合戦略"""
+        return dict(zip(self.commands[idx], self.strategies[idx].tolist()))
+
+
+def is_endgame(battle: Battle) -> bool:
+    """互いに場のポケモンしか残っていなければ True"""
+    if battle.turn < 1 or battle.has_interrupt():
+        return False
+    for player in battle.players:
+        alive = [mon for mon in player.selection if mon.hp]
+        if len(alive) != 1 or alive[0] is not player.active:
+            return False
+    return True
+
+
+def endgame_key(battle: Battle) -> tuple:
+    """終盤の局面のキー
+
+    場のポケモンの種族、実数値、特性、持ち物、HP、状態異常、ランク、技と PP などと、場の状態からなる
+    場に出てからのターン数などの経過ターンは含めない
+    """
+    key = []
+    for player in battle.players:
+        mon = player.active
+        key.append((
+            mon.name, tuple(mon._stats), mon.hp,
+            mon.ability.data.name, mon.ability.active, mon.item.data.name, mon.item.active,
+            mon.ailment.data.name, mon.ailment.count, getattr(mon, "sleep_count", -1),
+            mon.terastallized, tuple(mon.rank),
+            tuple((move.data.name, move.pp) for move in mon.moves),
+            mon.choice_locked, mon.executed_move.data.name if mon.executed_move else "",
+            mon.forced_turn, mon.sub_hp,
+        ))
+    key.append(tuple((field.data.name, field.count) for field in iter_fields(battle)))
+    return tuple(key)
+
+
+def tod_value(battle: Battle) -> float:
+    """TOD で決着したときのプレイヤー0の勝率"""
+    s0, s1 = [battle.TOD_score(pl) for pl in battle.players]
+    return 1. if s0 > s1 else 0. if s0 < s1 else 0.5
+
+
+def _saddle_point(values: np.ndarray) -> tuple[int, int] | None:
+    """純粋戦略の均衡があればその組"""
+    i = int(values.min(axis=1).argmax())
+    j = int(values.max(axis=0).argmin())
+    if values[i].min() == values[:, j].max():
+        return i, j
+    return None
+
+
+class EndgameSolver:
+    """終盤の局面の勝率と均衡戦略を求める
+
+    確率的に同じ局面に戻るコマンドの組は、戻った局面で両者が選び直すものとして不動点反復で解く
+    必ず局面を変えないコマンドの組は、選び続ければ TOD で決着するものとする
+    max_depth ターンより先や、別の局面を経て同じ局面に戻った場合は TOD スコアの比で評価する (exact = False)
+    """
+
+    def __init__(self,
+                 max_depth: int = 20,
+                 solver_iterations: int = 2000,
+                 fixed_point_iterations: int = 1000,
+                 fixed_point_tolerance: float = 1e-9):
+        self.max_depth: int = max_depth
+        self.solver_iterations: int = solver_iterations
+        self.fixed_point_iterations: int = fixed_point_iterations
+        self.fixed_point_tolerance: float = fixed_point_tolerance
+        self.cache: dict[tuple, EndgameResult] = {}
+        self.n_hits: int = 0
+        self.n_nodes: int = 0
+        # 列挙できずに評価値で代用したコマンドの組の数
+        self.n_errors: int = 0
+        # 探索中の局面. 同じ局面に戻った場合は評価値で打ち切る
+        self.stack: set[tuple] = set()
+
+    def solve(self, battle: Battle) -> EndgameResult:
+        if not is_endgame(battle):
+            raise Exception("Each player must have exactly one Pokemon left.")
+        n_errors = self.n_errors
+        try:
+            return self.search(battle, self.max_depth)
+        finally:
+            self.stack.clear()
+            if self.n_errors > n_errors:
+                warnings.warn("Some command pairs could not be enumerated and were replaced by evaluations. "
+                              "See EndgameSolver.n_errors.", RuntimeWarning, stacklevel=2)
+
+    def search(self, battle: Battle, depth: int) -> EndgameResult:
+        commands = ([], [])
+        empty = (np.zeros(0), np.zeros(0))
+
+        winner = battle.winner()
+        if winner is not None:
+            return EndgameResult(float(winner is battle.players[0]), commands, empty, True, depth)
+
+        key = endgame_key(battle)
+        if key in self.cache:
+            result = self.cache[key]
+            if result.exact or result.depth >= depth:
+                self.n_hits += 1
+                return result
+        if not depth or key in self.stack:
+            return EndgameResult(evaluate(battle, 0), commands, empty, False, depth)
+
+        self.n_nodes += 1
+        self.stack.add(key)
+        p0, p1 = battle.players
+        commands = (battle.get_available_action_commands(p0), battle.get_available_action_commands(p1))
+        # 局面が変わる結果の勝率の期待値と、同じ局面に戻る確率
+        values = np.zeros((len(commands[0]), len(commands[1])))
+        stays = np.zeros_like(values)
+        exact = True
+
+        def value_fn(b: Battle) -> float:
+            nonlocal exact
+            if endgame_key(b) == key:
+                return np.nan
+            result = self.search(b, depth - 1)
+            exact &= result.exact
+            return result.value
+
+        for i, c0 in enumerate(commands[0]):
+            for j, c1 in enumerate(commands[1]):
+                try:
+                    outcomes = enumerate_outcomes(battle, {p0: c0, p1: c1}, value_fn)
+                    # 必ず局面が変わらないなら TOD で決着する
+                    p_stay = sum(o.probability for o in outcomes if np.isnan(o.value))  # type: ignore
+                    if p_stay < 1 - 1e-12:
+                        values[i, j] = sum(o.probability * o.value for o in outcomes  # type: ignore
+                                           if not np.isnan(o.value))  # type: ignore
+                        stays[i, j] = p_stay
+                    else:
+                        values[i, j] = tod_value(battle)
+                except ENUMERATION_ERRORS:
+                    # 未実装の処理に到達した場合は、現在の局面の評価値で代用する
+                    values[i, j] = evaluate(battle, 0)
+                    exact = False
+                    self.n_errors += 1
+        self.stack.discard(key)
+
+        if not stays.any():
+            s0, s1, value = self.solve_values(values)
+        else:
+            # 同じ局面に戻った結果の勝率をこの局面の勝率とし、勝率が収束するまで行列ゲームを解き直す
+            s0, s1, value = self.solve_values(values / (1 - stays))
+            for _ in range(self.fixed_point_iterations):
+                s0, s1, new_value = self.solve_values(values + stays * value)
+                converged = abs(new_value - value) < self.fixed_point_tolerance
+                value = new_value
+                if converged:
+                    break
+            else:
+                exact = False
+
+        result = EndgameResult(value, commands, (s0, s1), exact, depth)
+        self.cache[key] = result
+        return result
+
+    def solve_values(self, values: np.ndarray) -> tuple[np.ndarray, np.ndarray, float]:
+        """勝率の行列の均衡戦略の組と、そのときの勝率"""
+        if (ij := _saddle_point(values)) is not None:
+            s0, s1 = np.eye(len(values))[ij[0]], np.eye(len(values[0]))[ij[1]]
+            return s0, s1, float(values[ij])
+        s0, s1, value, _ = solve_matrix_game(values, self.solver_iterations)
+        return s0, s1, value
+
+    def save_cache(self, path: str):
+        """厳密に解けた局面だけを保存する"""
+        with open(path, "wb") as f:
+            pickle.dump({k: v for k, v in self.cache.items() if v.exact}, f)
+
+    def load_cache(self, path: str):
+        with open(path, "rb") as f:
+            self.cache.update(pickle.load(f))
@@ -0,0 +1,18 @@
+from jpoke.utils.enums import Command
+from jpoke.core import Battle, Player
+
+
+class GreedyPlayer(Player):
+    """相手の場のポケモンへの期待ダメージが最大の技を選ぶプレイヤー"""
+
+    def choose_action_command(self, battle: Battle) -> Command:
+        commands = [cmd for cmd in battle.get_available_action_commands(self) if not cmd.is_switch()]
+        # 交代しか選べなければランダムに選ぶ
+        if not commands:
+            return super().choose_action_command(battle)
+        return max(commands, key=lambda cmd: self.expected_damage(battle, cmd))
+
+    def expected_damage(self, battle: Battle, command: Command) -> float:
+        move = battle.command_to_move(self, command)
+        damages = battle.calc_damages(self.active, move)
+        return sum(damages) / len(damages)
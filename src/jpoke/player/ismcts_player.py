@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import numpy as np
+
+from jpoke.core import Battle
+from jpoke.core.determinization import Determinizations
+
+from .mcts_player import MCTSPlayer, Node
+
+
+class ISMCTSPlayer(MCTSPlayer):
+    """情報集合モンテカルロ木探索 (single-observer ISMCTS) でコマンドを選ぶプレイヤー
+
+    反復ごとに相手の非公開情報 (選出、特性、持ち物、技) を標本から選び直し、1つの探索木で統計を共有する
+    ノードは観測できる状態のハッシュ値でまとめるので、相手の情報だけが異なる局面は同じノード (情報集合) になる
+    標本ごとに独立に探索して平均する場合と異なり、同じ局面の統計を標本の間で重複して集めない
+    """
+
+    def __init__(self, name: str = "", n_determinizations: int = 1000, **kwargs):
+        super().__init__(name, **kwargs)
+        self.n_determinizations: int = n_determinizations
+        self.determinizations: Determinizations | None = None
+
+    def search(self, battle: Battle, deadline: float) -> Node:
+        # 標本は探索の初めにまとめて生成する
+        self.determinizations = battle.determinize(
+            self, self.n_determinizations, np.random.default_rng(self.rng.getrandbits(64)))
+        return super().search(battle, deadline)
+
+    def run_iteration(self, battle: Battle, idx: int, root: Node):
+        """標本を1つ選んで上書きしてから探索する. 上書きは探索後の rollback で元に戻る"""
+        assert self.determinizations is not None
+        self.determinizations.apply(battle, self.rng.randrange(len(self.determinizations)))
+        super().run_iteration(battle, idx, root)
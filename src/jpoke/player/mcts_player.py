@@ -1,10 +1,359 @@
-from jpoke.utils.enums import Command
+from __future__ import annotations
+
+import math
+import time
+import random
+import weakref
+import warnings
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from jpoke.utils.enums import Command, Time
 from jpoke.core import Battle, Player
 
 
+@dataclass
+class SearchStats:
+    """1回のコマンド選択における探索の記録"""
+    turn: int
+    iterations: int
+    elapsed: float
+    tree_size: int
+    max_depth: int
+    n_errors: int
+    n_reused: int = 0
+
+    @property
+    def iterations_per_sec(self) -> float:
+        return self.iterations / self.elapsed if self.elapsed else 0.
+
+    def __str__(self) -> str:
+        return f"turn {self.turn}: {self.iterations} iterations in {self.elapsed:.2f}s " \
+            f"({self.iterations_per_sec:,.0f}/s), tree size {self.tree_size}, max depth {self.max_depth}, " \
+            f"reused {self.n_reused} nodes"
+
+
+class Node:
+    """探索木のノード
+
+    自分が行動を選ぶ局面のノードは children に自分のコマンドごとの子ノードを、
+    コマンドのノードは outcomes にターン終了後の局面のノードを観測できる状態のハッシュ値ごとに持つ
+    相手のコマンドと乱数は標本化し、その結果は outcomes の分岐として表れる
+    """
+    __slots__ = ("children", "outcomes", "n_visits", "total_value")
+
+    def __init__(self):
+        self.children: dict[Command, Node] = {}
+        self.outcomes: dict[int, Node] = {}
+        self.n_visits: int = 0
+        self.total_value: float = 0.
+
+    def ucb(self, child: Node, c: float) -> float:
+        """UCB1: v/n + c * sqrt(ln N / n)"""
+        if not child.n_visits:
+            return float("inf")
+        return child.total_value / child.n_visits + \
+            c * (math.log(max(self.n_visits, 1)) / child.n_visits) ** 0.5
+
+    def size(self) -> int:
+        return 1 + sum(child.size() for child in self.children.values()) + \
+            sum(node.size() for node in self.outcomes.values())
+
+    def depth(self) -> int:
+        """自分が行動を選ぶ局面の段数"""
+        return 1 + max((node.depth() for child in self.children.values()
+                        for node in child.outcomes.values()), default=0)
+
+
+class EngineError(Exception):
+    """未実装の処理に到達したなどの理由で、バトルを進められない"""
+
+
+# 未実装の処理に到達したときにバトルの処理が送出する例外
+# ValueError はターンの途中で交代したポケモンを行動順から探したときなどに送出される
+ENGINE_ERRORS = (IndexError, TypeError, ValueError)
+
+
+def resolve_interrupts(battle: Battle, max_interrupts: int = 10):
+    """割り込み (瀕死や交代技による交代) が残っていれば処理する
+
+    max_interrupts 回で解消しなければ、処理が進まない局面とみなして EngineError を送出する
+    """
+    for _ in range(max_interrupts):
+        if not battle.has_interrupt() or battle.winner() is not None:
+            return
+        battle.advance_turn()
+    raise EngineError("The interrupt was not resolved.")
+
+
+def step(battle: Battle, commands: dict[Player, Command], max_interrupts: int = 10):
+    """1ターン進め、割り込みを処理し終えた局面にする
+
+    探索木は割り込みを処理した後の局面で分岐させ、実際の対戦で次にコマンドを選ぶ局面と一致させる
+    バトルを進められなければ EngineError を送出する
+    """
+    try:
+        resolve_interrupts(battle, max_interrupts)
+        if battle.winner() is None:
+            battle.advance_turn(commands)
+            resolve_interrupts(battle, max_interrupts)
+    except ENGINE_ERRORS as e:
+        raise EngineError(f"{type(e).__name__}: {e}") from e
+
+
+def evaluate(battle: Battle, idx: int) -> float:
+    """プレイヤー idx から見た局面の評価値 [0, 1]. 決着していなければ TOD スコアの比"""
+    winner = battle.winner()
+    if winner is not None:
+        return float(winner is battle.players[idx])
+    scores = [battle.TOD_score(pl) for pl in battle.players]
+    return scores[idx] / sum(scores)
+
+
+def rollout(battle: Battle, idx: int, n_turns: int, rng: random.Random) -> float:
+    """両者がランダムにコマンドを選んで n_turns ターン進めた局面の評価値"""
+    for _ in range(n_turns):
+        if battle.winner() is not None:
+            break
+        step(battle, {pl: rng.choice(battle.get_available_action_commands(pl)) for pl in battle.players})
+    return evaluate(battle, idx)
+
+
+def use_processes(n_workers: int) -> bool:
+    """n_workers > 1 で、fork でプロセスを起動できれば True. できなければ警告して逐次処理にする"""
+    if n_workers <= 1:
+        return False
+    if "fork" not in mp.get_all_start_methods():
+        warnings.warn("The fork start method is not available; searching in a single process.",
+                      RuntimeWarning, stacklevel=3)
+        return False
+    return True
+
+
+# ワーカープロセスが保持するバトルと自分のプレイヤー番号
+_worker_battle: tuple[Battle, int] | None = None
+
+
+def _init_worker(battle: Battle, idx: int):
+    global _worker_battle
+    _worker_battle = (battle, idx)
+
+
+def _search_worker(state, deadline: float, seed: int, last_command: Command | None) -> tuple[dict[Command, tuple[int, float]], SearchStats]:
+    """ワーカープロセスで独立に探索し、根の子ノードの訪問回数と価値の合計を返す
+
+    探索木はワーカーごとに保持し、次のターンの探索で再利用する
+    1つのワーカーが同じターンに複数のタスクを処理した場合は、最後に処理したタスクの探索木が残る
+    """
+    assert _worker_battle is not None
+    battle, idx = _worker_battle
+    battle.decode(state)
+    player: MCTSPlayer = battle.players[idx]  # type: ignore
+    player.rng.seed(seed)
+    player.last_command = last_command
+    random.seed(seed)
+    # プロセス間で共通の time.time() で期限を受け取る
+    root = player.search(battle, time.perf_counter() + deadline - time.time())
+    return player.root_stats(root, idx), player.search_logs.pop()
+
+
 class MCTSPlayer(Player):
-    def __init__(self, name: str = ""):
+    """モンテカルロ木探索でコマンドを選ぶプレイヤー
+
+    制限時間に達するか iterations 回探索すると、それまでに最も多く訪問したコマンドを返す
+    n_workers > 1 なら各プロセスで独立に探索し、根の訪問回数を合算する (root parallelization)
+    ワーカープロセスは close() か with 文の終了時、またはプレイヤーが破棄されたときに終了する
+    """
+
+    def __init__(self,
+                 name: str = "",
+                 time_budget: float | None = None,
+                 iterations: int | None = None,
+                 c: float = 1.4,
+                 max_depth: int = 3,
+                 rollout_turns: int = 5,
+                 n_workers: int = 1,
+                 verbose: bool = False):
         super().__init__(name)
+        # 制限時間 [s]. 指定がなければコマンド入力時間の8割
+        self.time_budget: float = Time.COMMAND.value * 0.8 if time_budget is None else time_budget
+        self.iterations: int | None = iterations
+        self.c: float = c
+        self.max_depth: int = max_depth
+        self.rollout_turns: int = rollout_turns
+        self.n_workers: int = n_workers
+        self.verbose: bool = verbose
+        self.search_logs: list[SearchStats] = []
+        self.rng = random.Random()
+        self.pool: ProcessPoolExecutor | None = None
+        self.pool_key: int | None = None
+        self.pool_finalizer: weakref.finalize | None = None
+        # 前回の探索木と、そのとき選んだコマンド
+        self.tree: Node | None = None
+        self.last_command: Command | None = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
     def choose_action_command(self, battle: Battle) -> Command:
         commands = battle.get_available_action_commands(self)
+        idx = battle.players.index(self)
+        if len(commands) == 1:
+            self.tree = self.reuse_tree(battle.observation_hash(self), idx)
+            self.last_command = commands[0]
+            return commands[0]
+
+        if use_processes(self.n_workers):
+            stats = self.parallel_search(battle, self.time_budget)
+        else:
+            stats = self.root_stats(self.search(battle, time.perf_counter() + self.time_budget), idx)
+        if stats:
+            self.last_command = max(stats, key=lambda cmd: stats[cmd][0])
+        else:
+            # 1回も探索できなければ、選べるコマンドの先頭を返す
+            self.last_command = commands[0]
+        return self.last_command
+
+    def root_stats(self, root: Node, idx: int) -> dict[Command, tuple[int, float]]:
+        """根における自分のコマンドごとの (訪問回数, 価値の合計)"""
+        return {cmd: (child.n_visits, child.total_value) for cmd, child in root.children.items()}
+
+    def new_node(self) -> Node:
+        return Node()
+
+    def reuse_tree(self, state_hash: int, idx: int) -> Node | None:
+        """前回選んだコマンドの先から、現在の局面に一致するノードを取り出す"""
+        if self.tree is None or self.last_command not in self.tree.children:
+            return None
+        return self.tree.children[self.last_command].outcomes.get(state_hash)
+
+    def search(self, battle: Battle, deadline: float) -> Node:
+        """期限まで探索して探索木の根を返す"""
+        t0 = time.perf_counter()
+        battle, me = battle.masked(self, np.random.default_rng(self.rng.getrandbits(64)))
+        battle.random.seed(self.rng.getrandbits(64))
+        idx = battle.players.index(me)
+        root = self.reuse_tree(battle.observation_hash(me), idx)
+        n_reused = root.size() if root else 0
+        root = root or self.new_node()
+        n, n_errors = 0, 0
+
+        while time.perf_counter() < deadline and (self.iterations is None or n < self.iterations):
+            cp = battle.checkpoint()
+            try:
+                self.run_iteration(battle, idx, root)
+            except EngineError:
+                # バトルを進められなかった場合は、その反復を破棄する
+                n_errors += 1
+            battle.rollback(cp)
+            n += 1
+
+        battle.clear_checkpoints()
+        self.tree = root
+        if n_errors:
+            warnings.warn("Some search iterations could not advance the battle and were discarded. "
+                          "See SearchStats.n_errors.", RuntimeWarning, stacklevel=2)
+
+        stats = SearchStats(battle.turn, n, time.perf_counter() - t0, root.size(), root.depth() - 1,
+                            n_errors, n_reused)
+        self.search_logs.append(stats)
+        if self.verbose:
+            print(stats)
+        return root
+
+    def parallel_search(self, battle: Battle, time_budget: float) -> dict[Command, tuple[int, float]]:
+        """n_workers 個のプロセスで独立に探索し、根におけるコマンドごとの統計を合算して返す"""
+        t0 = time.perf_counter()
+        pool = self.get_pool(battle)
+        state = battle.encode()
+        deadline = time.time() + time_budget
+        futures = [pool.submit(_search_worker, state, deadline, self.rng.getrandbits(64), self.last_command)
+                   for _ in range(self.n_workers)]
+
+        merged: dict[Command, tuple[int, float]] = {}
+        logs = []
+        for future in futures:
+            root_stats, stats = future.result()
+            for cmd, (n_visits, total_value) in root_stats.items():
+                n, v = merged.get(cmd, (0, 0.))
+                merged[cmd] = (n + n_visits, v + total_value)
+            logs.append(stats)
+
+        stats = SearchStats(battle.turn,
+                            sum(s.iterations for s in logs),
+                            time.perf_counter() - t0,
+                            sum(s.tree_size for s in logs),
+                            max(s.max_depth for s in logs),
+                            sum(s.n_errors for s in logs),
+                            sum(s.n_reused for s in logs))
+        self.search_logs.append(stats)
+        if self.verbose:
+            print(stats)
+        return merged
+
+    def get_pool(self, battle: Battle) -> ProcessPoolExecutor:
+        """バトルごとにワーカープロセスを用意する
+
+        バトルは fork で各プロセスに引き継ぎ、以降は encode した状態だけを送る
+        バトルは Battle.uid で見分ける
+        """
+        key = battle.uid
+        if self.pool is None or self.pool_key != key:
+            self.close()
+            pool = ProcessPoolExecutor(self.n_workers, mp_context=mp.get_context("fork"),
+                                       initializer=_init_worker,
+                                       initargs=(battle, battle.players.index(self)))
+            self.pool, self.pool_key = pool, key
+            # close() を呼ばずに破棄された場合も終了する
+            self.pool_finalizer = weakref.finalize(self, pool.shutdown)
+        return self.pool
+
+    def close(self):
+        """ワーカープロセスを終了する"""
+        if self.pool is not None:
+            self.pool_finalizer()  # type: ignore
+            self.pool, self.pool_key, self.pool_finalizer = None, None, None
+
+    def run_iteration(self, battle: Battle, idx: int, root: Node):
+        """選択、展開、ロールアウト、逆伝播を1回ずつ行う"""
+        me, rival = battle.players[idx], battle.players[1 - idx]
+        path = [root]
+        node = root
+
+        # 選択と展開
+        while battle.winner() is None and len(path) <= 2*self.max_depth:
+            commands = battle.get_available_action_commands(me)
+            untried = [cmd for cmd in commands if cmd not in node.children]
+            if untried:
+                command = self.rng.choice(untried)
+                node.children[command] = Node()
+            else:
+                command = max(commands, key=lambda cmd: node.ucb(node.children[cmd], self.c))
+            child = node.children[command]
+
+            self.step(battle, {me: command, rival: self.rng.choice(battle.get_available_action_commands(rival))})
+            state_hash = battle.observation_hash(me)
+            if state_hash not in child.outcomes:
+                child.outcomes[state_hash] = Node()
+            node = child.outcomes[state_hash]
+            path += [child, node]
+            if untried:
+                break
+
+        # 逆伝播
+        value = self.rollout(battle, idx)
+        for node in path:
+            node.n_visits += 1
+            node.total_value += value
+
+    def rollout(self, battle: Battle, idx: int) -> float:
+        return rollout(battle, idx, self.rollout_turns, self.rng)
+
+    def step(self, battle: Battle, commands: dict[Player, Command]):
+        step(battle, commands)
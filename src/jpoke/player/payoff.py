@@ -0,0 +1,253 @@
+"""1ターンの利得行列の推定と、その混合戦略ナッシュ均衡の計算
+
+利得はプレイヤー0から見た評価値 [0, 1] で、プレイヤー1の利得は 1 - 利得 とする (定和ゲーム)
+"""
+from __future__ import annotations
+from typing import Callable
+
+import time
+import pickle
+import random
+import weakref
+import warnings
+import multiprocessing as mp
+from copy import deepcopy
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from jpoke.utils.enums import Command
+from jpoke.core import Battle
+
+from .mcts_player import EngineError, step, evaluate, rollout, use_processes
+
+
+@dataclass
+class PayoffMatrix:
+    """コマンドの組ごとの利得と、その均衡"""
+    commands: tuple[list[Command], list[Command]]
+    values: np.ndarray
+    strategies: tuple[np.ndarray, np.ndarray]
+    value: float
+    exploitability: float
+    elapsed: float
+    # バトルを進められずに破棄した試行の数
+    n_errors: int = 0
+
+    def strategy(self, idx: int) -> dict[Command, float]:
+        """プレイヤー idx の混合戦略"""
+        return dict(zip(self.commands[idx], self.strategies[idx].tolist()))
+
+
+def solve_matrix_game(values: np.ndarray, iterations: int = 1000) -> tuple[np.ndarray, np.ndarray, float, float]:
+    """regret matching+ でゼロ和行列ゲームを解く
+
+    行プレイヤーは values を最大化、列プレイヤーは最小化する
+    平均戦略の組と、そのときの利得、exploitability (両者が最善応答したときの利得の差) を返す
+    """
+    m, n = values.shape
+    regrets = [np.zeros(m), np.zeros(n)]
+    totals = [np.zeros(m), np.zeros(n)]
+
+    def current(r: np.ndarray) -> np.ndarray:
+        total = r.sum()
+        return r / total if total > 0 else np.full(len(r), 1 / len(r))
+
+    for t in range(1, iterations + 1):
+        s0, s1 = current(regrets[0]), current(regrets[1])
+        u0 = values @ s1
+        u1 = -(s0 @ values)
+        regrets[0] = np.maximum(regrets[0] + u0 - s0 @ u0, 0)
+        regrets[1] = np.maximum(regrets[1] + u1 - s1 @ u1, 0)
+        # 後半の戦略ほど重く平均する
+        totals[0] += t * s0
+        totals[1] += t * s1
+
+    s0, s1 = totals[0] / totals[0].sum(), totals[1] / totals[1].sum()
+    exploitability = float((values @ s1).max() - (s0 @ values).min())
+    return s0, s1, float(s0 @ values @ s1), exploitability
+
+
+def team_signature(battle: Battle) -> tuple:
+    """状態のハッシュ値に含まれない、選出したポケモンの種類・特性・持ち物・技"""
+    return tuple(
+        tuple((mon.name, mon.ability.data.name, mon.item.data.name, tuple(move.data.name for move in mon.moves))
+              for mon in player.selection)
+        for player in battle.players
+    )
+
+
+def estimate_payoffs(battle: Battle,
+                     cells: list[tuple[int, int]],
+                     n_rollouts: int,
+                     rollout_turns: int,
+                     rng: random.Random,
+                     value_fn: Callable[[Battle, int], float] | None = None) -> tuple[list[float], int]:
+    """指定したコマンドの組 (i, j) ごとに、利得を n_rollouts 回の平均で推定する
+
+    value_fn があれば、ロールアウトの代わりに1ターン進めた局面を value_fn で評価する
+    バトルを進められなかった試行は破棄し、すべて破棄した組は現在の局面の評価値で代用する
+    利得と破棄した試行の数を返す. battle は checkpoint/rollback で元に戻す
+    """
+    p0, p1 = battle.players
+    commands0 = battle.get_available_action_commands(p0)
+    commands1 = battle.get_available_action_commands(p1)
+    results = []
+    n_errors = 0
+    for i, j in cells:
+        total, n = 0., 0
+        for _ in range(n_rollouts):
+            cp = battle.checkpoint()
+            try:
+                step(battle, {p0: commands0[i], p1: commands1[j]})
+                if value_fn and battle.winner() is None:
+                    total += value_fn(battle, 0)
+                else:
+                    total += rollout(battle, 0, rollout_turns, rng)
+                n += 1
+            except EngineError:
+                n_errors += 1
+            finally:
+                battle.rollback(cp)
+        results.append(total / n if n else evaluate(battle, 0))
+    battle.clear_checkpoints()
+    return results, n_errors
+
+
+# ワーカープロセスが保持するバトルと評価関数
+_worker_battle: tuple[Battle, Callable | None] | None = None
+
+
+def _init_worker(battle: Battle, value_fn: Callable | None):
+    global _worker_battle
+    _worker_battle = (battle, value_fn)
+
+
+def _estimate_worker(state, cells, n_rollouts, rollout_turns, seed) -> tuple[list[float], int]:
+    assert _worker_battle is not None
+    battle, value_fn = _worker_battle
+    battle.decode(state)
+    battle.random.seed(seed)
+    random.seed(seed)
+    return estimate_payoffs(battle, cells, n_rollouts, rollout_turns, random.Random(seed), value_fn)
+
+
+class PayoffSolver:
+    """局面ごとの利得行列を推定して解く. 結果は選出と状態のハッシュ値の組ごとに保存する
+
+    n_workers > 1 ならコマンドの組をプロセスに分けて推定する
+    ワーカープロセスは close() か with 文の終了時、または破棄されたときに終了する
+    """
+
+    def __init__(self,
+                 n_rollouts: int = 16,
+                 rollout_turns: int = 5,
+                 value_fn: Callable[[Battle, int], float] | None = None,
+                 n_workers: int = 1,
+                 solver_iterations: int = 1000,
+                 cache_size: int = 100000):
+        self.n_rollouts: int = n_rollouts
+        self.rollout_turns: int = rollout_turns
+        self.value_fn = value_fn
+        self.n_workers: int = n_workers
+        self.solver_iterations: int = solver_iterations
+        self.cache_size: int = cache_size
+        self.cache: dict[tuple[tuple, int], PayoffMatrix] = {}
+        self.n_hits: int = 0
+        self.n_misses: int = 0
+        self.rng = random.Random()
+        self.pool: ProcessPoolExecutor | None = None
+        self.pool_key: int | None = None
+        self.pool_finalizer: weakref.finalize | None = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def solve(self, battle: Battle) -> PayoffMatrix:
+        """利得行列を推定して均衡を求める. 同じ局面は保存した結果を返す"""
+        key = (team_signature(battle), battle.state_hash())
+        if key in self.cache:
+            self.n_hits += 1
+            return self.cache[key]
+        self.n_misses += 1
+
+        t0 = time.perf_counter()
+        values, n_errors = self.build(battle)
+        s0, s1, value, exploitability = solve_matrix_game(values, self.solver_iterations)
+        result = PayoffMatrix(
+            commands=(battle.get_available_action_commands(battle.players[0]),
+                      battle.get_available_action_commands(battle.players[1])),
+            values=values,
+            strategies=(s0, s1),
+            value=value,
+            exploitability=exploitability,
+            elapsed=time.perf_counter() - t0,
+            n_errors=n_errors,
+        )
+        if n_errors:
+            warnings.warn("Some rollouts could not advance the battle and were discarded. "
+                          "See PayoffMatrix.n_errors.", RuntimeWarning, stacklevel=2)
+
+        if len(self.cache) >= self.cache_size:
+            # 最も古い結果を捨てる
+            del self.cache[next(iter(self.cache))]
+        self.cache[key] = result
+        return result
+
+    def build(self, battle: Battle) -> tuple[np.ndarray, int]:
+        """プレイヤー0から見た利得行列と、破棄した試行の数"""
+        m = len(battle.get_available_action_commands(battle.players[0]))
+        n = len(battle.get_available_action_commands(battle.players[1]))
+        cells = [(i, j) for i in range(m) for j in range(n)]
+
+        if use_processes(self.n_workers):
+            pool = self.get_pool(battle)
+            state = battle.encode()
+            chunks = [cells[k::self.n_workers] for k in range(self.n_workers)]
+            futures = [pool.submit(_estimate_worker, state, chunk, self.n_rollouts, self.rollout_turns,
+                                   self.rng.getrandbits(64)) for chunk in chunks]
+            outputs = [f.result() for f in futures]
+            results = dict(zip(sum(chunks, []), sum((values for values, _ in outputs), [])))
+            n_errors = sum(n for _, n in outputs)
+        else:
+            # 両者の情報を含む局面の利得を求めるので、相手の情報は隠さない
+            copied = deepcopy(battle)
+            copied.random.seed(self.rng.getrandbits(64))
+            payoffs, n_errors = estimate_payoffs(
+                copied, cells, self.n_rollouts, self.rollout_turns, self.rng, self.value_fn)
+            results = dict(zip(cells, payoffs))
+
+        values = np.zeros((m, n))
+        for (i, j), v in results.items():
+            values[i, j] = v
+        return values, n_errors
+
+    def get_pool(self, battle: Battle) -> ProcessPoolExecutor:
+        """バトルごとにワーカープロセスを用意する. バトルは fork で引き継ぎ、Battle.uid で見分ける"""
+        key = battle.uid
+        if self.pool is None or self.pool_key != key:
+            self.close()
+            self.pool = ProcessPoolExecutor(self.n_workers, mp_context=mp.get_context("fork"),
+                                            initializer=_init_worker, initargs=(battle, self.value_fn))
+            self.pool_key = key
+            # close() を呼ばずに破棄された場合も終了する
+            self.pool_finalizer = weakref.finalize(self, self.pool.shutdown)
+        return self.pool
+
+    def close(self):
+        """ワーカープロセスを終了する"""
+        if self.pool is not None:
+            self.pool_finalizer()  # type: ignore
+            self.pool, self.pool_key, self.pool_finalizer = None, None, None
+
+    def save_cache(self, path: str):
+        with open(path, "wb") as f:
+            pickle.dump(self.cache, f)
+
+    def load_cache(self, path: str):
+        with open(path, "rb") as f:
+            self.cache.update(pickle.load(f))
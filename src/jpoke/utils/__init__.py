@@ -1,11 +1,11 @@
 from copy import deepcopy
 
 
-def fast_copy(old, new, keys_to_deepcopy: list[str] | None = None):
+def fast_copy(old, new, keys_to_deepcopy: list[str] | None = None, memo: dict | None = None):
     """指定されたkeyのみdeep copyし、それ以外はshallow copyする"""
     for key, val in old.__dict__.items():
         if keys_to_deepcopy and key in keys_to_deepcopy:
-            setattr(new, key, deepcopy(val))
+            setattr(new, key, deepcopy(val, memo))
         else:
             setattr(new, key, recursive_copy(val))
     return new
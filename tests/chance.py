@@ -0,0 +1,49 @@
+from jpoke import Pokemon
+from jpoke.core.chance import RecordingRandom
+from jpoke.utils.enums import Command
+from jpoke.utils import test_utils
+
+
+def test():
+    test_utils.PRINT_LOG = False
+
+    def generate():
+        return test_utils.generate_battle(
+            ally=[Pokemon("ピカチュウ", moves=["たいあたり"])],
+            foe=[Pokemon("ピカチュウ", moves=["でんじほう"])],
+            turn=1,
+            accuracy=None,
+        )
+
+    # 記録しても乱数の結果は変わらない
+    battle, recorded = generate(), generate()
+    recorded.random = RecordingRandom()
+    recorded.random.setstate(battle.random.getstate())
+    battle.advance_turn()
+    recorded.advance_turn()
+    assert battle.state_hash() == recorded.state_hash()
+    labels = [d.label for d in recorded.random.draws]
+    assert "命中" in labels and "ダメージ乱数" in labels
+
+    # すべての分岐を列挙する
+    battle = generate()
+    h = battle.state_hash()
+    commands = {pl: Command.MOVE_0 for pl in battle.players}
+    outcomes = battle.enumerate_outcomes(commands, value_fn=lambda b: b.TOD_score(b.players[0]))
+    assert abs(sum(o.probability for o in outcomes) - 1) < 1e-9
+    # 配列の全体が一致する分岐だけをまとめる
+    assert len({o.state.tobytes() for o in outcomes}) == len(outcomes)
+    # 16通りのダメージ乱数は同じ HP になる結果にまとまる
+    assert sum(o.n_paths for o in outcomes) > len(outcomes)
+    assert battle.state_hash() == h == battle.calc_state_hash()
+
+    # 列挙した局面は復元できる
+    for o in outcomes[:3]:
+        copied = generate()
+        copied.decode(o.state)
+        assert copied.calc_state_hash() == o.state_hash
+        assert (copied.encode() == o.state).all()
+
+
+if __name__ == "__main__":
+    test()
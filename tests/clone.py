@@ -0,0 +1,99 @@
+from copy import deepcopy
+
+from jpoke import Pokemon
+from jpoke.utils import test_utils
+
+
+def snapshot(mon: Pokemon) -> tuple:
+    return (mon.hp, mon.ailment.name, mon.ailment.count, list(mon.rank),
+            [move.pp for move in mon.moves], mon.item.active)
+
+
+def test():
+    test_utils.PRINT_LOG = False
+    battle = test_utils.generate_battle(
+        ally=[Pokemon("ピカチュウ", moves=["アームハンマー"]), Pokemon("ピカチュウ", moves=["アームハンマー"])],
+        foe=[Pokemon("フシギバナ", moves=["すなあらし"])],
+        turn=1,
+    )
+    player = battle.players[0]
+    active, bench = player.team
+
+    new = deepcopy(battle)
+    new_player = new.players[0]
+
+    # 場のポケモンは複製し、控えのポケモンは共有する
+    assert new_player.team[0] is not active
+    assert new_player.team[0].moves[0] is not active.moves[0]
+    assert new_player.team[0].ailment.owner is new_player.team[0]
+    assert new_player.team[1] is bench and (0, 1) in new.lenders and not battle.lenders
+
+    # 複製先の変更は複製元に影響しない
+    hp = battle.actives[1].hp
+    new.advance_turn()
+    assert new.actives[1].hp < hp
+    assert battle.actives[1].hp == hp
+
+    # 共有しているポケモンは場に出る前に複製する
+    new.run_switch(new_player, new_player.team[1])
+    assert new_player.team[1] is not bench
+    assert (0, 1) not in new.lenders
+    assert new.actives[0] is new_player.team[1]
+    assert player.team[1] is bench and not hasattr(bench, "observed")
+
+    # 複製元で共有しているポケモンを場に出しても、複製元のポケモンは置き換えず、複製先に複製を渡す
+    new = deepcopy(battle)
+    newer = deepcopy(new)
+    for clone in [new, newer]:
+        assert clone.players[0].team[1] is bench
+    battle.run_switch(player, bench)
+    assert battle.players[0].team[1] is bench and battle.actives[0] is bench
+    for clone in [new, newer]:
+        assert clone.players[0].team[1] is not bench and not hasattr(clone.players[0].team[1], "observed")
+        assert clone.actives[0] is clone.players[0].team[0]
+        assert not clone.lenders
+
+    # 巻き戻しでも複製元のポケモンには戻らない
+    battle = test_utils.generate_battle(
+        ally=[Pokemon("ピカチュウ"), Pokemon("ピカチュウ"), Pokemon("ピカチュウ")],
+        foe=[Pokemon("フシギバナ")],
+        turn=1,
+    )
+    player = battle.players[0]
+    bench = player.team[1]
+    new = deepcopy(battle)
+    new.checkpoint()
+    new.own(new.players[0], new.players[0].team[2])
+    battle.run_switch(player, bench)
+    new.journal.rollback(0)
+    assert new.players[0].team[1] is not bench and (0, 1) not in new.lenders
+    assert (0, 2) in new.lenders
+
+    # 控えでもハンドラで変化するポケモン (もうどく) は共有せず、複製元と複製先は互いに影響しない
+    battle = test_utils.generate_battle(
+        ally=[Pokemon("ピカチュウ"), Pokemon("フシギバナ")],
+        foe=[Pokemon("ピカチュウ")],
+        turn=1,
+    )
+    player = battle.players[0]
+    bench = player.team[1]
+    bench.ailment.overwrite(battle, "もうどく")
+
+    new = deepcopy(battle)
+    assert new.players[0].team[1] is not bench and (0, 1) not in new.lenders
+
+    for src, dst in [(battle, new), (new, battle)]:
+        h = dst.calc_state_hash()
+        mons = [mon for pl in dst.players for mon in pl.team]
+        states = [snapshot(mon) for mon in mons]
+        count = src.players[0].team[1].ailment.count
+        for _ in range(3):
+            src.advance_turn()
+        assert src.players[0].team[1].ailment.count == count + 3
+        assert dst.calc_state_hash() == h
+        assert [mon for pl in dst.players for mon in pl.team] == mons
+        assert [snapshot(mon) for mon in mons] == states
+
+
+if __name__ == "__main__":
+    test()
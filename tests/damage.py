@@ -0,0 +1,164 @@
+import json
+from pathlib import Path
+from decimal import Decimal, ROUND_HALF_DOWN
+
+from jpoke import Pokemon
+from jpoke.core import Battle, Player
+from jpoke.model import Move
+import numpy as np
+
+from copy import deepcopy
+
+from jpoke.core.damage import DamageCalculator, DamageContext, DamageCache, round_half_down_div, apply_modifier, \
+    max_damage, max_damages, roll_damages
+from jpoke.data import MOVES
+from jpoke.data.models import MoveData
+from jpoke.model.effect import BaseEffect
+from jpoke.utils.enums import Event
+
+
+# ゴールデンコーパス. tests/data/generate_damage_golden.py で、分数を使った独立な実装から生成した
+# 先頭の N_ROUNDING_CASES 件は、補正を1段ずつ丸めた場合とまとめて丸めた場合で結果が異なる
+GOLDEN = Path(__file__).parent / "data" / "damage_golden.jsonl"
+N_ROUNDING_CASES = 4
+MODIFIER_EVENTS = [
+    Event.ON_CALC_POWER_MODIFIER, Event.ON_CALC_ATK_MODIFIER, Event.ON_CALC_DEF_MODIFIER,
+    Event.ON_CALC_ATK_TYPE_MODIFIER, Event.ON_CALC_DEF_TYPE_MODIFIER, Event.ON_CALC_DAMAGE_MODIFIER,
+]
+
+
+class FixedModifiers:
+    """補正のイベントに固定の値を返す EventManager の代わり"""
+
+    def __init__(self, values: list | None):
+        self.values = dict(zip(MODIFIER_EVENTS, values)) if values else {}
+
+    def has_handlers(self, event: Event) -> bool:
+        return event in self.values
+
+    def emit_from(self, event: Event, source, value=None, by="self", move=None):
+        return self.values.get(event, value)
+
+
+def golden_move(name: str) -> Move:
+    """ダメージ計算用の技. ハンドラが未実装の技 (辞書で定義されている技) も威力・分類・フラグから作る"""
+    data = MOVES[name]
+    if isinstance(data, MoveData):
+        return Move(name)
+    data = MoveData(data["type"], data["category"], data["pp"], data.get("power"), data.get("accuracy"),
+                    data.get("priority", 0), data.get("flags", []), name=name)
+    move = Move.__new__(Move)
+    BaseEffect.__init__(move, data)
+    move.pp = data.pp
+    move.bench_reset()
+    return move
+
+
+def fused_roll_damages(max_dmg: int, r_atk_type: int, r_def_type: int, r_dmg: int) -> list[int]:
+    """乱数の後の補正をまとめてかけてから1回だけ丸めた場合のダメージ"""
+    return [round_half_down_div(max_dmg * roll // 100 * r_atk_type * r_def_type * r_dmg, 4096**3) or 1
+            for roll in range(85, 101)]
+
+
+def test():
+    # 五捨五超入
+    for a in range(0, 20000, 7):
+        for b in [2, 3, 4096, 4096*4096]:
+            assert round_half_down_div(a, b) == \
+                int((Decimal(a) / Decimal(b)).quantize(Decimal('0'), rounding=ROUND_HALF_DOWN))
+    assert apply_modifier(2, 6144) == 3 and apply_modifier(3, 6144) == 4 and apply_modifier(5, 6144) == 7
+
+    calculator = DamageCalculator(DamageCache(0))
+    n = 0
+    inputs, expected_all, moves = [], [], set()
+    for line in GOLDEN.read_text(encoding="utf-8").splitlines():
+        level, atk, dfn, atk_rank, def_rank, move, critical, power_multiplier, modifiers, expected = json.loads(line)
+        moves.add(move)
+        move = golden_move(move)
+        attacker, defender = Pokemon("ピカチュウ"), Pokemon("フシギバナ")
+        attacker._level = level
+        attacker._stats, defender._stats = atk, dfn
+        for s, v in zip("ABCD", atk_rank):
+            attacker.rank[s] = v
+        for s, v in zip("ABCD", def_rank):
+            defender.rank[s] = v
+        ctx = DamageContext(critical=critical, power_multiplier=power_multiplier)
+        damages = calculator.single_hit_damages(
+            FixedModifiers(modifiers), attacker, defender, move, ctx)  # type: ignore
+        assert damages == expected, (line, damages)
+        inputs.append(calculator.resolve_inputs(
+            FixedModifiers(modifiers), attacker, defender, move, ctx))  # type: ignore
+        expected_all.append(expected)
+        n += 1
+    assert n == 1000
+    # 多くの技を含み、すべて 0 になる (無効の) ケースを含まない
+    assert len(moves) >= 100 and {"イカサマ", "ボディプレス"} <= moves
+    assert all(any(d) for d in expected_all)
+    # 補正は1段ずつ丸める
+    for row, expected in zip(inputs[:N_ROUNDING_CASES], expected_all):
+        assert fused_roll_damages(max_damage(*row[:10]), *row[10:]) != expected
+
+    # まとめて計算しても同じ結果になる
+    inputs = np.array(inputs, dtype=np.int64)
+    damages = roll_damages(max_damages(inputs), *inputs[:, 10:].T)
+    assert damages.shape == (1000, 16)
+    assert (damages == np.array(expected_all)).all()
+
+    # 乱数の掛け算は切り捨て誤差なしに計算する (最大ダメージ 100 の 91% は 91)
+    attacker, defender = Pokemon("ピカチュウ"), Pokemon("フシギバナ")
+    attacker._stats, defender._stats = [100, 557, 100, 100, 100, 100], [100]*6
+    attacker._level = 50
+    damages = calculator.single_hit_damages(FixedModifiers(None), attacker, defender, Move("たいあたり"))  # type: ignore
+    assert damages[-1] == 100 and damages[6] == 91
+
+    # 威力のない技は 0
+    damages = calculator.batch_damages(FixedModifiers(None), [  # type: ignore
+        (attacker, defender, Move("たいあたり")), (attacker, defender, Move("つるぎのまい"))])
+    assert damages[0].tolist() == calculator.single_hit_damages(
+        FixedModifiers(None), attacker, defender, Move("たいあたり"))  # type: ignore
+    assert not damages[1].any()
+    assert calculator.batch_damages(FixedModifiers(None), []).shape == (0, 16)  # type: ignore
+
+    # 解決済みの入力ごとのキャッシュ
+    calculator = DamageCalculator(DamageCache(2))
+    copied = deepcopy(calculator)
+    assert copied.cache is calculator.cache
+    move = Move("たいあたり")
+    expected = calculator.single_hit_damages(FixedModifiers(None), attacker, defender, move)  # type: ignore
+    assert copied.single_hit_damages(FixedModifiers(None), attacker, defender, move) == expected  # type: ignore
+    assert calculator.cache.stats()["hits"] == 1 and calculator.cache.stats()["misses"] == 1
+    # 補正が変われば別のエントリになる
+    for modifiers in ([4096, 4096, 4096, 6144, 2, 1], [4096, 4096, 4096, 4096, 0.5, 1]):
+        assert calculator.single_hit_damages(FixedModifiers(modifiers), attacker, defender, move) != expected  # type: ignore
+    stats = calculator.cache.stats()
+    assert stats["misses"] == 3 and stats["evictions"] == 1 and stats["size"] == 2
+    assert calculator.single_hit_damages(FixedModifiers(None), attacker, defender, move) == expected  # type: ignore
+    assert calculator.cache.n_misses == 4
+    assert DamageCache.from_bytes(10**6).max_size == 10**6 // DamageCache.ENTRY_BYTES
+
+    # チームどうしのダメージ
+    players = [Player("A"), Player("B")]
+    for pl in players:
+        pl.team = [Pokemon(name, moves=["たいあたり", "でんじほう", "つるぎのまい"])
+                   for name in ["ピカチュウ", "フシギバナ", "ピカチュウ"]]
+    players[0].team[1].moves = ["アームハンマー"]
+    battle = Battle(players)  # type: ignore
+    matrix = battle.calc_damage_matrix(players[0], critical=True, terastal=True)
+    assert matrix.damages.shape == (2, 4, 3, 3, 3, 16)
+    assert matrix.moves[1] == ["アームハンマー"]
+    for c, crit in enumerate(matrix.criticals):
+        for a, attacker in enumerate(players[0].team):
+            for m, move in enumerate(attacker.moves):
+                for d, defender in enumerate(players[1].team):
+                    expected = calculator.single_hit_damages(
+                        battle.events, attacker, defender, move, DamageContext(critical=crit))
+                    if not move.data.power:
+                        expected = [0]*16
+                    assert matrix.damages[c, 0, a, m, d].tolist() == expected
+    assert not matrix.damages[:, :, 1, 1:].any()
+    assert (matrix.max_percent[0, 0, 0, 0] == 100 * matrix.max_damage[0, 0, 0, 0] / matrix.max_hps).all()
+    assert not any(mon.terastallized for pl in players for mon in pl.team)
+
+
+if __name__ == "__main__":
+    test()
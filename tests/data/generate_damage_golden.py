@@ -0,0 +1,133 @@
+"""damage_golden.jsonl を生成する
+
+ダメージは jpoke の DamageCalculator を使わず、このファイルの reference_damages で分数 (Fraction) を使って
+計算する. 丸めは1段ずつ行い、乱数の後はタイプ一致補正 (五捨五超入)、タイプ相性 (切り捨て)、
+ダメージ補正 (五捨五超入) の順に丸める
+
+    python tests/data/generate_damage_golden.py
+"""
+import sys
+import json
+import math
+import random
+from fractions import Fraction
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "tests"))
+
+from jpoke.data import MOVES  # noqa: E402
+from damage import GOLDEN, golden_move  # noqa: E402
+
+
+N_CASES = 1000
+MOVE_POOL = sorted(name for name in MOVES if golden_move(name).data.power)
+# 特殊な分岐を通る技は必ず含める
+REQUIRED_MOVES = ["イカサマ", "ボディプレス"] + \
+    [name for name in MOVE_POOL if {"ignore_rank", "physical"} & set(golden_move(name).data.flags)]
+
+MODIFIERS_4096 = [2048, 2732, 3072, 3277, 4096, 4505, 4506, 4710, 4915, 5325, 5448, 5734, 6144, 6963, 8192]
+ATK_TYPE_MODIFIERS = [2048, 4096, 6144, 8192, 9216]
+# 0 倍 (無効) はすべてのダメージが 0 になるため含めない
+DEF_TYPE_MODIFIERS = [0.25, 0.5, 1, 2, 4]
+DAMAGE_MODIFIERS = [0.5, 2732/4096, 0.75, 1, 5324/4096, 1.5, 2.0]
+
+# 丸めを1段ずつ行う場合と、まとめて行う場合で結果が異なるケース
+# (タイプ一致、いまひとつ、いのちのたま 1.3 倍などの組み合わせ)
+ROUNDING_CASES = [
+    [50, [100, 120, 100, 100, 100, 100], [100, 100, 95, 100, 100, 100], [0]*4, [0]*4, "たいあたり", False, 1,
+     [4096, 4096, 4096, 6144, 0.5, 5324/4096]],
+    [50, [100, 182, 100, 100, 100, 100], [100, 100, 120, 100, 100, 100], [1, 0, 0, 0], [0]*4, "アームハンマー",
+     False, 1, [4096, 4096, 4096, 6144, 0.5, 5324/4096]],
+    [50, [100, 100, 100, 177, 100, 100], [100, 100, 100, 100, 130, 100], [0]*4, [0]*4, "かえんほうしゃ", True, 1,
+     [4096, 4096, 4096, 6144, 0.25, 5324/4096]],
+    [80, [100, 100, 100, 150, 100, 100], [100, 100, 100, 100, 90, 100], [0]*4, [0]*4, "かえんほうしゃ", False, 1,
+     [4096, 4096, 4096, 9216, 0.5, 0.75]],
+]
+
+
+def round_half_down(x: Fraction) -> int:
+    """五捨五超入"""
+    return math.ceil(x - Fraction(1, 2))
+
+
+def rank_modifier(v: int) -> Fraction:
+    return Fraction(2+v, 2) if v >= 0 else Fraction(2, 2-v)
+
+
+def reference_damages(level: int, atk: list[int], dfn: list[int], atk_rank: list[int], def_rank: list[int],
+                      move: str, critical: bool, power_multiplier: float, modifiers: list | None) -> list[int]:
+    """16通りの乱数のダメージ. ステータスは HABCDS、ランクは ABCD の順"""
+    data = golden_move(move).data
+    r_pow, r_atk, r_def, r_atk_type, r_def_type, r_dmg = modifiers or [4096, 4096, 4096, 4096, 1, 1]
+    stat_idx = dict(zip("ABCD", range(4)))
+
+    # 最終威力
+    final_pow = max(1, round_half_down(data.power * Fraction(power_multiplier) * Fraction(r_pow, 4096)))
+
+    # 最終攻撃
+    if move == "イカサマ":
+        stat, rank = dfn[1], def_rank[0]
+    else:
+        s = "B" if move == "ボディプレス" else "A" if data.category == "物理" else "C"
+        stat, rank = atk[1 + stat_idx[s]], atk_rank[stat_idx[s]]
+    if critical and rank < 0:
+        rank = 0
+    final_atk = max(1, round_half_down(math.floor(stat * rank_modifier(rank)) * Fraction(r_atk, 4096)))
+
+    # 最終防御
+    s = "B" if data.category == "物理" or "physical" in data.flags else "D"
+    stat, rank = dfn[1 + stat_idx[s]], def_rank[stat_idx[s]]
+    if "ignore_rank" in data.flags or (critical and rank > 0):
+        rank = 0
+    final_def = max(1, round_half_down(math.floor(stat * rank_modifier(rank)) * Fraction(r_def, 4096)))
+
+    # 最大乱数ダメージ
+    max_dmg = math.floor(math.floor(math.floor(Fraction(level*2, 5) + 2) * final_pow * final_atk / final_def) / 50) + 2
+    if critical:
+        max_dmg = round_half_down(max_dmg * Fraction(3, 2))
+
+    damages = []
+    for roll in range(85, 101):
+        dmg = math.floor(max_dmg * Fraction(roll, 100))
+        dmg = round_half_down(dmg * Fraction(r_atk_type, 4096))
+        dmg = math.floor(dmg * Fraction(r_def_type))
+        dmg = round_half_down(dmg * Fraction(r_dmg))
+        # 最低ダメージ補償
+        damages.append(dmg if dmg or not r_def_type * r_dmg else 1)
+    return damages
+
+
+def random_case(rng: random.Random, move: str) -> list:
+    modifiers = None
+    if rng.random() < 0.7:
+        modifiers = [rng.choice(MODIFIERS_4096) for _ in range(3)] + [
+            rng.choice(ATK_TYPE_MODIFIERS), rng.choice(DEF_TYPE_MODIFIERS), rng.choice(DAMAGE_MODIFIERS)]
+    return [
+        rng.randint(1, 100),
+        [rng.randint(1, 999) for _ in range(6)],
+        [rng.randint(1, 999) for _ in range(6)],
+        [rng.randint(-6, 6) for _ in range(4)],
+        [rng.randint(-6, 6) for _ in range(4)],
+        move,
+        rng.random() < 0.2,
+        rng.choice([0.5, 1, 1.25, 1.5, 2]),
+        modifiers,
+    ]
+
+
+def main(seed: int = 0):
+    rng = random.Random(seed)
+    moves = REQUIRED_MOVES + [rng.choice(MOVE_POOL)
+                              for _ in range(N_CASES - len(REQUIRED_MOVES) - len(ROUNDING_CASES))]
+    cases = ROUNDING_CASES + [random_case(rng, move) for move in moves]
+    lines = [json.dumps(case + [reference_damages(*case)], ensure_ascii=False, separators=(",", ":"))
+             for case in cases]
+
+    GOLDEN.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    print(f"{len(lines)} cases, {len({case[5] for case in cases})} moves -> {GOLDEN}")
+
+
+if __name__ == "__main__":
+    main()
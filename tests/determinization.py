@@ -0,0 +1,59 @@
+import numpy as np
+
+from jpoke import Pokemon
+from jpoke.utils import test_utils
+from jpoke.core.encoding import ABILITY_IDS, ITEM_IDS, MOVE_IDS
+from jpoke.core.determinization import sample_determinizations
+
+
+def test():
+    test_utils.PRINT_LOG = False
+
+    battle = test_utils.generate_battle(
+        ally=[Pokemon("ピカチュウ", moves=["たいあたり"])],
+        foe=[Pokemon("フシギバナ", moves=["たいあたり", "どくどく"]),
+             Pokemon("ピカチュウ", moves=["でんじほう"]),
+             Pokemon("カビゴン", moves=["はねる"])],
+        turn=1,
+    )
+    me, rival = battle.players
+    mon = rival.active
+    mon.moves[1].revealed = True
+    mon.ability.revealed = True
+
+    d = battle.determinize(me, 200, np.random.default_rng(0))
+    assert len(d) == 200 and d.idx == 1
+    assert len(set(d.items.ravel().tolist())) > 1
+
+    # 割り込みが発生しないように持ち物を限定する
+    d = sample_determinizations(battle, me, 200, np.random.default_rng(0), item_pool=["", "たべのこし"])
+    assert np.isin(d.items, [ITEM_IDS[""], ITEM_IDS["たべのこし"]]).all()
+    j = rival.team.index(mon)
+    # 判明した情報は変わらない
+    assert (d.abilities[:, j] == ABILITY_IDS[mon.ability.data.name]).all()
+    assert (d.moves[:, j, 0] == MOVE_IDS["どくどく"]).all()
+    assert (d.moves[:, j, 1:] != MOVE_IDS["どくどく"]).all()
+    # 場に出たポケモンは必ず選出に含まれ、残りは標本ごとに異なる
+    assert (d.selections == j).any(axis=1).all()
+    assert len({tuple(s) for s in d.selections.tolist()}) > 1
+
+    # 上書きした状態は rollback で元に戻る
+    h = battle.state_hash()
+    team = [(m.ability.data.name, m.item.data.name, [move.name for move in m.moves]) for m in rival.team]
+    cp = battle.checkpoint()
+    d.apply(battle, 0)
+    assert battle.state_hash() == battle.calc_state_hash()
+    assert [move.name for move in rival.active.moves][0] == "どくどく"
+    battle.advance_turn()
+    battle.rollback(cp)
+    assert battle.state_hash() == h == battle.calc_state_hash()
+    assert team == [(m.ability.data.name, m.item.data.name, [move.name for move in m.moves]) for m in rival.team]
+
+    # 複製は元のバトルを変更しない
+    copied = d.clone(battle, 1)
+    assert copied.players[1].selection_idxes == d.selections[1].tolist()
+    assert team == [(m.ability.data.name, m.item.data.name, [move.name for move in m.moves]) for m in rival.team]
+
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,39 @@
+from jpoke import Pokemon
+from jpoke.core import Battle, Player
+from jpoke.player.duct_player import DUCTPlayer
+
+
+def test():
+    player = DUCTPlayer("DUCT", iterations=100)
+    players = [player, Player("Random")]
+    players[0].team = [Pokemon("ピカチュウ", moves=["たいあたり", "つるぎのまい"]), Pokemon("フシギバナ")]
+    players[1].team = [Pokemon("フシギバナ", moves=["すなあらし"]), Pokemon("ピカチュウ")]
+    battle = Battle(players)  # type: ignore
+    battle.advance_turn()
+
+    h = battle.state_hash()
+    command = player.choose_action_command(battle)
+    assert command in battle.get_available_action_commands(player)
+    assert battle.state_hash() == h
+
+    # 両プレイヤーが自分のコマンドの統計を持ち、訪問回数は根の訪問回数に一致する
+    # 相手の技は非公開情報の標本なので、相手のコマンドは実際のものと一致するとは限らない
+    root = player.tree
+    assert set(root.stats[0]) <= set(battle.get_available_action_commands(player))
+    for stats in root.stats:
+        assert sum(n for n, _ in stats.values()) == root.n_visits
+    assert root.n_visits + player.search_logs[-1].n_errors == 100
+
+    # 自分のコマンドを含む組の先から部分木を取り出す
+    commands, outcomes = next((k, v) for k, v in root.children.items() if k[0] == command)
+    state_hash, node = next(iter(outcomes.items()))
+    assert player.reuse_tree(state_hash, 0) is node
+
+    # 1回も探索できなければ合法なコマンドを返す
+    player.iterations = 0
+    assert player.choose_action_command(battle) in battle.get_available_action_commands(player)
+    assert player.search_logs[-1].iterations == 0
+
+
+if __name__ == "__main__":
+    test()
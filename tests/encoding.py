@@ -0,0 +1,82 @@
+from copy import deepcopy
+from typing import get_args
+
+import numpy as np
+
+from jpoke import Pokemon
+from jpoke.utils.types import GlobalField, SideField
+from jpoke.utils.enums import Event
+from jpoke.utils import test_utils
+
+
+def generate():
+    return test_utils.generate_battle(
+        ally=[Pokemon("ピカチュウ", item="たべのこし", moves=["アームハンマー", "でんじほう"]),
+              Pokemon("カイリュー", moves=["すなあらし"])],
+        foe=[Pokemon("フシギバナ", moves=["すなあらし"])],
+        turn=1,
+    )
+
+
+def test():
+    test_utils.PRINT_LOG = False
+    battle = generate()
+    battle.advance_turn()
+
+    # ポケモンの状態
+    mon = battle.actives[1]
+    battle.modify_hp(mon, -10)
+    battle.modify_stat(mon, "B", -2)
+    mon.ailment.overwrite(battle, "もうどく")
+    mon.ailment.count = 3
+    mon.moves[0].pp -= 1
+    mon.terastallized = True
+    battle.actives[0].item.consume()
+
+    # すべての場の状態
+    for i, name in enumerate(get_args(GlobalField)):
+        if name == "weather":
+            battle.field.activate_weather("あめ", 5)
+        elif name == "terrain":
+            battle.field.activate_terrain("エレキフィールド", 4)
+        else:
+            battle.field.activate(name, i + 1)
+    for i, name in enumerate(get_args(SideField)):
+        battle.sides[i % 2].activate(name, i + 1)
+
+    state = battle.encode()
+    assert state.dtype == np.int16 and state.ndim == 1
+    assert battle.encode(np.float32).tolist() == state.tolist()
+
+    # 同じ構成のバトルに復元すると同じ配列になる
+    new = generate()
+    new.decode(state)
+    assert np.array_equal(new.encode(), state)
+    assert new.state_hash() == battle.state_hash()
+    assert new.weather.name == "あめ" and new.terrain.name == "エレキフィールド"
+    for name in get_args(SideField):
+        assert new.sides[0].fields[name].count == battle.sides[0].fields[name].count
+        assert new.sides[1].fields[name].count == battle.sides[1].fields[name].count
+    assert new.actives[1].ailment.name == "もうどく"
+    assert new.events.has_handlers(Event.ON_TURN_END_4)
+
+    assert not new.actives[0].item.active
+
+    # 復元したバトルは元のバトルと同じように進む
+    battle = generate()
+    battle.field.activate_weather("あめ", 5)
+    new = generate()
+    new.decode(battle.encode())
+    for b in [battle, new]:
+        b.random.seed(0)
+        b.advance_turn()
+    assert np.array_equal(new.encode(), battle.encode())
+
+    # 複製の代わりに使える
+    clone = deepcopy(new)
+    clone.decode(state)
+    assert np.array_equal(clone.encode(), state)
+
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import warnings
+
+import numpy as np
+
+from jpoke import Pokemon
+from jpoke.utils import test_utils
+from jpoke.core.chance import enumerate_outcomes
+from jpoke.player import endgame
+from jpoke.player.endgame import EndgameSolver, is_endgame, endgame_key
+
+
+def test():
+    test_utils.PRINT_LOG = False
+
+    def generate(hp0: int, hp1: int):
+        battle = test_utils.generate_battle(
+            ally=[Pokemon("ピカチュウ", moves=["たいあたり", "つるぎのまい"])],
+            foe=[Pokemon("フシギバナ", moves=["たいあたり", "どくどく"])],
+            turn=1,
+            accuracy=None,
+        )
+        battle.players[0].active.hp = hp0
+        battle.players[1].active.hp = hp1
+        return battle
+
+    battle = generate(100, 1)
+    assert is_endgame(battle)
+    h = battle.state_hash()
+
+    # 次のターンに倒せて、倒されないなら必ず勝つ
+    solver = EndgameSolver()
+    result = solver.solve(battle)
+    assert result.exact and result.value == 1
+    assert battle.state_hash() == h == battle.calc_state_hash()
+
+    battle = generate(10, 20)
+    result = solver.solve(battle)
+    assert result.exact and 0 <= result.value <= 1
+    for idx in range(2):
+        assert abs(sum(result.strategy(idx).values()) - 1) < 1e-9
+
+    # 保存した解は別のバトルでもすぐに返る
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "endgame.pkl")
+        solver.save_cache(path)
+        solver = EndgameSolver()
+        solver.load_cache(path)
+    assert solver.solve(generate(10, 20)).value == result.value
+    assert solver.n_nodes == 0 and solver.n_hits == 1
+
+    # 互いに外れると同じ局面に戻る (PP が尽きた命中率50%の技). 戻った局面でも同じ勝率になる
+    battle = test_utils.generate_battle(
+        ally=[Pokemon("ピカチュウ", moves=["でんじほう"])],
+        foe=[Pokemon("フシギバナ", moves=["でんじほう"])],
+        turn=1,
+        accuracy=None,
+    )
+    for player in battle.players:
+        player.active.hp = 1
+        player.active.moves[0].pp = 0
+    solver = EndgameSolver()
+    result = solver.solve(battle)
+    assert result.exact and abs(result.value - 1/3) < 1e-9
+
+    key = endgame_key(battle)
+    p0, p1 = battle.players
+    outcomes = enumerate_outcomes(battle, {p0: result.commands[0][0], p1: result.commands[1][0]},
+                                  lambda b: np.nan if endgame_key(b) == key else solver.search(b, 1).value)
+    p_stay = sum(o.probability for o in outcomes if np.isnan(o.value))
+    assert 0 < p_stay < 1
+    v = sum(o.probability * o.value for o in outcomes if not np.isnan(o.value))
+    assert abs(v + p_stay * result.value - result.value) < 1e-9
+
+    # 列挙できなかったコマンドの組は評価値で代用して警告し、それ以外の例外は送出する
+    original = endgame.enumerate_outcomes
+    try:
+        endgame.enumerate_outcomes = lambda *args: [][0]
+        solver = EndgameSolver()
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            result = solver.solve(generate(10, 20))
+        assert not result.exact and len(caught) == 1
+        assert solver.n_errors == len(result.commands[0]) * len(result.commands[1])
+
+        endgame.enumerate_outcomes = lambda *args: 1 / 0
+        solver = EndgameSolver()
+        try:
+            solver.solve(generate(10, 20))
+        except ZeroDivisionError:
+            assert not solver.stack
+        else:
+            assert False
+    finally:
+        endgame.enumerate_outcomes = original
+
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,66 @@
+from copy import deepcopy
+
+from jpoke import Pokemon
+from jpoke.core.event import Handler
+from jpoke.utils.enums import Event
+from jpoke.utils import test_utils
+
+
+def test():
+    battle = test_utils.generate_battle()
+    events = battle.events
+    mon = battle.actives[0]
+
+    assert not events.has_handlers(Event.ON_END)
+
+    calls = []
+    handlers = [Handler(lambda b, c, v, i=i: calls.append(i), priority=p)
+                for i, p in enumerate([0, 2, 0, 1])]
+    for handler in handlers:
+        events.on(Event.ON_END, handler, mon)
+
+    # 優先度の高い順、同じ優先度なら登録順
+    events.emit(Event.ON_END)
+    assert calls == [1, 3, 0, 2]
+
+    # 解除したハンドラは呼ばれない
+    events.off(Event.ON_END, handlers[1], mon)
+    calls.clear()
+    events.emit(Event.ON_END)
+    assert calls == [3, 0, 2]
+
+    # 再登録したハンドラは同じ優先度の中で最後に呼ばれる
+    events.off(Event.ON_END, handlers[0], mon)
+    events.on(Event.ON_END, handlers[0], mon)
+    calls.clear()
+    events.emit(Event.ON_END)
+    assert calls == [3, 2, 0]
+
+    # すべて解除するとハンドラなしとして扱う
+    for handler in handlers:
+        events.off(Event.ON_END, handler, mon)
+    assert not events.has_handlers(Event.ON_END)
+
+    # どちらのチームにもいないポケモンを source にすると例外を送出する
+    events.on(Event.ON_END, handlers[0], mon)
+    try:
+        events.emit_from(Event.ON_END, Pokemon("ピカチュウ"))
+    except Exception as e:
+        assert str(e) == "Source not found."
+    else:
+        assert False
+    events.off(Event.ON_END, handlers[0], mon)
+
+    # 共有しているポケモンを複製に置き換えると、source ごとの索引を破棄する
+    battle = test_utils.generate_battle(ally=[Pokemon("ピカチュウ"), Pokemon("ピカチュウ")])
+    new = deepcopy(battle)
+    player = new.players[0]
+    bench = player.team[1]
+    new.events.emit_from(Event.ON_END, bench)
+    assert any(bench in index for index in new.events.indexed.values())
+    new.own(player, bench)
+    assert not new.events.indexed
+
+
+if __name__ == "__main__":
+    test()
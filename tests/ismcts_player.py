@@ -0,0 +1,37 @@
+import numpy as np
+
+from jpoke import Pokemon
+from jpoke.core import Battle, Player
+from jpoke.player.ismcts_player import ISMCTSPlayer
+
+
+def test():
+    player = ISMCTSPlayer("ISMCTS", n_determinizations=50, iterations=100)
+    players = [player, Player("Random")]
+    players[0].team = [Pokemon("ピカチュウ", moves=["たいあたり", "つるぎのまい"]), Pokemon("フシギバナ")]
+    players[1].team = [Pokemon("フシギバナ", moves=["すなあらし"]), Pokemon("ピカチュウ")]
+    battle = Battle(players)  # type: ignore
+    battle.advance_turn()
+
+    # 相手の情報だけが異なる局面は同じ情報集合になる
+    d = battle.determinize(player, 10, np.random.default_rng(0))
+    copies = [d.clone(battle, i) for i in range(len(d))]
+    assert len({b.observation_hash(b.players[0]) for b in copies}) == 1
+    assert len({b.state_hash() for b in copies}) > 1
+
+    # 探索しても実際のバトルは変わらない
+    h = battle.state_hash()
+    moves = [[move.name for move in mon.moves] for mon in players[1].team]
+    command = player.choose_action_command(battle)
+    assert command in battle.get_available_action_commands(player)
+    assert battle.state_hash() == h
+    assert moves == [[move.name for move in mon.moves] for mon in players[1].team]
+
+    stats = player.search_logs[-1]
+    assert stats.iterations == 100
+    assert player.tree.n_visits + stats.n_errors == 100
+    assert len(player.determinizations) == 50  # type: ignore
+
+
+if __name__ == "__main__":
+    test()
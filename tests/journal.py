@@ -0,0 +1,50 @@
+from jpoke import Pokemon
+from jpoke.utils import test_utils
+
+
+def snapshot(battle):
+    """比較用にバトルの状態を書き出す"""
+    mons = [(mon.hp, mon.rank.tolist(), mon.ailment.name, mon.ailment.count,
+             [move.pp for move in mon.moves], len(mon.expended_moves))
+            for player in battle.players for mon in player.team]
+    fields = [(f.name, f.count) for f in battle.field.fields.values()] + \
+        [(f.name, f.count) for side in battle.sides for f in side.fields.values()]
+    players = [(pl.active_idx, pl.interrupt, pl.has_switched) for pl in battle.players]
+    return battle.turn, mons, fields, players, dict(battle.events.n_subscriptions), battle.random.getstate()
+
+
+def test():
+    test_utils.PRINT_LOG = False
+    battle = test_utils.generate_battle(
+        ally=[Pokemon("ピカチュウ", moves=["アームハンマー"]), Pokemon("ピカチュウ", moves=["すなあらし"])],
+        foe=[Pokemon("フシギバナ", moves=["すなあらし"])],
+        turn=1,
+    )
+
+    before = snapshot(battle)
+    cp = battle.checkpoint()
+    battle.advance_turn()
+    battle.advance_turn()
+    after = snapshot(battle)
+    logs = battle.logger.turn_logs.copy()
+    assert after != before
+
+    # 巻き戻すと元の状態に戻る
+    battle.rollback(cp)
+    assert snapshot(battle) == before
+
+    # 同じチェックポイントから何度でも同じ展開を再現できる
+    battle.advance_turn()
+    battle.advance_turn()
+    assert snapshot(battle) == after
+    assert battle.logger.turn_logs == logs
+
+    battle.rollback(cp)
+    assert snapshot(battle) == before
+
+    battle.clear_checkpoints()
+    assert not battle.journal.entries
+
+
+if __name__ == "__main__":
+    test()
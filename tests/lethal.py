@@ -0,0 +1,72 @@
+from jpoke import Pokemon
+from jpoke.utils.enums import Command
+from jpoke.utils import test_utils
+
+
+def test():
+    test_utils.PRINT_LOG = False
+
+    def generate():
+        battle = test_utils.generate_battle(
+            ally=[Pokemon("ピカチュウ", moves=["でんじほう"])],
+            foe=[Pokemon("フシギバナ", moves=["たいあたり"])],
+            turn=1,
+            accuracy=None,
+        )
+        foe = battle.actives[1]
+        battle.modify_hp(foe, v=90 - foe.hp)
+        foe.ailment.overwrite(battle, "もうどく")
+        battle.field.activate_weather("すなあらし", 2)
+        battle.state_hash()
+        return battle
+
+    # 乱数の分岐をすべて列挙した結果と一致する
+    battle = generate()
+    hp_dstr: dict[int, float] = {}
+    stack = [(o.state, o.probability, 1) for o in battle.enumerate_outcomes(
+        {pl: Command.MOVE_0 for pl in battle.players})]
+    while stack:
+        state, prob, turn = stack.pop()
+        copied = generate()
+        copied.decode(state)
+        hp = copied.actives[1].hp
+        if turn == 2 or not hp:
+            hp_dstr[hp] = hp_dstr.get(hp, 0.) + prob
+        else:
+            stack += [(o.state, prob * o.probability, turn + 1) for o in copied.enumerate_outcomes(
+                {pl: Command.MOVE_0 for pl in copied.players})]
+
+    prob = battle.calc_lethal(battle.actives[0], "でんじほう", n_turns=2, defender_move="たいあたり")
+    calculator = battle.damage_calculator
+    assert 0 < prob < 1 and calculator.lethal_num == 2
+    assert abs(prob - hp_dstr.get(0, 0.)) < 1e-9
+    assert calculator.hp_dstr.keys() == {hp for hp, p in hp_dstr.items() if p > 0}
+    for hp, p in hp_dstr.items():
+        assert abs(calculator.hp_dstr[hp] - p) < 1e-9
+    assert abs(sum(calculator.damage_dstr.values()) - 1) < 1e-9
+
+    # 相手がいのちのたまを持っていれば、相手の攻撃が命中するたびに反動を受ける
+    expected = calculator.hp_dstr
+    foe = battle.actives[1]
+    foe.item = "いのちのたま"
+    battle.calc_lethal(battle.actives[0], "でんじほう", n_turns=2, defender_move="たいあたり")
+    recoil = foe.max_hp // 8
+    for hp, p in calculator.hp_dstr.items():
+        if hp:
+            assert abs(expected[hp + 2*recoil] - p) < 1e-9
+    assert calculator.lethal_prob > prob
+    # 変化技なら反動はない
+    battle.calc_lethal(battle.actives[0], "でんじほう", n_turns=2, defender_move="つるぎのまい")
+    assert calculator.hp_dstr == expected
+    foe.item = ""
+
+    # 急所と複数回の攻撃
+    assert battle.calc_lethal(battle.actives[0], "でんじほう", n_turns=1) == 0
+    assert battle.calc_lethal(battle.actives[0], "でんじほう", n_turns=1, n_hits=3, critical_prob=1) > 0
+    # 変化技ならターン終了時のダメージ (すなあらし 1/16, もうどく 1/16) だけ
+    battle.calc_lethal(battle.actives[0], "つるぎのまい", n_turns=1)
+    assert calculator.damage_dstr == {2 * (foe.max_hp // 16): 1.}
+
+
+if __name__ == "__main__":
+    test()
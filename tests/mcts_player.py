@@ -0,0 +1,114 @@
+from copy import deepcopy
+
+from jpoke import Pokemon
+from jpoke.core import Battle, Player
+from jpoke.player.mcts_player import MCTSPlayer, EngineError, step
+from jpoke.utils.enums import Command, Time
+
+
+def generate_battle(player: MCTSPlayer) -> Battle:
+    players = [player, Player("Random")]
+    players[0].team = [Pokemon("ピカチュウ", moves=["たいあたり", "つるぎのまい"]), Pokemon("フシギバナ")]
+    players[1].team = [Pokemon("フシギバナ", moves=["すなあらし"]), Pokemon("ピカチュウ")]
+    battle = Battle(players)  # type: ignore
+    battle.advance_turn()
+    return battle
+
+
+def test():
+    player = MCTSPlayer("MCTS", time_budget=0.3)
+    assert MCTSPlayer().time_budget <= Time.COMMAND.value
+    battle = generate_battle(player)
+
+    # 制限時間内に合法なコマンドを返す
+    h = battle.state_hash()
+    command = player.choose_action_command(battle)
+    assert command in battle.get_available_action_commands(player)
+    assert battle.state_hash() == h
+
+    stats = player.search_logs[-1]
+    assert stats.iterations > 0
+    assert stats.elapsed < 0.3 + 0.5
+    assert stats.tree_size > 1 and stats.max_depth >= 1
+
+    # 次のターンは前回の探索木のうち、実際の局面に一致する部分木から探索を始める
+    child = player.tree.children[command]
+    state_hash, node = next(iter(child.outcomes.items()))
+    assert player.reuse_tree(state_hash, 0) is node
+    assert player.reuse_tree(0, 0) is None
+
+    # 瀕死による交代を挟んでも、交代した後の局面から探索を始める
+    p = MCTSPlayer("MCTS", iterations=300)
+    players = [p, Player("Random")]
+    players[0].team = [Pokemon("ピカチュウ", moves=["つるぎのまい", "はねる"]) for _ in range(2)]
+    players[1].team = [Pokemon("フシギバナ", moves=["たいあたり"])]
+    b = Battle(players, seed=1)  # type: ignore
+    b.advance_turn()
+    b.test_option.accuracy = 100
+    p.active.hp = 1
+    p.active.ailment.overwrite(b, "どく")
+    # 探索した後、技を選んだことにしてターンを進める. 技の後にどくで瀕死になる
+    p.choose_action_command(b)
+    p.last_command = Command.MOVE_0
+    b.advance_turn({p: Command.MOVE_0, players[1]: Command.MOVE_0})
+    assert "瀕死" in " ".join(b.get_turn_logs()[p]) and not b.has_interrupt()
+    b.advance_turn()
+    assert p.search_logs[-1].n_reused > 0
+
+    # 回数で打ち切る
+    player.iterations = 20
+    player.time_budget = 60
+    player.choose_action_command(battle)
+    assert player.search_logs[-1].iterations == 20
+
+    # 1回も探索できなければ合法なコマンドを返す
+    for p in [MCTSPlayer("MCTS", time_budget=0.), MCTSPlayer("MCTS", iterations=0)]:
+        b = generate_battle(p)
+        assert p.choose_action_command(b) in b.get_available_action_commands(p)
+        assert p.search_logs[-1].iterations == 0
+
+    # バトルを進められなかった以外の例外は送出する
+    p = MCTSPlayer("MCTS", iterations=1)
+    b = generate_battle(p)
+    p.rollout = lambda battle, idx: 1 / 0  # type: ignore
+    try:
+        p.choose_action_command(b)
+    except ZeroDivisionError:
+        pass
+    else:
+        assert False
+
+    # バトルの処理が送出する ValueError は、バトルを進められなかったものとして扱う
+    b = generate_battle(MCTSPlayer("MCTS"))
+
+    def fail(*args):
+        raise ValueError("list.index(x): x not in list")
+
+    b.advance_turn = fail  # type: ignore
+    try:
+        step(b, {pl: Command.MOVE_0 for pl in b.players})
+    except EngineError:
+        pass
+    else:
+        assert False
+
+    # 複数プロセスで探索して合算する
+    player.iterations = None
+    player.time_budget = 0.3
+    player.n_workers = 2
+    with player:
+        command = player.choose_action_command(battle)
+        pool = player.pool
+        assert pool is not None
+        # 同じバトルではワーカープロセスを使い回す. 複製は別のバトルとして扱う
+        player.choose_action_command(battle)
+        assert player.pool is pool
+        assert deepcopy(battle).uid != battle.uid
+    assert player.pool is None and not player.pool_finalizer
+    assert command in battle.get_available_action_commands(player)
+    assert player.search_logs[-1].iterations > 0
+    assert battle.state_hash() == h
+
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,64 @@
+import random
+
+import numpy as np
+
+from jpoke import Pokemon
+from jpoke.core import Battle, Player
+from jpoke.player.mcts_player import EngineError, evaluate
+from jpoke.player.payoff import PayoffSolver, solve_matrix_game, estimate_payoffs
+
+
+def test():
+    # じゃんけんの均衡は一様
+    rps = np.array([[0.5, 0, 1], [1, 0.5, 0], [0, 1, 0.5]])
+    s0, s1, value, exploitability = solve_matrix_game(rps, 2000)
+    assert np.allclose(s0, 1/3, atol=0.02) and np.allclose(s1, 1/3, atol=0.02)
+    assert abs(value - 0.5) < 0.01 and exploitability < 0.02
+
+    # 支配される戦略は選ばない
+    s0, s1, value, _ = solve_matrix_game(np.array([[0.8, 0.6], [0.3, 0.2]]))
+    assert s0[0] > 0.99 and s1[1] > 0.99 and abs(value - 0.6) < 0.01
+
+    players = [Player(), Player()]
+    players[0].team = [Pokemon("ピカチュウ", moves=["たいあたり", "つるぎのまい"]), Pokemon("フシギバナ")]
+    players[1].team = [Pokemon("フシギバナ", moves=["すなあらし"]), Pokemon("ピカチュウ")]
+    battle = Battle(players)  # type: ignore
+    battle.advance_turn()
+
+    h = battle.state_hash()
+    solver = PayoffSolver(n_rollouts=2, rollout_turns=2)
+    result = solver.solve(battle)
+    m, n = [len(battle.get_available_action_commands(pl)) for pl in battle.players]
+    assert result.values.shape == (m, n)
+    assert ((0 <= result.values) & (result.values <= 1)).all()
+    assert abs(sum(result.strategy(0).values()) - 1) < 1e-9
+    assert battle.state_hash() == h
+
+    # 同じ局面は保存した結果を返す
+    assert solver.solve(battle) is result
+    assert (solver.n_hits, solver.n_misses) == (1, 1)
+
+    # バトルを進められなかった試行は破棄し、すべて破棄した組は現在の局面の評価値で代用する
+    def fail(b, idx):
+        raise EngineError("Unresolved.")
+    values, n_errors = estimate_payoffs(battle, [(0, 0)], 3, 2, random.Random(0), fail)
+    assert n_errors == 3 and values == [evaluate(battle, 0)]
+    assert battle.state_hash() == h
+
+    # それ以外の例外は送出する
+    try:
+        estimate_payoffs(battle, [(0, 0)], 3, 2, random.Random(0), lambda b, idx: 1 / 0)
+    except ZeroDivisionError:
+        assert battle.state_hash() == h
+    else:
+        assert False
+    battle.clear_checkpoints()
+
+    # 複数プロセスで推定しても同じ形の行列になる
+    with PayoffSolver(n_rollouts=2, rollout_turns=2, n_workers=2) as solver:
+        assert solver.solve(battle).values.shape == (m, n)
+    assert solver.pool is None
+
+
+if __name__ == "__main__":
+    test()
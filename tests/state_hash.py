@@ -0,0 +1,42 @@
+from copy import deepcopy
+
+from jpoke import Pokemon
+from jpoke.utils import test_utils
+
+
+def test():
+    test_utils.PRINT_LOG = False
+
+    def generate():
+        return test_utils.generate_battle(
+            ally=[Pokemon("ピカチュウ", moves=["アームハンマー"]), Pokemon("ピカチュウ", moves=["すなあらし"])],
+            foe=[Pokemon("フシギバナ", moves=["すなあらし"])],
+            turn=1,
+        )
+
+    battle = generate()
+    h = battle.state_hash()
+
+    # 同じ状態なら同じハッシュ値
+    assert generate().state_hash() == h
+    assert deepcopy(battle).state_hash() == h
+
+    # 状態の変更に合わせて更新される
+    cp = battle.checkpoint()
+    for _ in range(2):
+        battle.advance_turn()
+        assert battle.state_hash() != h
+        assert battle.state_hash() == battle.calc_state_hash()
+
+    battle.modify_stat(battle.actives[0], "A", +1)
+    assert battle.state_hash() == battle.calc_state_hash()
+    battle.field.activate("trickroom", 5)
+    assert battle.state_hash() == battle.calc_state_hash()
+
+    # 巻き戻すと元のハッシュ値に戻る
+    battle.rollback(cp)
+    assert battle.state_hash() == h == battle.calc_state_hash()
+
+
+if __name__ == "__main__":
+    test()